@@ -186,7 +186,7 @@ fi
 # ==========================================
 
 info "Building containers..."
-docker compose build --no-cache
+docker compose build --pull
 
 info "Starting services..."
 docker compose up -d
@@ -233,6 +233,12 @@ if [ -z "$TABLE_COUNT" ] || [ "$TABLE_COUNT" = "0" ]; then
     fi
 else
     success "Database already contains data ($TABLE_COUNT tables)"
+
+    # The API reads and writes search_key; adding a nullable column is catalog-only.
+    # Fill it afterwards with: python scripts/search_keys.py
+    docker exec "$DB_CONTAINER" psql -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1 -q -c \
+"ALTER TABLE products ADD COLUMN IF NOT EXISTS search_key text; ALTER TABLE categories ADD COLUMN IF NOT EXISTS search_key text;"
+    success "search_key columns present (run scripts/search_keys.py to backfill)"
 fi
 
 # ==========================================
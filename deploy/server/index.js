@@ -44,6 +44,22 @@ pool.connect((err, client, release) => {
     }
 });
 
+// Run fn(client) in one transaction on a dedicated connection
+async function withTransaction(fn) {
+    const client = await pool.connect();
+    try {
+        await client.query('BEGIN');
+        const result = await fn(client);
+        await client.query('COMMIT');
+        return result;
+    } catch (error) {
+        await client.query('ROLLBACK').catch(() => {});
+        throw error;
+    } finally {
+        client.release();
+    }
+}
+
 // CORS configuration
 const corsOptions = {
     origin: process.env.CORS_ORIGIN ? process.env.CORS_ORIGIN.split(',') : '*',
@@ -162,8 +178,45 @@ async function getSiteSettings() {
     }
 }
 
+// Files in uploads/original that scripts/dedupe_images.py made canonical for a group of
+// duplicates; only these can be referenced by more than one row
+const SHARED_FILES_PATH = path.join(__dirname, 'uploads', '.shared_files.json');
+let sharedFilesCache = { mtimeMs: null, files: new Set() };
+
+function isSharedOriginalFile(fileName) {
+    try {
+        const stat = fs.statSync(SHARED_FILES_PATH);
+        if (stat.mtimeMs !== sharedFilesCache.mtimeMs) {
+            const manifest = JSON.parse(fs.readFileSync(SHARED_FILES_PATH, 'utf8'));
+            sharedFilesCache = { mtimeMs: stat.mtimeMs, files: new Set(manifest.files || []) };
+        }
+        return sharedFilesCache.files.has(fileName);
+    } catch (error) {
+        return false;
+    }
+}
+
+// Helper: Check whether any row still points at a shared file in uploads/original, in any
+// of the forms dedupe_images.py rewrites (bare name, /uploads/original/x, absolute URL)
+async function isOriginalFileReferenced(fileName) {
+    if (!isSharedOriginalFile(fileName)) return false;
+
+    const refersTo = (column) => `(${column} = $2 OR right(${column}, length($1)) = $1)`;
+    const { rows } = await pool.query(`
+        SELECT 1 FROM images WHERE ${refersTo('url')}
+        UNION ALL SELECT 1 FROM gallery_images WHERE ${refersTo('image_path')}
+        UNION ALL SELECT 1 FROM products WHERE ${refersTo('image')} OR ${refersTo('thumbnail')}
+        UNION ALL SELECT 1 FROM categories WHERE ${refersTo('thumbnail')}
+        UNION ALL SELECT 1 FROM catalog_articles WHERE ${refersTo('thumbnail')} OR strpos(content::text, $1) > 0
+        UNION ALL SELECT 1 FROM site_settings WHERE ${refersTo('value')}
+        UNION ALL SELECT 1 FROM admin_users WHERE ${refersTo('avatar')}
+        LIMIT 1
+    `, [`uploads/original/${fileName}`, fileName]);
+    return rows.length > 0;
+}
+
 // Helper function to delete physical file
-function deletePhysicalFile(url) {
+async function deletePhysicalFile(url) {
     if (!url || typeof url !== 'string') return;
     
     // Ignore external URLs
@@ -193,6 +246,10 @@ function deletePhysicalFile(url) {
         const physicalPath = path.join(__dirname, `./uploads/${dirName}`, fileName);
         if (fs.existsSync(physicalPath)) {
             try {
+                // Keep files that other rows still use
+                if (dirName === 'original' && await isOriginalFileReferenced(fileName)) {
+                    return;
+                }
                 fs.unlinkSync(physicalPath);
             } catch (err) {
                 console.error(`Lỗi khi xoá file vật lý ${physicalPath}:`, err);
@@ -201,6 +258,31 @@ function deletePhysicalFile(url) {
     }
 }
 
+// Static JSON shards written by scripts/snapshot_export.py, which nginx serves ahead of
+// the API. Writes remove the shards they make stale, so nginx falls through to the API
+// until the next export.
+const SNAPSHOT_DIR = process.env.SNAPSHOT_DIR || path.join(__dirname, 'snapshot');
+const SNAPSHOT_SLUG_RE = /^[A-Za-z0-9._-]+$/; // same as SAFE_SLUG_RE in snapshot_export.py
+const CATEGORIES_SHARD = 'api/categories.json';
+
+const productShard = (slug) => (slug && SNAPSHOT_SLUG_RE.test(slug) ? `api/products/${slug}.json` : null);
+const articleShard = (slug) => (slug && SNAPSHOT_SLUG_RE.test(slug) ? `api/catalog-articles/${slug}.json` : null);
+
+function invalidateSnapshot(...shards) {
+    for (const shard of shards) {
+        if (!shard) continue;
+        for (const suffix of ['', '.gz', '.br']) {
+            try {
+                fs.unlinkSync(path.join(SNAPSHOT_DIR, shard + suffix));
+            } catch (err) {
+                if (err.code !== 'ENOENT') {
+                    console.error(`Lỗi khi xoá snapshot ${shard}${suffix}:`, err);
+                }
+            }
+        }
+    }
+}
+
 // API: Upload image (supports both multipart/form-data and JSON base64)
 app.post('/api/upload', upload.single('image'), async (req, res) => {
     try {
@@ -293,7 +375,7 @@ app.delete('/api/images/:id', async (req, res) => {
         if (rowCount === 0) return res.status(404).json({ error: 'Image not found' });
         
         // Delete physical file if it exists and is local
-        deletePhysicalFile(imageUrl);
+        await deletePhysicalFile(imageUrl);
         
         res.json({ success: true, message: 'Image deleted' });
     } catch (error) {
@@ -305,6 +387,29 @@ app.delete('/api/images/:id', async (req, res) => {
 // Simple memory cache for logo to avoid repeated disk I/O or network requests
 let globalLogoCache = { url: null, buffer: null };
 
+// Header-only dimensions written by scripts/image_dimensions.py, reloaded when the manifest changes
+const IMAGE_DIMENSIONS_PATH = path.join(__dirname, 'uploads', '.image_dimensions.json');
+let imageDimensionsCache = { mtimeMs: null, files: {} };
+
+function getManifestDimensions(fileName, filePath) {
+    try {
+        const manifestStat = fs.statSync(IMAGE_DIMENSIONS_PATH);
+        if (manifestStat.mtimeMs !== imageDimensionsCache.mtimeMs) {
+            const manifest = JSON.parse(fs.readFileSync(IMAGE_DIMENSIONS_PATH, 'utf8'));
+            imageDimensionsCache = { mtimeMs: manifestStat.mtimeMs, files: manifest.files || {} };
+        }
+        const entry = imageDimensionsCache.files[fileName];
+        if (!entry || !entry.width || !entry.height) return null;
+
+        // Only trust the entry if the file is unchanged since it was read (Number() rounds like JSON.parse)
+        const stat = fs.statSync(filePath, { bigint: true });
+        if (Number(stat.size) !== entry.size || Number(stat.mtimeNs) !== entry.mtime_ns) return null;
+        return { width: entry.width, height: entry.height };
+    } catch (error) {
+        return null;
+    }
+}
+
 // API: Get image (with optional watermark)
 app.get('/api/image', async (req, res) => {
     const { path: imagePath, url: externalUrl, watermark } = req.query;
@@ -340,6 +445,7 @@ app.get('/api/image', async (req, res) => {
         const originalPath = path.join(__dirname, './uploads/original', baseName);
 
         if (applyWatermark && fs.existsSync(watermarkedPath)) {
+            res.setHeader('X-Cache', 'HIT');
             res.setHeader('Content-Type', 'image/jpeg');
             res.setHeader('Cache-Control', 'public, max-age=31536000, immutable');
             res.setHeader('Content-Disposition', `attachment; filename="${baseName}"`);
@@ -366,7 +472,7 @@ app.get('/api/image', async (req, res) => {
         let finalBuffer = fs.readFileSync(originalPath);
 
         if (isEnabled && logoUrl) {
-            const metadata = await sharp(finalBuffer).metadata();
+            const metadata = getManifestDimensions(baseName, originalPath) || await sharp(finalBuffer).metadata();
             const width = metadata.width || 800;
             const height = metadata.height || 600;
 
@@ -492,6 +598,7 @@ app.get('/api/image', async (req, res) => {
         }
         fs.writeFileSync(watermarkedPath, finalBuffer);
 
+        res.setHeader('X-Cache', 'MISS');
         res.setHeader('Content-Type', 'image/jpeg');
         res.setHeader('Cache-Control', 'public, max-age=31536000, immutable');
         res.setHeader('Content-Disposition', `attachment; filename="${baseName}"`);
@@ -572,6 +679,30 @@ function generateSlug(name) {
         .replace(/-+/g, '-');
 }
 
+// Accent-folded search text: "Danh mục Phụ tùng" -> "danh muc phu tung".
+// Must match fold_text() in scripts/search_keys.py, which backfills search_key.
+function foldSearchText(text) {
+    if (!text) return '';
+
+    return String(text)
+        .normalize('NFD')
+        .replace(/[\u0300-\u036f]/g, '')
+        .replace(/đ/g, 'd')
+        .replace(/Đ/g, 'D')
+        .toLowerCase()
+        .replace(/\s+/g, ' ')
+        .trim();
+}
+
+// products.search_key = fold(name) | fold(code) | fold(manufacturer_code)
+// categories.search_key = fold(name) | fold(code)
+function buildSearchKey(...values) {
+    return values
+        .map(foldSearchText)
+        .filter(Boolean)
+        .join(' | ');
+}
+
 // Function to ensure unique slug
 async function ensureUniqueSlug(baseSlug, productId = null) {
     let slug = baseSlug;
@@ -666,9 +797,13 @@ app.get('/api/products', async (req, res) => {
         }
 
         if (search) {
-            query += ` AND (name ILIKE $${paramIndex} OR code ILIKE $${paramIndex} OR manufacturer_code ILIKE $${paramIndex})`;
+            // search_key holds the folded name, code and manufacturer_code (every write sets it,
+            // scripts/search_keys.py backfills old rows), so one trigram-indexed LIKE covers all three.
+            // Rows the backfill has not reached yet fall back to the plain ILIKE match.
+            query += ` AND (search_key LIKE $${paramIndex} OR (search_key IS NULL AND (name ILIKE $${paramIndex + 1} OR code ILIKE $${paramIndex + 1} OR manufacturer_code ILIKE $${paramIndex + 1})))`;
+            paramIndex += 2;
+            params.push(`%${foldSearchText(search)}%`);
             params.push(`%${search}%`);
-            paramIndex++;
         }
 
         if (manufacturer_code) {
@@ -949,8 +1084,8 @@ app.post('/api/webhooks/products', async (req, res) => {
 
         // Bắt đầu transaction hoặc thực hiện tuần tự
         const { rows } = await pool.query(
-            `INSERT INTO products (code, name, category_id, image, description, slug, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, created_at, updated_at)
-             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, NOW(), NOW())
+            `INSERT INTO products (code, name, category_id, image, description, slug, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, search_key, created_at, updated_at)
+             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, NOW(), NOW())
              RETURNING *`,
             [
                 code || null, 
@@ -962,11 +1097,13 @@ app.post('/api/webhooks/products', async (req, res) => {
                 vehicle_ids || [], 
                 show_on_homepage !== undefined ? show_on_homepage : true, 
                 primaryThumbnail, 
-                manufacturer_code || null
+                manufacturer_code || null,
+                buildSearchKey(name, code, manufacturer_code)
             ]
         );
 
         const newProduct = rows[0];
+        invalidateSnapshot(productShard(newProduct.slug));
 
         // Lưu ảnh vào bảng images và product_images (để hiển thị đúng trong thư viện ảnh Admin UI)
         for (let i = 0; i < downloadedImages.length; i++) {
@@ -1010,12 +1147,13 @@ app.post('/api/products', async (req, res) => {
         const slug = await ensureUniqueSlug(baseSlug);
 
         const { rows } = await pool.query(
-            `INSERT INTO products (code, name, category_id, image, description, slug, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, created_at, updated_at)
-             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, NOW(), NOW())
+            `INSERT INTO products (code, name, category_id, image, description, slug, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, search_key, created_at, updated_at)
+             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, NOW(), NOW())
              RETURNING *`,
-            [code, name, category_id, image, description, slug, vehicle_ids || [], show_on_homepage || true, thumbnail, manufacturer_code]
+            [code, name, category_id, image, description, slug, vehicle_ids || [], show_on_homepage || true, thumbnail, manufacturer_code, buildSearchKey(name, code, manufacturer_code)]
         );
 
+        invalidateSnapshot(productShard(rows[0].slug));
         res.status(201).json(rows[0]);
     } catch (error) {
         console.error('Error creating product:', error);
@@ -1039,27 +1177,48 @@ app.put('/api/products/:id', async (req, res) => {
             slug = await ensureUniqueSlug(baseSlug, id);
         }
 
-        const { rows } = await pool.query(
-            `UPDATE products SET
-                code = COALESCE($1, code),
-                name = COALESCE($2, name),
-                category_id = COALESCE($3, category_id),
-                image = COALESCE($4, image),
-                description = COALESCE($5, description),
-                slug = COALESCE($6, slug),
-                vehicle_ids = COALESCE($7, vehicle_ids),
-                show_on_homepage = COALESCE($8, show_on_homepage),
-                thumbnail = COALESCE($9, thumbnail),
-                manufacturer_code = COALESCE($10, manufacturer_code),
-                updated_at = NOW()
-             WHERE id = $11
+        const { rows, oldSlug } = await withTransaction(async (client) => {
+            const { rows: current } = await client.query(
+                'SELECT name, code, manufacturer_code, slug FROM products WHERE id = $1 FOR UPDATE',
+                [id]
+            );
+            if (current.length === 0) return { rows: [] };
+
+            // Fields left out of the body keep their stored value (COALESCE below)
+            const searchKey = buildSearchKey(
+                name ?? current[0].name,
+                code ?? current[0].code,
+                manufacturer_code ?? current[0].manufacturer_code
+            );
+
+            const { rows } = await client.query(
+                    `UPDATE products SET
+                    code = COALESCE($1, code),
+                    name = COALESCE($2, name),
+                    category_id = COALESCE($3, category_id),
+                    image = COALESCE($4, image),
+                    description = COALESCE($5, description),
+                    slug = COALESCE($6, slug),
+                    vehicle_ids = COALESCE($7, vehicle_ids),
+                    show_on_homepage = COALESCE($8, show_on_homepage),
+                    thumbnail = COALESCE($9, thumbnail),
+                    manufacturer_code = COALESCE($10, manufacturer_code),
+                    search_key = $11,
+                    updated_at = NOW()
+                 WHERE id = $12
              RETURNING *`,
-            [code, name, category_id, image, description, slug, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, id]
-        );
+                [code, name, category_id, image, description, slug, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, searchKey, id]
+            );
+            return { rows, oldSlug: current[0].slug };
+        });
 
         if (rows.length === 0) {
             return res.status(404).json({ error: 'Product not found' });
         }
+
+        // A renamed product also leaves a shard under its old slug
+        invalidateSnapshot(productShard(oldSlug), productShard(rows[0].slug));
+
         res.json(rows[0]);
     } catch (error) {
         console.error('Error updating product:', error);
@@ -1080,7 +1239,7 @@ app.delete('/api/products/:id', async (req, res) => {
         `, [id]);
         
         // Also get product image/thumbnail if they exist directly
-        const { rows: prodRows } = await pool.query('SELECT image, thumbnail FROM products WHERE id = $1', [id]);
+        const { rows: prodRows } = await pool.query('SELECT image, thumbnail, slug FROM products WHERE id = $1', [id]);
         
         // Delete the product
         const { rowCount } = await pool.query('DELETE FROM products WHERE id = $1', [id]);
@@ -1088,6 +1247,7 @@ app.delete('/api/products/:id', async (req, res) => {
         if (rowCount === 0) {
             return res.status(404).json({ error: 'Product not found' });
         }
+        if (prodRows.length > 0) invalidateSnapshot(productShard(prodRows[0].slug));
         
         // Delete physical files and records from images table
         const urlsToDelete = new Set();
@@ -1109,9 +1269,9 @@ app.delete('/api/products/:id', async (req, res) => {
         }
         
         // Delete physical files
-        urlsToDelete.forEach(url => {
-            deletePhysicalFile(url);
-        });
+        for (const url of urlsToDelete) {
+            await deletePhysicalFile(url);
+        }
 
         res.json({ success: true, message: 'Product deleted' });
     } catch (error) {
@@ -1174,10 +1334,11 @@ app.post('/api/categories', async (req, res) => {
     try {
         const { name, code, thumbnail, is_visible, is_vehicle_name, brand } = req.body;
         const { rows } = await pool.query(
-            `INSERT INTO categories (name, code, thumbnail, is_visible, is_vehicle_name, brand, created_at, updated_at)
-             VALUES ($1, $2, $3, $4, $5, $6, NOW(), NOW()) RETURNING *`,
-            [name, code, thumbnail, is_visible ?? true, is_vehicle_name ?? false, brand]
+            `INSERT INTO categories (name, code, thumbnail, is_visible, is_vehicle_name, brand, search_key, created_at, updated_at)
+             VALUES ($1, $2, $3, $4, $5, $6, $7, NOW(), NOW()) RETURNING *`,
+            [name, code, thumbnail, is_visible ?? true, is_vehicle_name ?? false, brand, buildSearchKey(name, code)]
         );
+        invalidateSnapshot(CATEGORIES_SHARD);
         res.status(201).json(rows[0]);
     } catch (error) {
         console.error('Error creating category:', error);
@@ -1191,12 +1352,6 @@ app.put('/api/categories/:id', async (req, res) => {
         const { id } = req.params;
         const body = req.body;
         
-        // 1. Get old category to check thumbnail
-        const { rows: oldCategoryRows } = await pool.query('SELECT thumbnail FROM categories WHERE id = $1', [id]);
-        if (oldCategoryRows.length === 0) return res.status(404).json({ error: 'Category not found' });
-        
-        const oldCategory = oldCategoryRows[0];
-        
         // 2. Prepare new values
         const newName = body.name !== undefined ? body.name : undefined;
         const newCode = body.code !== undefined ? body.code : undefined;
@@ -1210,24 +1365,40 @@ app.put('/api/categories/:id', async (req, res) => {
             newThumbnail = body.thumbnail || null;
         }
 
-        const { rows } = await pool.query(
-            `UPDATE categories SET 
-             name = COALESCE($1, name), 
-             code = COALESCE($2, code), 
-             thumbnail = CASE WHEN $3::boolean THEN $4 ELSE thumbnail END, 
-             is_visible = COALESCE($5, is_visible),
-             is_vehicle_name = COALESCE($6, is_vehicle_name), 
-             brand = COALESCE($7, brand), 
-             updated_at = NOW()
-             WHERE id = $8 RETURNING *`,
-            [newName, newCode, body.hasOwnProperty('thumbnail'), newThumbnail, newIsVisible, newIsVehicleName, newBrand, id]
-        );
-        
-        const newCategory = rows[0];
+        const result = await withTransaction(async (client) => {
+            // 1. Get old category to check thumbnail (locked so the search key is built from the row we update)
+            const { rows: oldCategoryRows } = await client.query(
+                'SELECT thumbnail, name, code FROM categories WHERE id = $1 FOR UPDATE',
+                [id]
+            );
+            if (oldCategoryRows.length === 0) return null;
+
+            const oldCategory = oldCategoryRows[0];
+            const searchKey = buildSearchKey(newName ?? oldCategory.name, newCode ?? oldCategory.code);
+
+            const { rows } = await client.query(
+                `UPDATE categories SET 
+                 name = COALESCE($1, name), 
+                 code = COALESCE($2, code), 
+                 thumbnail = CASE WHEN $3::boolean THEN $4 ELSE thumbnail END, 
+                 is_visible = COALESCE($5, is_visible),
+                 is_vehicle_name = COALESCE($6, is_vehicle_name), 
+                 brand = COALESCE($7, brand), 
+                 search_key = $8,
+                 updated_at = NOW()
+                 WHERE id = $9 RETURNING *`,
+                [newName, newCode, body.hasOwnProperty('thumbnail'), newThumbnail, newIsVisible, newIsVehicleName, newBrand, searchKey, id]
+            );
+            return { oldCategory, newCategory: rows[0] };
+        });
+        if (!result) return res.status(404).json({ error: 'Category not found' });
+
+        const { oldCategory, newCategory } = result;
+        invalidateSnapshot(CATEGORIES_SHARD);
         
         // 3. Delete old physical file if it changed
         if (oldCategory.thumbnail && oldCategory.thumbnail !== newCategory.thumbnail) {
-            deletePhysicalFile(oldCategory.thumbnail);
+            await deletePhysicalFile(oldCategory.thumbnail);
         }
         
         res.json(newCategory);
@@ -1254,19 +1425,21 @@ app.delete('/api/categories/:id', async (req, res) => {
         
         // Set category_id to NULL for all products in this category
         if (productCount > 0) {
-            await pool.query(
-                'UPDATE products SET category_id = NULL WHERE category_id = $1',
+            const { rows: detached } = await pool.query(
+                'UPDATE products SET category_id = NULL WHERE category_id = $1 RETURNING slug',
                 [id]
             );
+            invalidateSnapshot(...detached.map(row => productShard(row.slug)));
         }
         
         // Now delete the category
         const { rowCount } = await pool.query('DELETE FROM categories WHERE id = $1', [id]);
         if (rowCount === 0) return res.status(404).json({ error: 'Category not found' });
+        invalidateSnapshot(CATEGORIES_SHARD);
         
         // Thực hiện xoá file vật lý nếu có
         if (categoryRows.length > 0 && categoryRows[0].thumbnail) {
-            deletePhysicalFile(categoryRows[0].thumbnail);
+            await deletePhysicalFile(categoryRows[0].thumbnail);
         }
         
         res.json({ 
@@ -1296,14 +1469,15 @@ app.put('/api/site-settings', async (req, res) => {
     try {
         const updates = req.body;
         
-        // Handle site_logo physical file deletion if logo is being updated
+        // Remember the old logo if it is being replaced
+        let oldLogoUrl = null;
         if (updates.hasOwnProperty('site_logo') || updates.hasOwnProperty('company_logo')) {
             const logoKey = updates.hasOwnProperty('site_logo') ? 'site_logo' : 'company_logo';
             const newLogoUrl = updates[logoKey];
             
             const { rows } = await pool.query('SELECT value FROM site_settings WHERE key = $1', [logoKey]);
             if (rows.length > 0 && rows[0].value && rows[0].value !== newLogoUrl) {
-                deletePhysicalFile(rows[0].value);
+                oldLogoUrl = rows[0].value;
             }
         }
 
@@ -1314,6 +1488,11 @@ app.put('/api/site-settings', async (req, res) => {
                 [key, value]
             );
         }
+
+        // Delete the old logo file only once no setting points at it any more
+        if (oldLogoUrl) {
+            await deletePhysicalFile(oldLogoUrl);
+        }
         const settings = await getSiteSettings();
         res.json(settings);
     } catch (error) {
@@ -1439,6 +1618,7 @@ app.post('/api/catalog-articles', async (req, res) => {
              VALUES ($1, $2, $3, $4, $5, NOW(), NOW()) RETURNING *`,
             [title, slug, content, thumbnail, is_published ?? true]
         );
+        invalidateSnapshot(articleShard(rows[0].slug));
         res.status(201).json(rows[0]);
     } catch (error) {
         console.error('Error creating article:', error);
@@ -1480,6 +1660,7 @@ app.put('/api/catalog-articles/:id', async (req, res) => {
         );
         
         const newArticle = rows[0];
+        invalidateSnapshot(articleShard(oldArticle.slug), articleShard(newArticle.slug));
         
         // 4. Find and delete orphaned physical files
         const oldUrls = new Set();
@@ -1506,11 +1687,11 @@ app.put('/api/catalog-articles/:id', async (req, res) => {
         }
         
         // Delete physical files for orphaned URLs
-        oldUrls.forEach(url => {
+        for (const url of oldUrls) {
             if (!newUrls.has(url)) {
-                deletePhysicalFile(url);
+                await deletePhysicalFile(url);
             }
-        });
+        }
         
         res.json(newArticle);
     } catch (error) {
@@ -1525,10 +1706,11 @@ app.delete('/api/catalog-articles/:id', async (req, res) => {
         const { id } = req.params;
         
         // Lấy thông tin bài viết để trích xuất ảnh
-        const { rows: articleRows } = await pool.query('SELECT thumbnail, content FROM catalog_articles WHERE id = $1', [id]);
+        const { rows: articleRows } = await pool.query('SELECT thumbnail, content, slug FROM catalog_articles WHERE id = $1', [id]);
         
         const { rowCount } = await pool.query('DELETE FROM catalog_articles WHERE id = $1', [id]);
         if (rowCount === 0) return res.status(404).json({ error: 'Article not found' });
+        if (articleRows.length > 0) invalidateSnapshot(articleShard(articleRows[0].slug));
         
         // Tìm và xoá các file vật lý
         if (articleRows.length > 0) {
@@ -1548,9 +1730,9 @@ app.delete('/api/catalog-articles/:id', async (req, res) => {
             }
             
             // Thực hiện xoá vật lý
-            urlsToDelete.forEach(url => {
-                deletePhysicalFile(url);
-            });
+            for (const url of urlsToDelete) {
+                await deletePhysicalFile(url);
+            }
         }
         
         res.json({ success: true, message: 'Article deleted' });
@@ -1616,7 +1798,7 @@ app.delete('/api/gallery-images/:id', async (req, res) => {
         if (rowCount === 0) return res.status(404).json({ error: 'Image not found' });
         
         // Delete physical file if it exists and is local
-        deletePhysicalFile(imagePath);
+        await deletePhysicalFile(imagePath);
         
         res.json({ success: true, message: 'Image deleted' });
     } catch (error) {
@@ -1680,7 +1862,7 @@ app.delete('/api/product-images/:id', async (req, res) => {
                 const imageUrl = imageRows[0].url;
                 await pool.query('DELETE FROM images WHERE id = $1', [imageId]);
                 
-                deletePhysicalFile(imageUrl);
+                await deletePhysicalFile(imageUrl);
             }
         }
         
@@ -1710,7 +1892,7 @@ app.delete('/api/product-images/:productId/:imageId', async (req, res) => {
         await pool.query('DELETE FROM images WHERE id = $1', [imageId]);
         
         // Delete physical file
-        deletePhysicalFile(imageUrl);
+        await deletePhysicalFile(imageUrl);
         
         res.json({ success: true, message: 'Image unlinked from product' });
     } catch (error) {
@@ -1858,11 +2040,12 @@ app.put('/api/admin/profile/:userId', async (req, res) => {
         const params = [];
         let paramIndex = 1;
         
-        // Handle avatar physical file deletion if avatar is being changed
+        // Remember the old avatar if it is being changed
+        let oldAvatar = null;
         if (avatar !== undefined) {
             const { rows: userRows } = await pool.query('SELECT avatar FROM admin_users WHERE id = $1', [userId]);
             if (userRows.length > 0 && userRows[0].avatar && userRows[0].avatar !== avatar) {
-                deletePhysicalFile(userRows[0].avatar);
+                oldAvatar = userRows[0].avatar;
             }
         }
 
@@ -1894,6 +2077,11 @@ app.put('/api/admin/profile/:userId', async (req, res) => {
         params.push(userId);
 
         const { rows } = await pool.query(query, params);
+
+        // Delete the old avatar file after the row no longer points at it
+        if (oldAvatar) {
+            await deletePhysicalFile(oldAvatar);
+        }
         res.json(rows[0]);
     } catch (error) {
         console.error('Update profile error:', error);
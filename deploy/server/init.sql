@@ -85,7 +85,8 @@ CREATE TABLE public.categories (
     thumbnail character varying(500),
     is_visible boolean DEFAULT true,
     brand character varying(100),
-    slug character varying(255)
+    slug character varying(255),
+    search_key text
 );
 
 -- Tạo sequence cho categories
@@ -177,7 +178,8 @@ CREATE TABLE public.products (
     vehicle_ids integer[] DEFAULT '{}'::integer[],
     show_on_homepage boolean DEFAULT true,
     thumbnail character varying(500),
-    manufacturer_code character varying(100)
+    manufacturer_code character varying(100),
+    search_key text
 );
 
 -- Tạo sequence cho products
@@ -271,6 +273,13 @@ CREATE INDEX idx_products_vehicle_ids ON public.products USING gin (vehicle_ids)
 CREATE INDEX idx_product_images_product ON public.product_images USING btree (product_id);
 CREATE INDEX idx_product_images_image ON public.product_images USING btree (image_id);
 
+-- Tìm kiếm không dấu: search_key LIKE '%...%' dùng trigram index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_products_search_key_trgm ON public.products USING gin (search_key gin_trgm_ops);
+CREATE INDEX idx_categories_search_key_trgm ON public.categories USING gin (search_key gin_trgm_ops);
+-- Hàng chưa có search_key (chưa backfill) vẫn tìm bằng ILIKE; index rỗng khi đã backfill xong
+CREATE INDEX idx_products_search_key_missing ON public.products USING btree (id) WHERE search_key IS NULL;
+
 -- Chèn dữ liệu mẫu
 
 -- Dữ liệu admin_users (1 tài khoản admin)
@@ -283,28 +292,28 @@ INSERT INTO public.catalog_articles (id, title, slug, content, thumbnail, is_pub
 (2, 'Hướng dẫn bảo dưỡng xe tải', 'huong-dan-bao-duong-xe-tai', '{"content": "Hướng dẫn chi tiết về cách bảo dưỡng xe tải SINOTRUK"}', NULL, true, now(), now());
 
 -- Dữ liệu categories (danh mục sản phẩm)
-INSERT INTO public.categories (id, name, created_at, updated_at, is_vehicle_name, code, thumbnail, is_visible, brand, slug) VALUES 
-(1, 'CABIN & THÂN VỎ', now(), now(), false, 'CABIN', NULL, true, NULL, 'cabin-than-vo'),
-(2, 'ĐỘNG CƠ', now(), now(), false, 'ENGINE', NULL, true, NULL, 'dong-co'),
-(3, 'HỘP SỐ', now(), now(), false, 'GEARBOX', NULL, true, NULL, 'hop-so'),
-(4, 'HỆ THỐNG CẦU', now(), now(), false, 'AXLE', NULL, true, NULL, 'he-thong-cau'),
-(5, 'LY HỢP', now(), now(), false, 'CLUTCH', NULL, true, NULL, 'ly-hop'),
-(6, 'GIẰNG TREO', now(), now(), false, 'SUSPENSION', NULL, true, NULL, 'giang-treo'),
-(7, 'TRUYỀN ĐỘNG', now(), now(), false, 'DRIVESHAFT', NULL, true, NULL, 'truyen-dong'),
-(8, 'HỆ THỐNG LÁI', now(), now(), false, 'STEERING', NULL, true, NULL, 'he-thong-lai'),
-(9, 'HỆ THỐNG HÚT XẢ', now(), now(), false, 'EXHAUST', NULL, true, NULL, 'he-thong-hut-xa'),
-(10, 'HỆ THỐNG LÀM MÁT', now(), now(), false, 'COOLING', NULL, true, NULL, 'he-thong-lam-mat'),
-(11, 'HỆ THỐNG ĐIỆN', now(), now(), false, 'ELECTRIC', NULL, true, NULL, 'he-thong-dien'),
-(12, 'HỆ THỐNG NHIÊN LIỆU', now(), now(), false, 'FUEL', NULL, true, NULL, 'he-thong-nhien-lieu'),
-(13, 'HỆ THỐNG PHANH', now(), now(), false, 'BRAKING', NULL, true, NULL, 'he-thong-phanh'),
-(14, 'PHỤ TÙNG KHÁC', now(), now(), false, 'OTHER', NULL, true, NULL, 'phu-tung-khac'),
+INSERT INTO public.categories (id, name, created_at, updated_at, is_vehicle_name, code, thumbnail, is_visible, brand, slug, search_key) VALUES 
+(1, 'CABIN & THÂN VỎ', now(), now(), false, 'CABIN', NULL, true, NULL, 'cabin-than-vo', 'cabin & than vo | cabin'),
+(2, 'ĐỘNG CƠ', now(), now(), false, 'ENGINE', NULL, true, NULL, 'dong-co', 'dong co | engine'),
+(3, 'HỘP SỐ', now(), now(), false, 'GEARBOX', NULL, true, NULL, 'hop-so', 'hop so | gearbox'),
+(4, 'HỆ THỐNG CẦU', now(), now(), false, 'AXLE', NULL, true, NULL, 'he-thong-cau', 'he thong cau | axle'),
+(5, 'LY HỢP', now(), now(), false, 'CLUTCH', NULL, true, NULL, 'ly-hop', 'ly hop | clutch'),
+(6, 'GIẰNG TREO', now(), now(), false, 'SUSPENSION', NULL, true, NULL, 'giang-treo', 'giang treo | suspension'),
+(7, 'TRUYỀN ĐỘNG', now(), now(), false, 'DRIVESHAFT', NULL, true, NULL, 'truyen-dong', 'truyen dong | driveshaft'),
+(8, 'HỆ THỐNG LÁI', now(), now(), false, 'STEERING', NULL, true, NULL, 'he-thong-lai', 'he thong lai | steering'),
+(9, 'HỆ THỐNG HÚT XẢ', now(), now(), false, 'EXHAUST', NULL, true, NULL, 'he-thong-hut-xa', 'he thong hut xa | exhaust'),
+(10, 'HỆ THỐNG LÀM MÁT', now(), now(), false, 'COOLING', NULL, true, NULL, 'he-thong-lam-mat', 'he thong lam mat | cooling'),
+(11, 'HỆ THỐNG ĐIỆN', now(), now(), false, 'ELECTRIC', NULL, true, NULL, 'he-thong-dien', 'he thong dien | electric'),
+(12, 'HỆ THỐNG NHIÊN LIỆU', now(), now(), false, 'FUEL', NULL, true, NULL, 'he-thong-nhien-lieu', 'he thong nhien lieu | fuel'),
+(13, 'HỆ THỐNG PHANH', now(), now(), false, 'BRAKING', NULL, true, NULL, 'he-thong-phanh', 'he thong phanh | braking'),
+(14, 'PHỤ TÙNG KHÁC', now(), now(), false, 'OTHER', NULL, true, NULL, 'phu-tung-khac', 'phu tung khac | other'),
 -- Danh mục theo dòng xe (is_vehicle_name = true)
-(15, 'SITRAK', now(), now(), true, 'SITRAK', '/images/SITRAK.png', true, 'HOWO', 'sitrak'),
-(16, 'MAX 460HP', now(), now(), true, 'MAX460HP', '/images/MAX 460HP.png', true, 'HOWO', 'max-460hp'),
-(17, 'TH7', now(), now(), true, 'TH7', '/images/TH7.png', true, 'HOWO', 'th7'),
-(18, 'A7', now(), now(), true, 'A7', '/images/A7.png', true, 'HOWO', 'a7'),
-(19, 'V7G', now(), now(), true, 'V7G', '/images/V7G.png', true, 'HOWO', 'v7g'),
-(20, 'TX400', now(), now(), true, 'TX400', '/images/TX400.avif', true, 'HOWO', 'tx400');
+(15, 'SITRAK', now(), now(), true, 'SITRAK', '/images/SITRAK.png', true, 'HOWO', 'sitrak', 'sitrak | sitrak'),
+(16, 'MAX 460HP', now(), now(), true, 'MAX460HP', '/images/MAX 460HP.png', true, 'HOWO', 'max-460hp', 'max 460hp | max460hp'),
+(17, 'TH7', now(), now(), true, 'TH7', '/images/TH7.png', true, 'HOWO', 'th7', 'th7 | th7'),
+(18, 'A7', now(), now(), true, 'A7', '/images/A7.png', true, 'HOWO', 'a7', 'a7 | a7'),
+(19, 'V7G', now(), now(), true, 'V7G', '/images/V7G.png', true, 'HOWO', 'v7g', 'v7g | v7g'),
+(20, 'TX400', now(), now(), true, 'TX400', '/images/TX400.avif', true, 'HOWO', 'tx400', 'tx400 | tx400');
 
 
 -- Dữ liệu images mẫu
@@ -316,12 +325,12 @@ INSERT INTO public.images (id, url, public_id, created_at) VALUES
 (5, 'https://res.cloudinary.com/dbschdcyq/image/upload/v1767394995/sinotruk_products/mf5dzexa38rs8rdmyypf.jpg', NULL, now());
 
 -- Dữ liệu products mẫu
-INSERT INTO public.products (id, code, name, category_id, image, description, slug, created_at, updated_at, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code) VALUES 
-(1, 'SP001', 'Cabin xe tải HOWO', 1, NULL, 'Cabin xe tải HOWO chất lượng cao, phù hợp cho các dòng xe tải hạng nặng', 'cabin-xe-tai-howo', now(), now(), '{}', false, NULL, 'HOWO-CAB-001'),
-(2, 'SP002', 'Động cơ Weichai WP10', 2, NULL, 'Động cơ Weichai WP10 công suất 336HP, tiết kiệm nhiên liệu', 'dong-co-weichai-wp10', now(), now(), '{}', true, NULL, 'WC-WP10-336'),
-(3, 'SP003', 'Hộp số Fast Gear 12JS160T', 3, NULL, 'Hộp số Fast Gear 12 cấp, truyền lực mạnh mẽ', 'hop-so-fast-gear-12js160t', now(), now(), '{}', false, NULL, 'FG-12JS160T'),
-(4, 'SP004', 'Cầu sau HANDE 13T', 4, NULL, 'Cầu sau HANDE tải trọng 13 tấn, độ bền cao', 'cau-sau-hande-13t', now(), now(), '{}', true, NULL, 'HD-REAR-13T'),
-(5, 'SP005', 'Ly hợp SACHS 430mm', 5, NULL, 'Ly hợp SACHS đường kính 430mm, chất lượng Đức', 'ly-hop-sachs-430mm', now(), now(), '{}', false, NULL, 'SACHS-430');
+INSERT INTO public.products (id, code, name, category_id, image, description, slug, created_at, updated_at, vehicle_ids, show_on_homepage, thumbnail, manufacturer_code, search_key) VALUES 
+(1, 'SP001', 'Cabin xe tải HOWO', 1, NULL, 'Cabin xe tải HOWO chất lượng cao, phù hợp cho các dòng xe tải hạng nặng', 'cabin-xe-tai-howo', now(), now(), '{}', false, NULL, 'HOWO-CAB-001', 'cabin xe tai howo | sp001 | howo-cab-001'),
+(2, 'SP002', 'Động cơ Weichai WP10', 2, NULL, 'Động cơ Weichai WP10 công suất 336HP, tiết kiệm nhiên liệu', 'dong-co-weichai-wp10', now(), now(), '{}', true, NULL, 'WC-WP10-336', 'dong co weichai wp10 | sp002 | wc-wp10-336'),
+(3, 'SP003', 'Hộp số Fast Gear 12JS160T', 3, NULL, 'Hộp số Fast Gear 12 cấp, truyền lực mạnh mẽ', 'hop-so-fast-gear-12js160t', now(), now(), '{}', false, NULL, 'FG-12JS160T', 'hop so fast gear 12js160t | sp003 | fg-12js160t'),
+(4, 'SP004', 'Cầu sau HANDE 13T', 4, NULL, 'Cầu sau HANDE tải trọng 13 tấn, độ bền cao', 'cau-sau-hande-13t', now(), now(), '{}', true, NULL, 'HD-REAR-13T', 'cau sau hande 13t | sp004 | hd-rear-13t'),
+(5, 'SP005', 'Ly hợp SACHS 430mm', 5, NULL, 'Ly hợp SACHS đường kính 430mm, chất lượng Đức', 'ly-hop-sachs-430mm', now(), now(), '{}', false, NULL, 'SACHS-430', 'ly hop sachs 430mm | sp005 | sachs-430');
 
 -- Dữ liệu product_images mẫu (liên kết sản phẩm với hình ảnh)
 INSERT INTO public.product_images (id, product_id, image_id, sort_order, is_primary, created_at) VALUES 
@@ -358,7 +367,10 @@ SELECT setval('public.site_settings_id_seq', (SELECT MAX(id) FROM public.site_se
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.updated_at = now();
+    -- search_key là dữ liệu dẫn xuất: chỉ cập nhật search_key thì không đổi updated_at
+    IF to_jsonb(NEW) - 'search_key' IS DISTINCT FROM to_jsonb(OLD) - 'search_key' THEN
+        NEW.updated_at = now();
+    END IF;
     RETURN NEW;
 END;
 $$ language 'plpgsql';
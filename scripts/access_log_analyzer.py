@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Access Log Analyzer - SINOTRUK
+Streams nginx access logs written with the sinotruk_timing format
+(deploy/nginx/timing_log.conf), including gzip-rotated files, and reports
+per-route p50/p99 latency, upstream time, bytes sent, cache-miss rate and
+5xx count - everything stays on the machine.
+
+Requests are grouped by route template (/api/products/:identifier,
+/api/image?watermark, ...). Templates come from the app.get/post/put/delete
+routes in deploy/server/index.js, so new endpoints are picked up
+automatically. Latencies go into fixed-bucket histograms that can be merged,
+so files are analyzed in parallel and results from several servers can be
+combined with --merge.
+
+Usage:
+    python scripts/access_log_analyzer.py /www/wwwlogs/hanoi-sinotruk.com.timing.log*
+    python scripts/access_log_analyzer.py --merge server1.json server2.json
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import argparse
+from bisect import bisect_left
+from datetime import datetime
+from urllib.parse import parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+from server_utils import BASE_PATH, SERVER_DIR
+
+SERVER_FILE = os.path.join(SERVER_DIR, "index.js")
+
+LINE_RE = re.compile(
+    r'(?P<addr>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+)[^"]*" '
+    r'(?P<status>\d{3}) (?P<bytes>\d+|-) "[^"]*" "[^"]*"'
+    r'(?: rt=(?P<rt>[\d.]+))?(?: urt="(?P<urt>[^"]*)")?(?: ucs="(?P<ucs>[^"]*)")?(?: xc="(?P<xc>[^"]*)")?'
+)
+ROUTE_RE = re.compile(r"app\.(get|post|put|delete)\('(/api/[^']*)'")
+STATIC_RE = re.compile(r"\.(js|css|png|jpe?g|gif|ico|svg|woff2?|ttf|eot|webp|avif)$", re.I)
+ADMIN_SPECIFIC = ("/api/admin/login", "/api/admin/logout", "/api/admin/profile")
+
+# Latency bucket upper bounds in milliseconds: 0.5ms .. ~5min, ~12% apart
+BUCKET_BOUNDS_MS = [round(0.5 * 1.12 ** i, 3) for i in range(118)]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; histograms with the same bounds merge by adding counts"""
+
+    def __init__(self, counts=None):
+        self.counts = counts or [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, value_ms):
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th value (None when empty)"""
+        total = self.total
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else float("inf")
+        return None
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.total_ms = 0.0
+        self.errors_5xx = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency = Histogram()
+        self.upstream = Histogram()
+
+    def add(self, status, bytes_sent, rt_ms, urt_ms, cache_status):
+        self.requests += 1
+        self.bytes_sent += bytes_sent
+        if status >= 500:
+            self.errors_5xx += 1
+        if rt_ms is not None:
+            self.total_ms += rt_ms
+            self.latency.add(rt_ms)
+        if urt_ms is not None:
+            self.upstream.add(urt_ms)
+        if cache_status in ("HIT", "STALE", "REVALIDATED"):
+            self.cache_hits += 1
+        elif cache_status in ("MISS", "EXPIRED", "BYPASS"):
+            self.cache_misses += 1
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.bytes_sent += other.bytes_sent
+        self.total_ms += other.total_ms
+        self.errors_5xx += other.errors_5xx
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.latency.merge(other.latency)
+        self.upstream.merge(other.upstream)
+
+    def to_dict(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "requests": self.requests,
+            "bytes_sent": self.bytes_sent,
+            "total_ms": round(self.total_ms, 3),
+            "errors_5xx": self.errors_5xx,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_miss_rate": round(self.cache_misses / lookups, 4) if lookups else None,
+            "p50_ms": self.latency.quantile(0.50),
+            "p99_ms": self.latency.quantile(0.99),
+            "upstream_p50_ms": self.upstream.quantile(0.50),
+            "upstream_p99_ms": self.upstream.quantile(0.99),
+            "latency_histogram": self.latency.counts,
+            "upstream_histogram": self.upstream.counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for key in ("requests", "bytes_sent", "total_ms", "errors_5xx", "cache_hits", "cache_misses"):
+            setattr(stats, key, data[key])
+        stats.latency = Histogram(list(data["latency_histogram"]))
+        stats.upstream = Histogram(list(data["upstream_histogram"]))
+        return stats
+
+
+def load_route_templates(server_file=SERVER_FILE):
+    """[(method, regex, template)] in registration order, as Express matches them"""
+    try:
+        with open(server_file, "r", encoding="utf-8") as f:
+            source = f.read()
+    except OSError:
+        return []
+    routes = []
+    for method, template in ROUTE_RE.findall(source):
+        pattern = re.sub(r":\w+", "[^/]+", re.escape(template).replace("\\:", ":"))
+        routes.append((method.upper(), re.compile(pattern + "/?$"), template))
+    return routes
+
+
+def route_template(method, target, routes):
+    """Collapse a request target into the route template it was served by"""
+    path, _, query = target.partition("?")
+    if path.startswith("/api/admin/") and not path.startswith(ADMIN_SPECIFIC):
+        # Same rewrite as the middleware in index.js
+        path = "/api/" + path[len("/api/admin/"):]
+
+    if path == "/api/image":
+        params = parse_qs(query)
+        if "url" in params:
+            return "GET /api/image?url"
+        return "GET /api/image?watermark" if params.get("watermark") == ["true"] else "GET /api/image"
+
+    if path.startswith("/api/"):
+        for route_method, regex, template in routes:
+            if route_method == method and regex.match(path):
+                return f"{method} {template}"
+        return f"{method} /api/(unmatched)"
+    if path.startswith("/uploads/"):
+        return f"{method} /uploads/{path.split('/')[2]}/:file" if path.count("/") > 2 else f"{method} /uploads"
+    if path.startswith("/secret"):
+        return f"{method} /secret (admin)"
+    match = STATIC_RE.search(path)
+    if match:
+        return f"{method} static *.{match.group(1).lower()}"
+    return f"{method} / (spa)"
+
+
+def open_log(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def upstream_ms(value):
+    """$upstream_response_time can list several upstreams ("0.010, 0.020") or be "-" """
+    if not value or value == "-":
+        return None
+    total = 0.0
+    for part in value.replace(":", ",").split(","):
+        part = part.strip()
+        if part and part != "-":
+            total += float(part)
+    return total * 1000
+
+
+def analyze_file(path):
+    """Stream one log file; returns (stats dicts by route, lines read, lines skipped)"""
+    routes = load_route_templates()
+    by_route = {}
+    lines = skipped = 0
+    with open_log(path) as f:
+        for line in f:
+            lines += 1
+            match = LINE_RE.match(line)
+            if not match:
+                skipped += 1
+                continue
+            key = route_template(match.group("method"), match.group("target"), routes)
+            stats = by_route.get(key)
+            if stats is None:
+                stats = by_route[key] = RouteStats()
+            rt = match.group("rt")
+            cache_status = match.group("ucs") or ""
+            if cache_status in ("", "-"):
+                cache_status = match.group("xc") or ""
+            stats.add(
+                int(match.group("status")),
+                int(match.group("bytes")) if match.group("bytes") != "-" else 0,
+                float(rt) * 1000 if rt else None,
+                upstream_ms(match.group("urt")),
+                cache_status,
+            )
+    return {k: v.to_dict() for k, v in by_route.items()}, lines, skipped
+
+
+def merge_into(totals, by_route):
+    for key, data in by_route.items():
+        stats = RouteStats.from_dict(data)
+        if key in totals:
+            totals[key].merge(stats)
+        else:
+            totals[key] = stats
+
+
+def format_ms(value):
+    if value is None:
+        return "-"
+    return f"{value / 1000:.2f}s" if value >= 1000 else f"{value:.0f}ms"
+
+
+def print_report(totals, top):
+    ranked = sorted(totals.items(), key=lambda kv: kv[1].total_ms, reverse=True)
+    print(f"\n  {'Route':<52} {'Reqs':>8} {'p50':>7} {'p99':>7} {'Time':>9} {'MB':>8} {'Miss':>6} {'5xx':>5}")
+    print(f"  {'─' * 108}")
+    for key, stats in ranked[:top]:
+        d = stats.to_dict()
+        miss = f"{d['cache_miss_rate']:.0%}" if d["cache_miss_rate"] is not None else "-"
+        print(
+            f"  {key[:52]:<52} {d['requests']:>8} {format_ms(d['p50_ms']):>7} {format_ms(d['p99_ms']):>7} "
+            f"{d['total_ms'] / 1000:>8.1f}s {d['bytes_sent'] / 1024 / 1024:>8.1f} {miss:>6} {d['errors_5xx']:>5}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-route latency report from nginx timing logs")
+    parser.add_argument("logs", nargs="*", help="access log files (.gz supported)")
+    parser.add_argument("--merge", nargs="+", default=[], help="merge results JSON files from earlier runs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="files analyzed in parallel")
+    parser.add_argument("--top", type=int, default=25, help="routes shown in the console report")
+    parser.add_argument("--output", default=os.path.join(BASE_PATH, "scripts/access_log_results.json"))
+    args = parser.parse_args()
+
+    if not args.logs and not args.merge:
+        parser.error("give at least one log file or --merge")
+
+    print("=" * 70)
+    print("  ACCESS LOG ANALYZER - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    totals = {}
+    lines = skipped = 0
+    for path in args.merge:
+        with open(path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("bucket_bounds_ms") != BUCKET_BOUNDS_MS:
+            print(f"  ❌ {path} uses different histogram buckets, skipped")
+            continue
+        merge_into(totals, previous["routes"])
+        lines += previous.get("lines", 0)
+        skipped += previous.get("skipped", 0)
+
+    if args.logs:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(args.logs))) as pool:
+            for path, (by_route, file_lines, file_skipped) in zip(args.logs, pool.map(analyze_file, args.logs)):
+                print(f"  📄 {path}: {file_lines} lines ({file_skipped} unparsed)")
+                merge_into(totals, by_route)
+                lines += file_lines
+                skipped += file_skipped
+
+    print_report(totals, args.top)
+    if skipped:
+        print(f"\n  ⚠️  {skipped}/{lines} lines did not match the sinotruk_timing format")
+
+    output = {
+        "sources": args.logs + args.merge,
+        "lines": lines,
+        "skipped": skipped,
+        "bucket_bounds_ms": BUCKET_BOUNDS_MS,
+        "routes": {key: stats.to_dict() for key, stats in sorted(totals.items())},
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Parallel Database Loader - SINOTRUK
+Restores a plain SQL dump (deploy/server/init.sql, pg_dump output, the
+sinotruk_full_backup.sql used by reset-database.bat) much faster than
+replaying it statement by statement:
+
+1. The dump is read once as a stream and split into
+   - pre-data: schema, sequences, functions, column defaults
+   - per-table COPY scripts: INSERT rows are converted to COPY text format,
+     existing COPY blocks are passed through unchanged
+   - indexes and primary/unique keys, foreign keys, triggers, setval
+2. Pre-data runs first, then tables are loaded in parallel psql sessions
+   (largest first; tables with inline REFERENCES wait for their parents).
+3. Indexes and keys are built after the data is in, per table in parallel,
+   followed by foreign keys, triggers, sequence values and ANALYZE.
+
+INSERT values that COPY cannot take literally (now(), other expressions) are
+resolved once: now()/CURRENT_TIMESTAMP become the database's current
+timestamp; anything else is kept as an INSERT after the table's COPY data.
+
+Usage:
+    python scripts/db_loader.py                                  # deploy/server/init.sql
+    python scripts/db_loader.py deploy/sinotruk_full_backup.sql --clean --workers 8
+    python scripts/db_loader.py backup.sql --dry-run             # split only, show the plan
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import server_utils
+import sql_dump
+from server_utils import escape_copy_field, quote_ident
+
+DEFAULT_DUMP = os.path.join(server_utils.SERVER_DIR, "init.sql")
+
+INDEX_RE = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\b.*?\bON\s+(?:ONLY\s+)?([\w.\"]+)", re.I | re.S)
+ALTER_TABLE_RE = re.compile(r"ALTER\s+TABLE\s+(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?([\w.\"]+)", re.I)
+ADD_KEY_RE = re.compile(r"\bADD\s+(?:CONSTRAINT\s+\S+\s+)?(PRIMARY\s+KEY|UNIQUE|EXCLUDE)\b", re.I)
+FOREIGN_KEY_RE = re.compile(r"\bFOREIGN\s+KEY\b", re.I)
+CREATE_TABLE_RE = re.compile(r"CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)", re.I)
+REFERENCES_RE = re.compile(r"\bREFERENCES\s+([\w.\"]+)", re.I)
+TRIGGER_RE = re.compile(r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:CONSTRAINT\s+)?TRIGGER\b", re.I)
+SETVAL_RE = re.compile(r"SELECT\s+(?:pg_catalog\.)?setval\s*\(", re.I)
+
+# Unquoted INSERT values COPY accepts as they are (an optional ::cast is dropped)
+LITERAL_RE = re.compile(r"^(NULL|[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false)(?:::[\w \[\]]+)?$", re.I)
+NOW_RE = re.compile(r"^(now\(\)|CURRENT_TIMESTAMP|LOCALTIMESTAMP|transaction_timestamp\(\))(?:::[\w \[\]]+)?$", re.I)
+ARRAY_RE = re.compile(r"^ARRAY\[([-+\d.,\s]*)\](?:::[\w \[\]]+)?$", re.I)
+
+SESSION_SETTINGS = "SET synchronous_commit = off;\nSET client_min_messages = warning;\n"
+
+
+class NotCopyable(ValueError):
+    """An INSERT value that is an expression COPY cannot evaluate"""
+
+
+def copy_field(value, now_text):
+    if value is None:
+        return "\\N"
+    if isinstance(value, sql_dump.SqlExpr):
+        match = LITERAL_RE.match(value)
+        if match:
+            return "\\N" if match.group(1).upper() == "NULL" else match.group(1)
+        if NOW_RE.match(value):
+            return now_text
+        match = ARRAY_RE.match(value)
+        if match:
+            return "{" + ",".join(p.strip() for p in match.group(1).split(",") if p.strip()) + "}"
+        raise NotCopyable(value)
+    return escape_copy_field(value)
+
+
+def sql_value(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, sql_dump.SqlExpr):
+        return str(value)
+    return server_utils.quote_literal(value)
+
+
+class TableSpool:
+    """psql script for one table: COPY sections (one per column list) plus leftover INSERTs"""
+
+    def __init__(self, table, directory):
+        self.table = table
+        self.path = os.path.join(directory, re.sub(r"[^\w.]+", "_", table) + ".sql")
+        self.f = open(self.path, "w", encoding="utf-8")
+        self.f.write(SESSION_SETTINGS)
+        self.section = None
+        self.rows = 0
+        self.inserts = 0
+
+    def _target(self, columns):
+        if columns is None:
+            return self.table
+        return f"{self.table} ({', '.join(quote_ident(c) for c in columns)})"
+
+    def _end_section(self):
+        if self.section is not None:
+            self.f.write("\\.\n")
+            self.section = None
+
+    def copy_line(self, columns, line):
+        key = tuple(columns) if columns else ()
+        if self.section != key:
+            self._end_section()
+            self.f.write(f"COPY {self._target(columns)} FROM stdin;\n")
+            self.section = key
+        self.f.write(line + "\n")
+        self.rows += 1
+
+    def insert(self, columns, values):
+        self._end_section()
+        self.f.write(f"INSERT INTO {self._target(columns)} VALUES ({', '.join(sql_value(v) for v in values)});\n")
+        self.rows += 1
+        self.inserts += 1
+
+    def close(self):
+        self._end_section()
+        self.f.close()
+
+
+def table_of(name):
+    return sql_dump.normalize_table(name)
+
+
+def split_dump(path, spool_dir, now_text):
+    """Stream the dump into the load plan"""
+    plan = {"pre": [], "keys": {}, "foreign_keys": [], "post": [], "depends": {}}
+    spools = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for kind, table, columns, payload in sql_dump.iter_dump_statements(f):
+            if kind == "sql":
+                classify(payload, plan)
+                continue
+            spool = spools.get(table)
+            if spool is None:
+                spool = spools[table] = TableSpool(table, spool_dir)
+            if kind == "copy":
+                spool.copy_line(columns, payload)
+                continue
+            try:
+                spool.copy_line(columns, "\t".join(copy_field(v, now_text) for v in payload))
+            except NotCopyable:
+                spool.insert(columns, payload)
+    for spool in spools.values():
+        spool.close()
+    return plan, spools
+
+
+def classify(statement, plan):
+    text = statement.strip()
+    match = INDEX_RE.match(text)
+    if match:
+        plan["keys"].setdefault(table_of(match.group(1)), []).append(text)
+        return
+    match = ALTER_TABLE_RE.match(text)
+    if match and FOREIGN_KEY_RE.search(text):
+        plan["foreign_keys"].append(text)
+        return
+    if match and ADD_KEY_RE.search(text):
+        plan["keys"].setdefault(table_of(match.group(1)), []).append(text)
+        return
+    if TRIGGER_RE.match(text) or SETVAL_RE.match(text):
+        plan["post"].append(text)
+        return
+    match = CREATE_TABLE_RE.match(text)
+    if match:
+        # Inline REFERENCES are checked during the load, so the parent must be loaded first
+        table = table_of(match.group(1))
+        parents = {table_of(name) for name in REFERENCES_RE.findall(text)} - {table}
+        if parents:
+            plan["depends"][table] = parents
+    plan["pre"].append(text)
+
+
+def database_now(url):
+    """localtimestamp as text, valid for both timestamp and timestamptz columns in the same session timezone"""
+    return server_utils.run_sql("SELECT localtimestamp::text;", url).strip()
+
+
+def run_parallel(jobs, workers, label):
+    """Run {name: fn} in a thread pool; returns {name: seconds} and raises on the first failure"""
+    timings = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(timed, fn): name for name, fn in jobs.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            timings[name] = future.result()
+            print(f"  ✅ {label} {name}: {timings[name]:.1f}s")
+    return timings
+
+
+def timed(fn):
+    started = time.time()
+    fn()
+    return time.time() - started
+
+
+def load_tables(spools, depends, url, workers):
+    """Load in waves: a table starts once every table it references inline is loaded"""
+    remaining = dict(spools)
+    timings = {}
+    while remaining:
+        wave = {
+            name: spool for name, spool in remaining.items()
+            if not (depends.get(name, set()) & set(remaining))
+        }
+        if not wave:
+            # Circular or missing parents - load the rest together and let PostgreSQL decide
+            wave = dict(remaining)
+        ordered = sorted(wave.values(), key=lambda s: s.rows, reverse=True)
+        jobs = {
+            spool.table: (lambda p=spool.path: server_utils.run_sql_file(p, url, single_transaction=True))
+            for spool in ordered
+        }
+        for name, seconds in run_parallel(jobs, workers, "loaded").items():
+            timings[name] = seconds
+            remaining.pop(name)
+    return timings
+
+
+def build_keys(keys, url, workers, maintenance_work_mem):
+    settings = f"SET maintenance_work_mem = {server_utils.quote_literal(maintenance_work_mem)};\n"
+    jobs = {
+        table: (lambda sql=settings + "\n".join(statements): server_utils.run_sql(sql, url))
+        for table, statements in keys.items()
+    }
+    return run_parallel(jobs, workers, "indexed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore a SQL dump with parallel COPY loads")
+    parser.add_argument("dump", nargs="?", default=DEFAULT_DUMP, help="plain SQL dump (default: deploy/server/init.sql)")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 4, 8), help="parallel psql sessions")
+    parser.add_argument("--clean", action="store_true", help="drop and recreate the public schema first")
+    parser.add_argument("--maintenance-work-mem", default="512MB", help="memory for each index build")
+    parser.add_argument("--spool-dir", help="keep the per-table COPY scripts here (default: a temp dir)")
+    parser.add_argument("--dry-run", action="store_true", help="split the dump and print the plan without loading")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/db_loader_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  PARALLEL DATABASE LOADER - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  Dump: {args.dump}")
+    print("=" * 70)
+
+    if not os.path.isfile(args.dump):
+        print(f"  ❌ Dump not found: {args.dump}")
+        return 1
+
+    started = time.time()
+    temp_dir = None
+    if args.spool_dir:
+        os.makedirs(args.spool_dir, exist_ok=True)
+        spool_dir = args.spool_dir
+    else:
+        temp_dir = tempfile.TemporaryDirectory(prefix="db_loader_")
+        spool_dir = temp_dir.name
+
+    try:
+        now_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f") if args.dry_run else database_now(args.database_url)
+        plan, spools = split_dump(args.dump, spool_dir, now_text)
+        split_seconds = time.time() - started
+        total_rows = sum(s.rows for s in spools.values())
+        print(f"\n  📄 Split in {split_seconds:.1f}s: {len(plan['pre'])} schema statements, "
+              f"{len(spools)} tables, {total_rows} rows, "
+              f"{sum(len(v) for v in plan['keys'].values())} indexes/keys, {len(plan['foreign_keys'])} foreign keys")
+        for spool in spools.values():
+            if spool.inserts:
+                print(f"  ⚠️  {spool.table}: {spool.inserts} rows kept as INSERT (expressions COPY cannot evaluate)")
+
+        load_times = {}
+        key_times = {}
+        if not args.dry_run:
+            pre_sql = "\n".join(plan["pre"])
+            if args.clean:
+                pre_sql = "DROP SCHEMA IF EXISTS public CASCADE;\nCREATE SCHEMA public;\n" + pre_sql
+            print("\n  🔄 Schema")
+            server_utils.run_sql(pre_sql, args.database_url, single_transaction=True)
+
+            print(f"\n  🔄 Data ({args.workers} workers)")
+            load_times = load_tables(spools, plan["depends"], args.database_url, args.workers)
+
+            print("\n  🔄 Indexes and keys")
+            key_times = build_keys(plan["keys"], args.database_url, args.workers, args.maintenance_work_mem)
+
+            print("\n  🔄 Foreign keys, triggers, sequences")
+            post_sql = "\n".join(plan["foreign_keys"] + plan["post"] + ["ANALYZE;"])
+            server_utils.run_sql(post_sql, args.database_url, single_transaction=True)
+    except server_utils.PsqlError as e:
+        print(f"  ❌ Load failed: {e}")
+        return 1
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+    elapsed = time.time() - started
+    tables = {}
+    print(f"\n  {'Table':<28} {'Rows':>10} {'Load':>8} {'Rows/s':>10} {'Index':>8}")
+    print(f"  {'─' * 68}")
+    for name, spool in sorted(spools.items(), key=lambda kv: kv[1].rows, reverse=True):
+        seconds = load_times.get(name)
+        rate = spool.rows / seconds if seconds else None
+        tables[name] = {
+            "rows": spool.rows,
+            "insert_rows": spool.inserts,
+            "load_seconds": round(seconds, 3) if seconds is not None else None,
+            "rows_per_second": round(rate) if rate else None,
+            "index_seconds": round(key_times[name], 3) if name in key_times else None,
+        }
+        print(f"  {name[:28]:<28} {spool.rows:>10} "
+              f"{(f'{seconds:.1f}s' if seconds is not None else '-'):>8} "
+              f"{(f'{rate:.0f}' if rate else '-'):>10} "
+              f"{(f'{key_times[name]:.1f}s' if name in key_times else '-'):>8}")
+    print(f"\n  Elapsed: {elapsed:.1f}s")
+
+    output = {
+        "dump": args.dump,
+        "dry_run": args.dry_run,
+        "workers": args.workers,
+        "tables": tables,
+        "foreign_keys": len(plan["foreign_keys"]),
+        "elapsed_seconds": round(elapsed, 2),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Image Deduplication Planner - SINOTRUK
+Uploads and downloadAndSaveImage store every file under a fresh
+Date.now()-random name, so re-importing a supplier catalog stores the same
+image again and again. This script hashes uploads/original on a process pool
+and writes a deterministic rewrite plan:
+
+- dedupe_plan.sql: points every image column at one canonical copy per group
+- dedupe_remove.txt: duplicate files (and their wm_ cache entries) to delete
+  once the SQL has been applied
+- uploads/.shared_files.json: the canonical files, which deletePhysicalFile in
+  index.js only removes once no row references them any more
+
+References are rewritten in every form the server stores: a bare name (Excel
+import), /uploads/original/<name>, uploads/original/<name> and absolute
+https://host/uploads/original/<name> URLs. If a duplicate is still mentioned
+anywhere after the rewrite, the plan raises an error and rolls back, and
+none of the files in dedupe_remove.txt may be deleted.
+
+Only files that share a byte size with another file are hashed, large files
+are hashed through mmap, and results are kept in uploads/.hash_index.json so
+later runs only hash new or changed files.
+
+Usage:
+    python scripts/dedupe_images.py
+    python scripts/dedupe_images.py --workers 8 --plan-dir /tmp/dedupe
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import server_utils
+from server_utils import quote_literal
+
+INDEX_NAME = ".hash_index.json"
+INDEX_VERSION = 1
+SHARED_NAME = ".shared_files.json"
+MMAP_THRESHOLD = 4 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+UPLOAD_PATH = "uploads/original/"
+
+# (table, column) pairs holding a bare <name> or a path/URL ending in uploads/original/<name>
+IMAGE_COLUMNS = [
+    ("images", "url"),
+    ("gallery_images", "image_path"),
+    ("products", "image"),
+    ("products", "thumbnail"),
+    ("categories", "thumbnail"),
+    ("catalog_articles", "thumbnail"),
+    ("site_settings", "value"),
+    ("admin_users", "avatar"),
+]
+
+
+def hash_file(path):
+    """sha256 of a file; large files are mapped instead of read"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+        else:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "files": {}}
+
+
+def save_index(path, index):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def scan_files(directory):
+    """{name: (size, mtime_ns)} for every file in uploads/original"""
+    files = {}
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False) and not entry.name.startswith("."):
+                st = entry.stat(follow_symlinks=False)
+                files[entry.name] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def update_hashes(directory, files, index, workers):
+    """Hash files that may have a duplicate and are not already indexed; returns how many were hashed"""
+    cached = index["files"]
+    by_size = defaultdict(list)
+    for name, (size, _) in files.items():
+        by_size[size].append(name)
+
+    todo = []
+    for size, names in by_size.items():
+        if len(names) < 2 or size == 0:
+            continue
+        for name in names:
+            entry = cached.get(name)
+            if not entry or entry["size"] != files[name][0] or entry["mtime_ns"] != files[name][1]:
+                todo.append(name)
+
+    if todo:
+        todo.sort()
+        paths = [os.path.join(directory, name) for name in todo]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, digest in zip(todo, pool.map(hash_file, paths, chunksize=16)):
+                size, mtime_ns = files[name]
+                cached[name] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+
+    # Forget files that no longer exist
+    for name in list(cached):
+        if name not in files:
+            del cached[name]
+    return len(todo)
+
+
+def duplicate_groups(files, index):
+    """Groups of identical files; the oldest file (then name) is canonical"""
+    by_hash = defaultdict(list)
+    for name, entry in index["files"].items():
+        if name in files:
+            by_hash[entry["sha256"]].append(name)
+
+    groups = []
+    for digest, names in by_hash.items():
+        if len(names) < 2:
+            continue
+        names.sort(key=lambda n: (files[n][1], n))
+        groups.append({"sha256": digest, "canonical": names[0], "duplicates": names[1:], "size": files[names[0]][0]})
+    groups.sort(key=lambda g: g["canonical"])
+    return groups
+
+
+def build_sql_plan(groups):
+    lines = [
+        "-- Image deduplication plan generated by scripts/dedupe_images.py",
+        "-- Apply before removing the files listed in dedupe_remove.txt.",
+        "BEGIN;",
+        "",
+        "CREATE TEMP TABLE dedupe_map (old_name text PRIMARY KEY, new_name text NOT NULL) ON COMMIT DROP;",
+    ]
+    pairs = [(dup, g["canonical"]) for g in groups for dup in g["duplicates"]]
+    for start in range(0, len(pairs), 1000):
+        chunk = pairs[start:start + 1000]
+        values = ",\n".join(f"    ({quote_literal(old)}, {quote_literal(new)})" for old, new in chunk)
+        lines.append(f"INSERT INTO dedupe_map (old_name, new_name) VALUES\n{values};")
+    lines.append("")
+
+    # Join on the last path segment, then require a bare name or an .../uploads/original/<name> suffix;
+    # only the file name is swapped, so absolute URLs keep their host
+    path = quote_literal(UPLOAD_PATH)
+    for table, column in IMAGE_COLUMNS:
+        lines.append(
+            f"UPDATE {table} t SET {column} = left(t.{column}, length(t.{column}) - length(m.old_name)) || m.new_name\n"
+            f"FROM dedupe_map m WHERE m.old_name = regexp_replace(t.{column}, '^.*/', '')\n"
+            f"  AND (t.{column} = m.old_name OR right(t.{column}, length(m.old_name) + {len(UPLOAD_PATH)}) = {path} || m.old_name);"
+        )
+
+    # Article bodies can embed several images, so rewrite them one mapping at a time
+    lines += [
+        "",
+        "DO $$",
+        "DECLARE m record;",
+        "BEGIN",
+        "    FOR m IN SELECT old_name, new_name FROM dedupe_map ORDER BY old_name LOOP",
+        "        UPDATE catalog_articles",
+        f"        SET content = replace(content::text, {path} || m.old_name, {path} || m.new_name)::jsonb",
+        f"        WHERE strpos(content::text, {path} || m.old_name) > 0;",
+        "    END LOOP;",
+        "END $$;",
+        "",
+    ]
+
+    # Any mention left (query strings, other directories, ...) means the file is still in use
+    checks = [f"SELECT m.old_name FROM dedupe_map m JOIN {table} t ON strpos(t.{column}, m.old_name) > 0"
+              for table, column in IMAGE_COLUMNS]
+    checks.append("SELECT m.old_name FROM dedupe_map m JOIN catalog_articles t ON strpos(t.content::text, m.old_name) > 0")
+    union = "\n        UNION ALL ".join(checks)
+    lines += [
+        "DO $$",
+        "DECLARE leftover text;",
+        "BEGIN",
+        f"    SELECT old_name INTO leftover FROM (\n        {union}\n    ) refs LIMIT 1;",
+        "    IF leftover IS NOT NULL THEN",
+        "        RAISE EXCEPTION 'dedupe: % is still referenced in a form this plan does not rewrite; "
+        "nothing was changed, do not remove any file', leftover;",
+        "    END IF;",
+        "END $$;",
+        "",
+        "COMMIT;",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def build_removal_list(groups):
+    lines = []
+    for group in groups:
+        for dup in group["duplicates"]:
+            lines.append(f"original/{dup}")
+            lines.append(f"watermarked/wm_{dup}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def update_shared_files(path, files, groups):
+    """Canonical files of this and earlier runs that still exist; index.js reads this list"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            shared = set(json.load(f).get("files", []))
+    except (OSError, ValueError):
+        shared = set()
+    shared.update(g["canonical"] for g in groups)
+    shared = sorted(name for name in shared if name in files)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"files": shared}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return len(shared)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate uploaded images and plan their removal")
+    parser.add_argument("--uploads-dir", help="uploads directory (default: UPLOAD_DIR or deploy/server/uploads)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="hashing processes (default: CPU count)")
+    parser.add_argument("--plan-dir", default=os.path.join(server_utils.BASE_PATH, "scripts"),
+                        help="where to write dedupe_plan.sql and dedupe_remove.txt")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/dedupe_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  IMAGE DEDUPLICATION PLANNER - SINOTRUK uploads/original")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    uploads = server_utils.upload_dir(args.uploads_dir)
+    directory = os.path.join(uploads, "original")
+    if not os.path.isdir(directory):
+        print(f"  ❌ Directory not found: {directory}")
+        return 1
+
+    started = time.time()
+    index_path = os.path.join(uploads, INDEX_NAME)
+    index = load_index(index_path)
+    files = scan_files(directory)
+    hashed = update_hashes(directory, files, index, args.workers)
+    save_index(index_path, index)
+
+    groups = duplicate_groups(files, index)
+    shared_count = update_shared_files(os.path.join(uploads, SHARED_NAME), files, groups)
+    duplicate_count = sum(len(g["duplicates"]) for g in groups)
+    reclaimable = sum(g["size"] * len(g["duplicates"]) for g in groups)
+
+    os.makedirs(args.plan_dir, exist_ok=True)
+    sql_path = os.path.join(args.plan_dir, "dedupe_plan.sql")
+    removal_path = os.path.join(args.plan_dir, "dedupe_remove.txt")
+    with open(sql_path, "w", encoding="utf-8") as f:
+        f.write(build_sql_plan(groups))
+    with open(removal_path, "w", encoding="utf-8") as f:
+        f.write(build_removal_list(groups))
+
+    elapsed = time.time() - started
+    print(f"\n  Files scanned: {len(files)}")
+    print(f"  Files hashed this run: {hashed} (index: {len(index['files'])})")
+    print(f"  Duplicate groups: {len(groups)}, duplicate files: {duplicate_count}")
+    print(f"  Reclaimable: {reclaimable / 1024 / 1024:.1f} MB")
+    print(f"  Elapsed: {elapsed:.1f}s")
+    print(f"\n  SQL plan: {sql_path}")
+    print(f"  Removal list (relative to {uploads}): {removal_path}")
+    print(f"  Shared files kept by the server: {shared_count} ({SHARED_NAME})")
+
+    output = {
+        "uploads_dir": uploads,
+        "files_scanned": len(files),
+        "files_hashed": hashed,
+        "duplicate_groups": len(groups),
+        "duplicate_files": duplicate_count,
+        "reclaimable_bytes": reclaimable,
+        "groups": groups,
+        "elapsed_seconds": round(elapsed, 2),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Image Dimension Manifest - SINOTRUK
+Reads width, height and format of every PNG, JPEG, WebP, AVIF and GIF from
+its header bytes only (no decode, usually one or two small reads per file)
+and writes a manifest per image root:
+
+- public/images    -> public/image-dimensions.json (served as /image-dimensions.json)
+- uploads/original -> uploads/.image_dimensions.json (read by GET /api/image
+  instead of sharp().metadata() when a watermark is rendered)
+
+Entries are keyed by path relative to the root and carry the file's size and
+mtime, so later runs only read headers of new or changed files. JPEG entries
+also carry the EXIF orientation when it is not 1; width and height are the
+stored pixel dimensions, like sharp's metadata().
+
+Usage:
+    python scripts/image_dimensions.py
+    python scripts/image_dimensions.py --uploads-dir /www/wwwroot/hanoi-sinotruk.com/uploads
+    python scripts/image_dimensions.py --full        # re-read every header
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import server_utils
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".jfif", ".webp", ".avif", ".gif"}
+HEAD_BYTES = 4096
+# AVIF keeps ftyp + meta at the start of the file; bigger meta boxes are read in full
+AVIF_META_LIMIT = 1024 * 1024
+# SOF markers that carry frame dimensions (C4, C8 and CC are DHT, JPG and DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class HeaderError(ValueError):
+    """Raised when a file's header cannot be parsed"""
+
+
+def png_size(f, head):
+    if len(head) < 24 or head[12:16] != b"IHDR":
+        raise HeaderError("missing IHDR")
+    width, height = struct.unpack(">II", head[16:24])
+    return width, height, {}
+
+
+def gif_size(f, head):
+    width, height = struct.unpack("<HH", head[6:10])
+    return width, height, {}
+
+
+def webp_size(f, head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        if head[23:26] != b"\x9d\x01\x2a":
+            raise HeaderError("bad VP8 frame tag")
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF, {}
+    if chunk == b"VP8L" and len(head) >= 25:
+        if head[20] != 0x2F:
+            raise HeaderError("bad VP8L signature")
+        bits = struct.unpack("<I", head[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, {}
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height, {}
+    raise HeaderError(f"unknown WebP chunk {chunk!r}")
+
+
+def exif_orientation(data):
+    """Orientation tag (0x0112) from an APP1 Exif payload, or None"""
+    if not data.startswith(b"Exif\x00\x00") or len(data) < 14:
+        return None
+    tiff = data[6:]
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None:
+        return None
+    ifd = struct.unpack(order + "I", tiff[4:8])[0]
+    if ifd + 2 > len(tiff):
+        return None
+    count = struct.unpack(order + "H", tiff[ifd:ifd + 2])[0]
+    for i in range(count):
+        offset = ifd + 2 + i * 12
+        if offset + 12 > len(tiff):
+            break
+        tag, kind = struct.unpack(order + "HH", tiff[offset:offset + 4])
+        if tag == 0x0112 and kind == 3:
+            return struct.unpack(order + "H", tiff[offset + 8:offset + 10])[0]
+    return None
+
+
+def jpeg_size(f, head):
+    """Walk the marker segments up to the first SOF, seeking over segment bodies"""
+    f.seek(2)
+    extra = {}
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise HeaderError("no SOF marker")
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            raise HeaderError("no SOF marker")
+        code = marker[0]
+        if code == 0xD8 or 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue
+        if code == 0xD9 or code == 0xDA:
+            raise HeaderError("no SOF marker before scan data")
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            raise HeaderError("truncated segment")
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                raise HeaderError("truncated SOF")
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height, extra
+        if code == 0xE1 and "orientation" not in extra:
+            orientation = exif_orientation(f.read(length - 2))
+            if orientation and orientation != 1:
+                extra["orientation"] = orientation
+            continue
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def iter_boxes(data, start=0, end=None):
+    """(type, body_start, body_end) of ISOBMFF boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind.decode("latin-1"), pos + header, min(pos + size, end)
+        pos += size
+
+
+def avif_size(f, head):
+    """Size of the primary item: pitm -> ipma -> ispe in the meta box (irot 90/270 swaps)"""
+    meta = None
+    pos = 0
+    while meta is None:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            raise HeaderError("no meta box")
+        size, kind = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_len = 16
+        elif size == 0:
+            raise HeaderError("no meta box")
+        if kind == b"meta":
+            if size > AVIF_META_LIMIT:
+                raise HeaderError("meta box too large")
+            f.seek(pos + header_len)
+            meta = f.read(size - header_len)
+        pos += size
+
+    # meta is a FullBox: skip version/flags
+    boxes = {kind: (s, e) for kind, s, e in iter_boxes(meta, 4)}
+    primary = None
+    if "pitm" in boxes:
+        s, _ = boxes["pitm"]
+        primary = struct.unpack(">H", meta[s + 4:s + 6])[0] if meta[s] == 0 else struct.unpack(">I", meta[s + 4:s + 8])[0]
+    if "iprp" not in boxes:
+        raise HeaderError("no iprp box")
+    iprp = {kind: (s, e) for kind, s, e in iter_boxes(meta, *boxes["iprp"])}
+    if "ipco" not in iprp:
+        raise HeaderError("no ipco box")
+    properties = [(kind, s, e) for kind, s, e in iter_boxes(meta, *iprp["ipco"])]
+
+    wanted = None
+    if primary is not None and "ipma" in iprp:
+        s, _ = iprp["ipma"]
+        version, flags = meta[s], int.from_bytes(meta[s + 1:s + 4], "big")
+        count = struct.unpack(">I", meta[s + 4:s + 8])[0]
+        pos = s + 8
+        for _ in range(count):
+            if version < 1:
+                item_id = struct.unpack(">H", meta[pos:pos + 2])[0]
+                pos += 2
+            else:
+                item_id = struct.unpack(">I", meta[pos:pos + 4])[0]
+                pos += 4
+            assoc_count = meta[pos]
+            pos += 1
+            indexes = []
+            for _ in range(assoc_count):
+                if flags & 1:
+                    indexes.append(struct.unpack(">H", meta[pos:pos + 2])[0] & 0x7FFF)
+                    pos += 2
+                else:
+                    indexes.append(meta[pos] & 0x7F)
+                    pos += 1
+            if item_id == primary:
+                wanted = [properties[i - 1] for i in indexes if 0 < i <= len(properties)]
+                break
+    if wanted is None:
+        wanted = properties
+
+    size = None
+    rotation = 0
+    for kind, s, e in wanted:
+        if kind == "ispe" and size is None:
+            size = struct.unpack(">II", meta[s + 4:s + 12])
+        elif kind == "irot":
+            rotation = meta[s] & 0x03
+    if size is None:
+        raise HeaderError("no ispe property")
+    width, height = size
+    if rotation in (1, 3):
+        width, height = height, width
+    return width, height, {}
+
+
+def detect_format(head):
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png", png_size
+    if head.startswith(b"\xff\xd8"):
+        return "jpeg", jpeg_size
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif", gif_size
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", webp_size
+    if head[4:8] == b"ftyp" and any(brand in head[8:64] for brand in (b"avif", b"avis")):
+        return "avif", avif_size
+    return None, None
+
+
+def read_dimensions(path):
+    """{"width", "height", "format"[, "orientation"]} or {"error"} for one file"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEAD_BYTES)
+            fmt, parse = detect_format(head)
+            if fmt is None:
+                return {"error": "unknown format"}
+            width, height, extra = parse(f, head)
+    except (OSError, HeaderError, struct.error, IndexError) as e:
+        return {"error": str(e) or e.__class__.__name__}
+    if not width or not height:
+        return {"error": "zero dimension"}
+    return {"width": width, "height": height, "format": fmt, **extra}
+
+
+def scan_images(root):
+    """{relative path: (size, mtime_ns)} for every image file under root"""
+    files = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    st = entry.stat(follow_symlinks=False)
+                    rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                    files[rel] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def update_manifest(root, manifest_path, full, workers):
+    """Read headers of new or changed files; returns a summary dict"""
+    manifest = load_manifest(manifest_path)
+    cached = manifest["files"]
+    files = scan_images(root)
+
+    todo = sorted(
+        rel for rel, (size, mtime_ns) in files.items()
+        if full or cached.get(rel, {}).get("size") != size or cached.get(rel, {}).get("mtime_ns") != mtime_ns
+    )
+    removed = [rel for rel in cached if rel not in files]
+    for rel in removed:
+        del cached[rel]
+
+    errors = []
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            paths = [os.path.join(root, rel) for rel in todo]
+            for rel, dims in zip(todo, pool.map(read_dimensions, paths)):
+                size, mtime_ns = files[rel]
+                cached[rel] = {"size": size, "mtime_ns": mtime_ns, **dims}
+                if "error" in dims:
+                    errors.append(f"{rel}: {dims['error']}")
+
+    manifest["generated_at"] = datetime.now().isoformat()
+    manifest["files"] = dict(sorted(cached.items()))
+    save_manifest(manifest_path, manifest)
+    return {
+        "root": root,
+        "manifest": manifest_path,
+        "files": len(files),
+        "read": len(todo),
+        "removed": len(removed),
+        "errors": errors,
+        "bytes": sum(size for size, _ in files.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a header-only width/height manifest for site images")
+    parser.add_argument("--uploads-dir", help="uploads directory (default: UPLOAD_DIR or deploy/server/uploads)")
+    parser.add_argument("--public-dir", default=os.path.join(server_utils.BASE_PATH, "public"),
+                        help="storefront public directory (default: public)")
+    parser.add_argument("--full", action="store_true", help="re-read every header")
+    parser.add_argument("--workers", type=int, default=16, help="reader threads (default: 16)")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/image_dimensions_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  IMAGE DIMENSION MANIFEST - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    uploads = server_utils.upload_dir(args.uploads_dir)
+    roots = [
+        (os.path.join(args.public_dir, "images"), os.path.join(args.public_dir, "image-dimensions.json")),
+        (os.path.join(uploads, "original"), os.path.join(uploads, ".image_dimensions.json")),
+    ]
+
+    started = time.time()
+    results = []
+    for root, manifest_path in roots:
+        if not os.path.isdir(root):
+            print(f"  ⚠️  Directory not found, skipped: {root}")
+            continue
+        result = update_manifest(root, manifest_path, args.full, args.workers)
+        results.append(result)
+        status = "✅" if not result["errors"] else "⚠️ "
+        print(f"  {status} {os.path.relpath(root, server_utils.BASE_PATH)}: {result['files']} images, "
+              f"{result['read']} read, {result['removed']} removed")
+        for error in result["errors"][:10]:
+            print(f"      └─ {error}")
+        if len(result["errors"]) > 10:
+            print(f"      └─ ... {len(result['errors']) - 10} more")
+        print(f"      📄 {os.path.relpath(manifest_path, server_utils.BASE_PATH)}")
+
+    elapsed = time.time() - started
+    print(f"\n  Elapsed: {elapsed:.2f}s")
+
+    output = {
+        "roots": results,
+        "elapsed_seconds": round(elapsed, 2),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
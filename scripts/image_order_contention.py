@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Product Image Contention Benchmark - SINOTRUK
+Fires concurrent bursts of the gallery edits the Admin UI sends:
+
+    PUT /api/product-images/:productId/:imageId/order     {sort_order}
+    PUT /api/product-images/:productId/:imageId/primary
+
+A burst reorders every image of one product (a random permutation, one
+request per image, all in flight at once) and sets a random image as
+primary. Two scenarios are run:
+
+- single: every burst targets the same product (worst-case row contention)
+- spread: bursts rotate across many products
+
+Reported per scenario: throughput, p50/p95/p99/max latency per request
+type, errors, and lock waits sampled from pg_stat_activity / pg_locks on the
+database the server uses. Afterwards every touched product must still have
+all of its images and exactly one primary image.
+
+Overlapping permutations of one gallery interleave per row, so the order
+they leave behind is not defined. Once the concurrent bursts are done, one
+more burst is sent to each product on its own; the stored order and primary
+must then be exactly that burst's. Violations of either check fail the run.
+
+Run it against a local server and database only - it rewrites galleries.
+
+Usage:
+    python scripts/image_order_contention.py --seed 20
+    python scripts/image_order_contention.py --bursts 500 --concurrency 32 --scenario single
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import server_utils
+
+SEED_CODE_PREFIX = "BENCH-IMG-"
+SAMPLE_END = "__sample_end__"
+
+LOCK_SAMPLE_SQL = (
+    "SELECT"
+    " (SELECT count(*) FROM pg_stat_activity"
+    "   WHERE datname = current_database() AND wait_event_type = 'Lock'),"
+    " (SELECT coalesce(max(EXTRACT(EPOCH FROM now() - state_change) * 1000), 0)::int FROM pg_stat_activity"
+    "   WHERE datname = current_database() AND wait_event_type = 'Lock'),"
+    " (SELECT coalesce(string_agg(locktype || ':' || mode, ',' ORDER BY locktype, mode), '') FROM pg_locks"
+    "   WHERE NOT granted);"
+)
+
+
+# ---------------------------------------------------------------------------
+# Minimal keep-alive HTTP/1.1 client (stdlib only)
+# ---------------------------------------------------------------------------
+
+class HttpClient:
+    def __init__(self, base_url, connections, token=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = parts.scheme == "https"
+        self.token = token
+        self.pool = asyncio.Queue()
+        self.size = connections
+        self.opened = 0
+
+    async def _connection(self):
+        while True:
+            if not self.pool.empty():
+                return self.pool.get_nowait()
+            if self.opened < self.size:
+                self.opened += 1
+                try:
+                    return await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+                except OSError:
+                    self.opened -= 1
+                    raise
+            try:
+                # Re-check periodically: a connection dropped on error frees a slot without a put
+                return await asyncio.wait_for(self.pool.get(), 1.0)
+            except asyncio.TimeoutError:
+                continue
+
+    async def request(self, method, path, payload=None):
+        """
+        Returns (status, headers, body bytes, elapsed ms); the time spent waiting
+        for a free connection is not part of elapsed.
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        headers = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+        ]
+        if self.token:
+            headers.append(f"Cookie: auth_token={self.token}")
+        reader, writer = await self._connection()
+        started = time.perf_counter()
+        try:
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("connection closed by server")
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                response_headers.setdefault(name.lower(), []).append(value.strip())
+            if response_headers.get("transfer-encoding", [""])[0].lower() == "chunked":
+                chunks = []
+                while True:
+                    size = int((await reader.readline()).split(b";")[0], 16)
+                    chunks.append(await reader.readexactly(size + 2))
+                    if size == 0:
+                        break
+                data = b"".join(c[:-2] for c in chunks)
+            else:
+                data = await reader.readexactly(int(response_headers.get("content-length", ["0"])[0]))
+        except Exception:
+            writer.close()
+            self.opened -= 1
+            raise
+        if response_headers.get("connection", [""])[0].lower() == "close":
+            writer.close()
+            self.opened -= 1
+        else:
+            self.pool.put_nowait((reader, writer))
+        return status, response_headers, data, (time.perf_counter() - started) * 1000
+
+    async def close(self):
+        while not self.pool.empty():
+            _, writer = self.pool.get_nowait()
+            writer.close()
+
+
+async def login(client, username, password):
+    status, headers, body, _ = await client.request(
+        "POST", "/api/admin/login", {"username": username, "password": password}
+    )
+    if status != 200:
+        raise RuntimeError(f"login failed ({status}): {body[:200].decode('utf-8', 'replace')}")
+    for cookie in headers.get("set-cookie", []):
+        if cookie.startswith("auth_token="):
+            return cookie.split(";", 1)[0].split("=", 1)[1]
+    raise RuntimeError("login response did not set auth_token")
+
+
+# ---------------------------------------------------------------------------
+# Database side: fixtures, lock sampling, invariants
+# ---------------------------------------------------------------------------
+
+def seed_products(count, images, url):
+    """Create `count` products (code BENCH-IMG-n) with `images` linked images each, first one primary"""
+    sql = f"""
+        WITH p AS (
+            INSERT INTO products (code, name, slug, show_on_homepage, created_at, updated_at)
+            SELECT '{SEED_CODE_PREFIX}' || g, 'Benchmark gallery ' || g, 'bench-img-' || g || '-' || md5(random()::text),
+                   false, now(), now()
+            FROM generate_series(1, {int(count)}) g
+            RETURNING id
+        ), i AS (
+            INSERT INTO images (url, created_at)
+            SELECT '/uploads/original/bench-' || p.id || '-' || n || '.jpg', now()
+            FROM p, generate_series(0, {int(images) - 1}) n
+            RETURNING id, url
+        )
+        INSERT INTO product_images (product_id, image_id, sort_order, is_primary, created_at)
+        SELECT split_part(url, '-', 2)::int, id,
+               split_part(split_part(url, '-', 3), '.', 1)::int,
+               split_part(split_part(url, '-', 3), '.', 1) = '0', now()
+        FROM i;
+    """
+    server_utils.run_sql(sql, url, single_transaction=True)
+
+
+def cleanup_seeded(url):
+    server_utils.run_sql(f"""
+        DELETE FROM images WHERE id IN (
+            SELECT pi.image_id FROM product_images pi JOIN products p ON p.id = pi.product_id
+            WHERE p.code LIKE '{SEED_CODE_PREFIX}%');
+        DELETE FROM products WHERE code LIKE '{SEED_CODE_PREFIX}%';
+    """, url, single_transaction=True)
+
+
+def load_galleries(min_images, seeded_only, url):
+    """{product_id: [image_id, ...]} for products with at least min_images images"""
+    where = f"WHERE p.code LIKE '{SEED_CODE_PREFIX}%'" if seeded_only else ""
+    rows = server_utils.query_rows(
+        "SELECT pi.product_id, string_agg(pi.image_id::text, ',' ORDER BY pi.sort_order, pi.id) "
+        f"FROM product_images pi JOIN products p ON p.id = pi.product_id {where} "
+        f"GROUP BY pi.product_id HAVING count(*) >= {int(min_images)} ORDER BY pi.product_id",
+        url,
+    )
+    return {int(pid): [int(i) for i in images.split(",")] for pid, images in rows}
+
+
+def normalize_galleries(product_ids, url):
+    """Start each scenario from a valid state: dense order, first image primary"""
+    ids = ",".join(str(p) for p in product_ids)
+    server_utils.run_sql(f"""
+        UPDATE product_images pi SET sort_order = r.rn - 1, is_primary = (r.rn = 1)
+        FROM (SELECT id, row_number() OVER (PARTITION BY product_id ORDER BY sort_order, id) rn
+              FROM product_images WHERE product_id IN ({ids})) r
+        WHERE pi.id = r.id;
+    """, url, single_transaction=True)
+
+
+def check_invariants(galleries, url):
+    """Products that lost images or do not have exactly one primary image"""
+    ids = ",".join(str(p) for p in galleries)
+    rows = server_utils.query_rows(
+        "SELECT product_id, count(*), count(*) FILTER (WHERE is_primary) "
+        f"FROM product_images WHERE product_id IN ({ids}) GROUP BY product_id ORDER BY product_id",
+        url,
+    )
+    violations = []
+    seen = set()
+    for pid, total, primaries in rows:
+        pid, total, primaries = int(pid), int(total), int(primaries)
+        seen.add(pid)
+        problems = []
+        if total != len(galleries[pid]):
+            problems.append(f"{total} of {len(galleries[pid])} images left")
+        if primaries != 1:
+            problems.append(f"{primaries} primary images")
+        if problems:
+            violations.append({"product_id": pid, "problems": problems})
+    for pid in galleries:
+        if pid not in seen:
+            violations.append({"product_id": pid, "problems": [f"0 of {len(galleries[pid])} images left"]})
+    return violations
+
+
+def check_final_order(applied, url):
+    """Products whose gallery is not exactly the {product_id: (order, primary)} burst sent last"""
+    ids = ",".join(str(p) for p in applied)
+    rows = server_utils.query_rows(
+        "SELECT product_id, string_agg(image_id::text, ',' ORDER BY sort_order, id), "
+        "string_agg(sort_order::text, ',' ORDER BY sort_order, id), "
+        "coalesce(string_agg(image_id::text, ',') FILTER (WHERE is_primary), '') "
+        f"FROM product_images WHERE product_id IN ({ids}) GROUP BY product_id ORDER BY product_id",
+        url,
+    )
+    stored = {int(pid): (images, positions, primary) for pid, images, positions, primary in rows}
+    violations = []
+    for pid, (order, primary) in applied.items():
+        images, positions, primaries = stored.get(pid, ("", "", ""))
+        problems = []
+        if images != ",".join(map(str, order)) or positions != ",".join(map(str, range(len(order)))):
+            problems.append(f"order {images or '-'} at {positions or '-'}, expected {','.join(map(str, order))}")
+        if primaries != str(primary):
+            problems.append(f"primary {primaries or '-'}, expected {primary}")
+        if problems:
+            violations.append({"product_id": pid, "problems": problems})
+    return violations
+
+
+class LockSampler:
+    """Polls lock waits through one long-lived psql session while a scenario runs"""
+
+    def __init__(self, url, interval):
+        self.url = url
+        self.interval = interval
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiting = 0
+        self.max_wait_ms = 0
+        self.modes = {}
+        self.proc = None
+        self.task = None
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            *server_utils.psql_command(self.url, ["-A", "-t", "-F", "\t"]),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self.task = asyncio.create_task(self._run())
+
+    async def _sample(self):
+        self.proc.stdin.write(f"{LOCK_SAMPLE_SQL}\n\\echo {SAMPLE_END}\n".encode())
+        await self.proc.stdin.drain()
+        lines = []
+        while True:
+            line = (await self.proc.stdout.readline()).decode("utf-8").rstrip("\n")
+            if line == SAMPLE_END or not line and self.proc.stdout.at_eof():
+                break
+            if line:
+                lines.append(line)
+        return lines[0].split("\t") if lines else None
+
+    async def _run(self):
+        while True:
+            row = await self._sample()
+            if row is None:
+                return
+            waiting, wait_ms, modes = int(row[0]), int(row[1]), row[2] if len(row) > 2 else ""
+            self.samples += 1
+            if waiting:
+                self.waiting_samples += 1
+            self.max_waiting = max(self.max_waiting, waiting)
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            for mode in filter(None, modes.split(",")):
+                self.modes[mode] = self.modes.get(mode, 0) + 1
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.proc and self.proc.returncode is None:
+            self.proc.stdin.close()
+            try:
+                await asyncio.wait_for(self.proc.wait(), 5)
+            except asyncio.TimeoutError:
+                self.proc.kill()
+
+    def to_dict(self):
+        return {
+            "samples": self.samples,
+            "samples_with_lock_waits": self.waiting_samples,
+            "max_sessions_waiting": self.max_waiting,
+            "max_lock_wait_ms": self.max_wait_ms,
+            "ungranted_lock_modes": dict(sorted(self.modes.items(), key=lambda kv: -kv[1])),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return round(sorted_values[index], 2)
+
+
+def latency_summary(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": round(values[-1], 2) if values else None,
+    }
+
+
+async def timed_request(client, method, path, payload, kind, results):
+    try:
+        status, _, _, elapsed_ms = await client.request(method, path, payload)
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        results["errors"].append(f"{kind}: {e}")
+        return
+    results[kind].append(elapsed_ms)
+    if status >= 400:
+        results["errors"].append(f"{kind}: HTTP {status}")
+
+
+async def burst(client, product_id, images, rng, results):
+    order = images[:]
+    rng.shuffle(order)
+    requests = [
+        timed_request(client, "PUT", f"/api/product-images/{product_id}/{image_id}/order",
+                      {"sort_order": position}, "order", results)
+        for position, image_id in enumerate(order)
+    ]
+    primary = rng.choice(images)
+    requests.append(timed_request(client, "PUT", f"/api/product-images/{product_id}/{primary}/primary",
+                                  None, "primary", results))
+    await asyncio.gather(*requests)
+    return order, primary
+
+
+async def run_scenario(name, galleries, args, token):
+    product_ids = list(galleries)
+    if name == "single":
+        product_ids = product_ids[:1]
+    normalize_galleries(product_ids, args.database_url)
+
+    client = HttpClient(args.api_url, args.connections, token)
+    sampler = LockSampler(args.database_url, args.sample_interval)
+    results = {"order": [], "primary": [], "errors": []}
+    settle_results = {"order": [], "primary": [], "errors": []}
+    rng = random.Random(args.random_seed)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with gate:
+            pid = product_ids[i % len(product_ids)]
+            await burst(client, pid, galleries[pid], rng, results)
+
+    async def settle(pid):
+        return pid, await burst(client, pid, galleries[pid], rng, settle_results)
+
+    await sampler.start()
+    started = time.perf_counter()
+    try:
+        try:
+            await asyncio.gather(*(one(i) for i in range(args.bursts)))
+        finally:
+            elapsed = time.perf_counter() - started
+            await sampler.stop()
+        violations = check_invariants({pid: galleries[pid] for pid in product_ids}, args.database_url)
+        applied = dict(await asyncio.gather(*(settle(pid) for pid in product_ids)))
+    finally:
+        await client.close()
+
+    requests = len(results["order"]) + len(results["primary"])
+    results["errors"].extend(f"settle {error}" for error in settle_results["errors"])
+    order_violations = check_final_order(applied, args.database_url)
+    return {
+        "scenario": name,
+        "products": len(product_ids),
+        "bursts": args.bursts,
+        "concurrency": args.concurrency,
+        "requests": requests,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else None,
+        "order": latency_summary(results["order"]),
+        "primary": latency_summary(results["primary"]),
+        "errors": len(results["errors"]),
+        "error_samples": results["errors"][:10],
+        "locks": sampler.to_dict(),
+        "invariant_violations": violations,
+        "order_violations": order_violations,
+    }
+
+
+def print_scenario(result):
+    print(f"\n  {result['scenario']}: {result['products']} product(s), {result['bursts']} bursts, "
+          f"concurrency {result['concurrency']}")
+    print(f"  ✅ {result['requests']} requests in {result['elapsed_seconds']:.1f}s "
+          f"({result['requests_per_second']} req/s)")
+    for kind in ("order", "primary"):
+        s = result[kind]
+        print(f"      └─ {kind:<8} p50 {s['p50_ms']}ms  p95 {s['p95_ms']}ms  p99 {s['p99_ms']}ms  max {s['max_ms']}ms")
+    locks = result["locks"]
+    print(f"  🔎 lock waits in {locks['samples_with_lock_waits']}/{locks['samples']} samples, "
+          f"max {locks['max_sessions_waiting']} sessions, longest {locks['max_lock_wait_ms']}ms")
+    for mode, count in list(locks["ungranted_lock_modes"].items())[:3]:
+        print(f"      └─ {mode}: {count}")
+    if result["errors"]:
+        print(f"  ⚠️  {result['errors']} failed requests (e.g. {result['error_samples'][0]})")
+    if result["invariant_violations"]:
+        print(f"  ❌ {len(result['invariant_violations'])} product(s) violate the gallery invariants")
+        for violation in result["invariant_violations"][:5]:
+            print(f"      └─ product {violation['product_id']}: {'; '.join(violation['problems'])}")
+    else:
+        print("  ✅ every product kept its images and exactly one primary")
+    if result["order_violations"]:
+        print(f"  ❌ {len(result['order_violations'])} product(s) do not match the last burst sent alone")
+        for violation in result["order_violations"][:5]:
+            print(f"      └─ product {violation['product_id']}: {'; '.join(violation['problems'])}")
+    else:
+        print("  ✅ a burst sent alone leaves exactly its order and primary")
+
+
+async def run(args):
+    token = args.token
+    if not token:
+        bootstrap = HttpClient(args.api_url, 1)
+        try:
+            token = await login(bootstrap, args.username, args.password)
+        finally:
+            await bootstrap.close()
+
+    galleries = load_galleries(args.min_images, args.seed is not None, args.database_url)
+    if not galleries:
+        raise RuntimeError(f"no products with at least {args.min_images} images (use --seed N)")
+    galleries = dict(list(galleries.items())[:args.products])
+
+    results = []
+    for scenario in (["single", "spread"] if args.scenario == "both" else [args.scenario]):
+        result = await run_scenario(scenario, galleries, args, token)
+        print_scenario(result)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent reorder/set-primary benchmark for product_images")
+    parser.add_argument("--api-url", default=os.environ.get("API_URL", "http://localhost:3001"))
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--username", default=os.environ.get("ADMIN_USERNAME", "admin"))
+    parser.add_argument("--password", default=os.environ.get("ADMIN_PASSWORD", ""))
+    parser.add_argument("--token", help="existing auth_token instead of logging in")
+    parser.add_argument("--scenario", choices=["single", "spread", "both"], default="both")
+    parser.add_argument("--bursts", type=int, default=200, help="bursts per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="bursts in flight at once")
+    parser.add_argument("--connections", type=int, default=64, help="HTTP keep-alive connections")
+    parser.add_argument("--products", type=int, default=50, help="products used by the spread scenario")
+    parser.add_argument("--min-images", type=int, default=3, help="only products with at least this many images")
+    parser.add_argument("--seed", type=int, metavar="N", help="create N benchmark products and use only those")
+    parser.add_argument("--images-per-product", type=int, default=8, help="images per seeded product")
+    parser.add_argument("--keep", action="store_true", help="keep seeded products afterwards")
+    parser.add_argument("--sample-interval", type=float, default=0.05, help="seconds between lock samples")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/image_contention_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  PRODUCT IMAGE CONTENTION BENCHMARK - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  API: {args.api_url}")
+    print("=" * 70)
+
+    try:
+        if args.seed is not None:
+            cleanup_seeded(args.database_url)
+            seed_products(args.seed, max(args.images_per_product, args.min_images), args.database_url)
+            print(f"  📄 Seeded {args.seed} products x {args.images_per_product} images")
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            if args.seed is not None and not args.keep:
+                cleanup_seeded(args.database_url)
+    except (server_utils.PsqlError, RuntimeError, OSError) as e:
+        print(f"  ❌ Benchmark failed: {e}")
+        return 1
+
+    all_passed = all(not r["invariant_violations"] and not r["order_violations"] for r in results)
+    print("\n" + "=" * 70)
+    print("  ✅ GALLERY INVARIANTS HELD" if all_passed else "  ❌ GALLERY INVARIANTS VIOLATED UNDER CONCURRENCY")
+    print("=" * 70)
+
+    output = {
+        "api_url": args.api_url,
+        "all_passed": all_passed,
+        "scenarios": results,
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0 if all_passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
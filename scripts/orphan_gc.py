@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Orphan File Collector - SINOTRUK
+Finds files in uploads/original that no database row refers to any more
+(left behind by uploads that were never saved, webhook downloads from
+downloadAndSaveImage and partial deletes) and deletes or quarantines them.
+
+References are streamed from PostgreSQL with COPY (or from a SQL dump as a
+local stand-in), the directory listing is streamed with scandir, and both
+sides go through an external sort so the set difference is a merge join with
+memory bounded by --batch-size, not by the number of files.
+
+Usage:
+    python scripts/orphan_gc.py                          # dry run against DATABASE_URL
+    python scripts/orphan_gc.py --dump backup.sql        # dry run against a dump
+    python scripts/orphan_gc.py --quarantine             # move orphans to uploads/quarantine/<date>
+    python scripts/orphan_gc.py --delete --min-age 24
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import heapq
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+from itertools import islice
+from urllib.parse import unquote
+
+import server_utils
+import sql_dump
+
+# Every column that can point at a file in uploads/original.
+# product_images links to images.id, so its files are covered through images.url.
+REFERENCE_COLUMNS = {
+    "images": ["url"],
+    "gallery_images": ["image_path"],
+    "products": ["image", "thumbnail"],
+    "categories": ["thumbnail"],
+    "catalog_articles": ["thumbnail", "content"],
+    "site_settings": ["value"],
+    "admin_users": ["avatar"],
+}
+
+# /uploads/original/x, uploads/original/x and https://host/uploads/original/x, also inside article JSON
+UPLOAD_REF_RE = re.compile(r"uploads/original/([^\s\"'?#&<>\\)]+)")
+# Other upload directories deletePhysicalFile resolves on their own
+OTHER_UPLOAD_DIRS = ("/uploads/avatars/", "/uploads/watermarked/")
+SAMPLE_SIZE = 100
+
+
+def reference_query():
+    parts = [
+        f"SELECT {column}::text FROM {table} WHERE {column} IS NOT NULL"
+        for table, columns in REFERENCE_COLUMNS.items()
+        for column in columns
+    ]
+    return " UNION ALL ".join(parts)
+
+
+def referenced_names(value):
+    """
+    File names in uploads/original that a column value points at. Besides the
+    uploads/original/ forms, a single path value counts the way
+    deletePhysicalFile in index.js resolves it: a bare name (Excel import) or
+    any other local path means uploads/original/<basename>.
+    """
+    if not value:
+        return
+    value = unquote(value)
+    found = UPLOAD_REF_RE.findall(value)
+    if found:
+        yield from found
+        return
+    value = value.strip()
+    if (not value or len(value) >= 256 or value.startswith(("{", "[", "data:", "http://", "https://"))
+            or value.startswith(OTHER_UPLOAD_DIRS)):
+        return
+    name = value.rsplit("/", 1)[-1]
+    if name:
+        yield name
+
+
+def iter_references(args):
+    """Stream referenced file names from the database or a dump"""
+    if args.dump:
+        with open(args.dump, "r", encoding="utf-8") as f:
+            for _, _, value in sql_dump.iter_column_values(f, REFERENCE_COLUMNS):
+                yield from referenced_names(value)
+    else:
+        for (value,) in server_utils.copy_rows(reference_query(), args.database_url):
+            yield from referenced_names(value)
+
+
+def iter_upload_files(directory, min_age_seconds):
+    """Stream (name, size) for files old enough to be safe to collect"""
+    cutoff = time.time() - min_age_seconds
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.is_file(follow_symlinks=False) or "\n" in entry.name:
+                continue
+            st = entry.stat(follow_symlinks=False)
+            if st.st_mtime <= cutoff:
+                yield entry.name, st.st_size
+
+
+def external_sort(items, batch_size, tmp_dir, key=lambda item: item):
+    """
+    Sort newline-free string records with bounded memory: sorted runs of
+    batch_size records are spilled to tmp_dir and merged back lazily.
+    """
+    runs = []
+    items = iter(items)
+    while True:
+        batch = sorted(set(islice(items, batch_size)), key=key)
+        if not batch:
+            break
+        fd, path = tempfile.mkstemp(dir=tmp_dir, suffix=".run")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in batch:
+                f.write(record + "\n")
+        runs.append(path)
+
+    files = [open(path, "r", encoding="utf-8") for path in runs]
+    try:
+        streams = [(line.rstrip("\n") for line in f) for f in files]
+        previous = None
+        for record in heapq.merge(*streams, key=key):
+            if record != previous:
+                yield record
+                previous = record
+    finally:
+        for f in files:
+            f.close()
+
+
+def find_orphans(files, references, batch_size, tmp_dir):
+    """Merge-join two sorted streams: files whose name is not referenced"""
+    file_records = (f"{name}\t{size}" for name, size in files)
+    sorted_files = external_sort(file_records, batch_size, tmp_dir, key=lambda r: r.split("\t", 1)[0])
+    sorted_refs = external_sort((r for r in references if "\n" not in r), batch_size, tmp_dir)
+
+    ref = next(sorted_refs, None)
+    for record in sorted_files:
+        name, size = record.split("\t", 1)
+        while ref is not None and ref < name:
+            ref = next(sorted_refs, None)
+        if ref != name:
+            yield name, int(size)
+
+
+def collect(orphan, directory, mode, quarantine_dir):
+    name, _ = orphan
+    source = os.path.join(directory, name)
+    try:
+        if mode == "delete":
+            os.unlink(source)
+        elif mode == "quarantine":
+            shutil.move(source, os.path.join(quarantine_dir, name))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and collect unreferenced files in uploads/original")
+    parser.add_argument("--uploads-dir", help="uploads directory (default: UPLOAD_DIR or deploy/server/uploads)")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--dump", help="read references from this SQL dump instead of the database")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--delete", action="store_true", help="delete orphans")
+    action.add_argument("--quarantine", nargs="?", const="", metavar="DIR",
+                        help="move orphans to DIR (default: uploads/quarantine/<date>)")
+    parser.add_argument("--min-age", type=float, default=1.0,
+                        help="only collect files older than this many hours (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="records held in memory per sort run")
+    parser.add_argument("--list", help="write every orphan file name to this file")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/orphan_gc_results.json"))
+    args = parser.parse_args()
+
+    mode = "delete" if args.delete else "quarantine" if args.quarantine is not None else "dry-run"
+
+    print("=" * 70)
+    print("  ORPHAN FILE COLLECTOR - SINOTRUK uploads/original")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  Mode: {mode}")
+    print("=" * 70)
+
+    uploads = server_utils.upload_dir(args.uploads_dir)
+    directory = os.path.join(uploads, "original")
+    if not os.path.isdir(directory):
+        print(f"  ❌ Directory not found: {directory}")
+        return 1
+
+    quarantine_dir = None
+    if mode == "quarantine":
+        quarantine_dir = args.quarantine or os.path.join(uploads, "quarantine", datetime.now().strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(quarantine_dir, exist_ok=True)
+
+    started = time.time()
+    stats = {"orphans": 0, "orphan_bytes": 0, "collected": 0, "bytes_reclaimed": 0}
+    largest = []
+    list_file = open(args.list, "w", encoding="utf-8") if args.list else None
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="orphan_gc_") as tmp_dir:
+            files = iter_upload_files(directory, args.min_age * 3600)
+            for orphan in find_orphans(files, iter_references(args), args.batch_size, tmp_dir):
+                stats["orphans"] += 1
+                stats["orphan_bytes"] += orphan[1]
+                heapq.heappush(largest, (orphan[1], orphan[0]))
+                if len(largest) > SAMPLE_SIZE:
+                    heapq.heappop(largest)
+                if list_file:
+                    list_file.write(orphan[0] + "\n")
+                if mode != "dry-run" and collect(orphan, directory, mode, quarantine_dir):
+                    stats["collected"] += 1
+                    stats["bytes_reclaimed"] += orphan[1]
+    except (server_utils.PsqlError, OSError, ValueError) as e:
+        print(f"  ❌ Could not read references: {e}")
+        return 1
+    finally:
+        if list_file:
+            list_file.close()
+
+    elapsed = time.time() - started
+    reclaimable = stats["orphan_bytes"] if mode == "dry-run" else stats["bytes_reclaimed"]
+    print(f"\n  Orphans found: {stats['orphans']}")
+    print(f"  {'Reclaimable' if mode == 'dry-run' else 'Reclaimed'}: {reclaimable / 1024 / 1024:.1f} MB")
+    if mode == "quarantine":
+        print(f"  Quarantined to: {quarantine_dir}")
+    print(f"  Elapsed: {elapsed:.1f}s")
+
+    output = {
+        "mode": mode,
+        "source": args.dump or "database",
+        "uploads_dir": directory,
+        "quarantine_dir": quarantine_dir,
+        "min_age_hours": args.min_age,
+        "stats": stats,
+        "largest_orphans": [{"name": n, "bytes": s} for s, n in sorted(largest, reverse=True)],
+        "elapsed_seconds": round(elapsed, 2),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Page Load Budget Check - SINOTRUK
+Reads the Playwright trace archives (trace.zip) and HAR files produced by the
+deploy/e2e suite and reports, for every page the suite loads:
+
+- TTFB of the document request
+- LCP candidates: the largest images that finished loading during the page
+  load (traces do not record LCP itself, so the slowest of the top candidates
+  is used as the LCP estimate)
+- total transferred bytes and request count
+- the request waterfall
+
+Pages are grouped by route template from src/App.jsx and
+admin_ui/src/App.tsx ("client /product/:slug", "admin /dashboard"), compared
+against scripts/page_budgets.json and against the previous run, and the
+script exits 1 on any budget breach or regression, like the phase checks.
+
+Zip archives are read member by member as streams; resource bodies stored in
+the trace are never extracted.
+
+Usage:
+    cd deploy && npx playwright test --trace on
+    python scripts/page_load_budget.py                      # deploy/test-results/**/trace.zip
+    python scripts/page_load_budget.py run.har other/trace.zip --baseline old_results.json
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import glob
+import zipfile
+import argparse
+from statistics import median
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from server_utils import BASE_PATH
+
+DEFAULT_RESULTS_DIR = os.path.join(BASE_PATH, "deploy/test-results")
+DEFAULT_BUDGETS = os.path.join(BASE_PATH, "scripts/page_budgets.json")
+ROUTE_FILES = {
+    "client": os.path.join(BASE_PATH, "src/App.jsx"),
+    "admin": os.path.join(BASE_PATH, "admin_ui/src/App.tsx"),
+}
+ROUTE_PATH_RE = re.compile(r'path="([^"]+)"')
+ADMIN_ORIGINS = (os.environ.get("ADMIN_URL", "http://localhost:5174").rstrip("/"),)
+ADMIN_PREFIX = "/secret"
+
+METRICS = ["ttfb_ms", "lcp_candidate_ms", "transfer_kb", "requests"]
+# Regressions smaller than this are noise, whatever the relative change
+REGRESSION_FLOOR = {"ttfb_ms": 50, "lcp_candidate_ms": 150, "transfer_kb": 20, "requests": 3}
+LCP_CANDIDATES = 3
+WATERFALL_ROWS = 60
+
+
+def load_route_templates():
+    """{app: [(regex, template)]} from the React Router definitions"""
+    templates = {}
+    for app, path in ROUTE_FILES.items():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                found = ROUTE_PATH_RE.findall(f.read())
+        except OSError:
+            found = []
+        routes = []
+        for template in found:
+            pattern = re.sub(r":\w+", "[^/]+", re.escape(template).replace("\\:", ":"))
+            routes.append((re.compile(pattern + "/?$"), template))
+        templates[app] = routes
+    return templates
+
+
+def page_key(url, templates):
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    path = parts.path or "/"
+    app = "client"
+    if origin in ADMIN_ORIGINS:
+        app = "admin"
+    elif path.startswith(ADMIN_PREFIX):
+        app = "admin"
+        path = path[len(ADMIN_PREFIX):] or "/"
+    for regex, template in templates.get(app, []):
+        if regex.match(path):
+            return f"{app} {template}"
+    return f"{app} {path.rstrip('/') or '/'}"
+
+
+# ---------------------------------------------------------------------------
+# Reading HAR entries from traces and HAR files
+# ---------------------------------------------------------------------------
+
+def iter_trace_entries(zf):
+    """trace.network members are NDJSON; resource-snapshot lines hold HAR entries"""
+    for name in zf.namelist():
+        if not name.endswith(".network"):
+            continue
+        with zf.open(name) as raw:
+            for line in io.TextIOWrapper(raw, encoding="utf-8", errors="replace"):
+                if '"resource-snapshot"' not in line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("type") == "resource-snapshot":
+                    yield event["snapshot"]
+
+
+def iter_har_entries(f):
+    for entry in json.load(f).get("log", {}).get("entries", []):
+        yield entry
+
+
+def iter_source_entries(path):
+    """HAR entries from a trace.zip, a HAR zip (recordHar with a .zip path) or a .har file"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            har_members = [n for n in zf.namelist() if n.endswith(".har")]
+            if har_members:
+                for name in har_members:
+                    with zf.open(name) as raw:
+                        yield from iter_har_entries(io.TextIOWrapper(raw, encoding="utf-8"))
+            else:
+                yield from iter_trace_entries(zf)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from iter_har_entries(f)
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000
+
+
+def transfer_bytes(entry):
+    response = entry.get("response", {})
+    transfer = response.get("_transferSize", -1)
+    if transfer is not None and transfer >= 0:
+        return transfer
+    body = response.get("bodySize", -1)
+    if body is None or body < 0:
+        body = response.get("content", {}).get("size", 0) or 0
+    return max(response.get("headersSize", 0) or 0, 0) + max(body, 0)
+
+
+def is_document(entry):
+    resource_type = entry.get("_resourceType")
+    if resource_type:
+        return resource_type == "document"
+    mime = entry.get("response", {}).get("content", {}).get("mimeType", "")
+    return entry.get("request", {}).get("method") == "GET" and mime.startswith("text/html")
+
+
+def ttfb(entry):
+    """Everything up to the first response byte: blocked + dns + connect + send + wait"""
+    timings = entry.get("timings", {})
+    total = sum(max(timings.get(k, 0) or 0, 0) for k in ("blocked", "dns", "connect", "send", "wait"))
+    return total if total else entry.get("time", 0)
+
+
+def split_page_loads(entries, window_ms):
+    """
+    Group requests into page loads: each top-level document request starts a
+    load (redirects continue the same one), later requests join it while they
+    start within window_ms of the document.
+    """
+    by_page = {}
+    for entry in entries:
+        if not entry.get("startedDateTime"):
+            continue
+        entry["_start_ms"] = parse_time(entry["startedDateTime"])
+        by_page.setdefault(entry.get("pageref") or "", []).append(entry)
+
+    loads = []
+    for page_entries in by_page.values():
+        page_entries.sort(key=lambda e: e["_start_ms"])
+        current = None
+        for entry in page_entries:
+            if is_document(entry) and not (current and current["redirecting"]):
+                current = {"document": entry, "requests": [], "redirecting": False}
+                loads.append(current)
+            if current is None or entry["_start_ms"] - current["document"]["_start_ms"] > window_ms:
+                continue
+            current["requests"].append(entry)
+            if entry is current["document"] or (is_document(entry) and current["redirecting"]):
+                status = entry.get("response", {}).get("status", 0)
+                current["redirecting"] = 300 <= status < 400
+                current["final_url"] = entry.get("request", {}).get("url", "")
+    return loads
+
+
+def measure_load(load):
+    document = load["document"]
+    start = document["_start_ms"]
+    waterfall = []
+    images = []
+    for entry in load["requests"]:
+        offset = entry["_start_ms"] - start
+        duration = max(entry.get("time", 0) or 0, 0)
+        response = entry.get("response", {})
+        mime = response.get("content", {}).get("mimeType", "")
+        row = {
+            "url": entry.get("request", {}).get("url", ""),
+            "type": entry.get("_resourceType") or mime.split(";")[0],
+            "status": response.get("status", 0),
+            "start_ms": round(offset, 1),
+            "duration_ms": round(duration, 1),
+            "bytes": transfer_bytes(entry),
+        }
+        waterfall.append(row)
+        if mime.startswith("image/") and row["status"] < 400:
+            images.append((response.get("content", {}).get("size", 0) or row["bytes"], offset + duration, row["url"]))
+
+    candidates = sorted(images, reverse=True)[:LCP_CANDIDATES]
+    end_ms = max((r["start_ms"] + r["duration_ms"] for r in waterfall), default=0)
+    return {
+        "url": load.get("final_url") or document.get("request", {}).get("url", ""),
+        "ttfb_ms": round(ttfb(document), 1),
+        "lcp_candidate_ms": round(max((c[1] for c in candidates), default=0), 1),
+        "lcp_candidates": [{"url": url, "bytes": size, "loaded_ms": round(at, 1)} for size, at, url in candidates],
+        "transfer_kb": round(sum(r["bytes"] for r in waterfall) / 1024, 1),
+        "requests": len(waterfall),
+        "end_ms": round(end_ms, 1),
+        "waterfall": sorted(waterfall, key=lambda r: r["start_ms"])[:WATERFALL_ROWS],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Budgets and comparison
+# ---------------------------------------------------------------------------
+
+def load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def budget_for(key, budgets):
+    budget = dict(budgets.get("default", {}))
+    budget.update(budgets.get("pages", {}).get(key, {}))
+    return budget
+
+
+def summarize(key, loads):
+    """Median of every metric across the loads of one page; keeps the slowest load's details"""
+    slowest = max(loads, key=lambda m: m["end_ms"])
+    summary = {metric: round(median(m[metric] for m in loads), 1) for metric in METRICS}
+    summary.update({
+        "page": key,
+        "loads": len(loads),
+        "slowest_url": slowest["url"],
+        "lcp_candidates": slowest["lcp_candidates"],
+        "waterfall": slowest["waterfall"],
+    })
+    return summary
+
+
+def check_page(summary, budget, previous, tolerance):
+    issues = []
+    for metric in METRICS:
+        value = summary[metric]
+        limit = budget.get(metric)
+        if limit is not None and value > limit:
+            issues.append(f"{summary['page']}: {metric} {value} over budget {limit}")
+        if previous and metric in previous:
+            before = previous[metric]
+            if value - before > max(before * tolerance, REGRESSION_FLOOR[metric]):
+                issues.append(f"{summary['page']}: {metric} regressed {before} -> {value}")
+    return issues
+
+
+def find_sources(paths):
+    if paths:
+        return paths
+    pattern_zip = os.path.join(DEFAULT_RESULTS_DIR, "**", "trace.zip")
+    pattern_har = os.path.join(DEFAULT_RESULTS_DIR, "**", "*.har")
+    return sorted(glob.glob(pattern_zip, recursive=True) + glob.glob(pattern_har, recursive=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-load budgets from Playwright traces and HAR files")
+    parser.add_argument("sources", nargs="*", help="trace.zip / .har files (default: deploy/test-results/**)")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS, help="budget file (default: scripts/page_budgets.json)")
+    parser.add_argument("--baseline", help="results whose last passing run is compared against (default: --output)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--window", type=float, default=15000, help="ms after the document request counted as its load")
+    parser.add_argument("--output", default=os.path.join(BASE_PATH, "scripts/page_load_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  PAGE LOAD BUDGET CHECK - SINOTRUK e2e traces")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    sources = find_sources(args.sources)
+    if not sources:
+        print(f"  ❌ No traces found in {os.path.relpath(DEFAULT_RESULTS_DIR, BASE_PATH)}")
+        print("      └─ Run the e2e suite with --trace on first")
+        return 1
+
+    budgets = load_json(args.budgets) or {}
+    baseline = load_json(args.baseline or args.output) or {}
+    # Compare against the last passing run, so a regression is not accepted by re-running
+    previous_pages = baseline.get("reference", {})
+    templates = load_route_templates()
+
+    measured = {}
+    for path in sources:
+        try:
+            loads = split_page_loads(iter_source_entries(path), args.window)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"  ⚠️  {path}: {e}")
+            continue
+        print(f"  📄 {os.path.relpath(path, BASE_PATH)}: {len(loads)} page loads")
+        for load in loads:
+            metrics = measure_load(load)
+            measured.setdefault(page_key(metrics["url"], templates), []).append(metrics)
+
+    all_issues = []
+    failing = []
+    pages = {}
+    print(f"\n  {'Page':<34} {'Loads':>5} {'TTFB':>8} {'LCP~':>8} {'KB':>8} {'Reqs':>5}")
+    print(f"  {'─' * 72}")
+    for key in sorted(measured):
+        summary = summarize(key, measured[key])
+        issues = check_page(summary, budget_for(key, budgets), previous_pages.get(key), args.tolerance)
+        pages[key] = summary
+        all_issues.extend(issues)
+        if issues:
+            failing.append(key)
+        status = "❌" if issues else "✅"
+        print(f"  {status} {key[:31]:<31} {summary['loads']:>5} {summary['ttfb_ms']:>6.0f}ms "
+              f"{summary['lcp_candidate_ms']:>6.0f}ms {summary['transfer_kb']:>8.0f} {summary['requests']:>5.0f}")
+
+    all_passed = bool(pages) and not all_issues
+    print("\n" + "=" * 70)
+    if all_issues:
+        print("  ❌ PAGE LOAD BUDGETS EXCEEDED:")
+        print("=" * 70)
+        for i, issue in enumerate(all_issues, 1):
+            print(f"  {i}. {issue}")
+        for key in failing:
+            print(f"\n  🔎 {key} - slowest requests ({pages[key]['slowest_url']})")
+            rows = sorted(pages[key]["waterfall"], key=lambda r: r["start_ms"] + r["duration_ms"], reverse=True)
+            for row in rows[:5]:
+                print(f"      └─ +{row['start_ms']:.0f}ms {row['duration_ms']:.0f}ms "
+                      f"{row['bytes'] / 1024:.0f}KB {row['url'][:80]}")
+    elif pages:
+        print("  ✅ ALL PAGE LOAD BUDGETS MET")
+    else:
+        print("  ❌ No page loads found in the traces")
+    print("=" * 70)
+
+    output = {
+        "all_passed": all_passed,
+        "issues": all_issues,
+        "sources": [os.path.relpath(p, BASE_PATH) for p in sources],
+        "baseline": baseline.get("timestamp"),
+        "pages": pages,
+        "reference": (
+            {key: {m: page[m] for m in METRICS} for key, page in pages.items()} if all_passed else previous_pages
+        ),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, BASE_PATH)}")
+    return 0 if all_passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+Query Plan Capture - SINOTRUK
+Pulls the SQL templates out of deploy/server/index.js and runs
+EXPLAIN (ANALYZE, BUFFERS) for each one against a local PostgreSQL loaded
+with production-sized data (see scripts/db_loader.py):
+
+- string literals passed to pool.query, including ones built up with
+  `query += ...` (GET /api/products, ensureUniqueSlug); every optional
+  filter becomes its own variant, and `query.replace('SELECT *', ...)`
+  count queries are derived from the same variants
+- placeholders are filled with representative values read from the
+  database: the median value of the column they are compared with, its
+  first word for ILIKE/LIKE patterns, 50/0 for LIMIT/OFFSET
+- every query with an OFFSET placeholder is also run with a deep offset
+
+Statements are prepared and executed like node-pg does (unnamed statements,
+so always a custom plan); plan_cache_mode = force_custom_plan keeps Postgres
+from switching to a generic plan after the fifth EXECUTE. Each one is run
+--repeat times and the median execution time is kept. Sequential scans over
+large tables, expensive deep offsets and plans whose shape changed from the
+baseline are flagged; plan changes fail the run until the baseline is
+updated with --update-baseline, which also drops entries for queries that
+are no longer in index.js. Baseline entries are keyed by route, query
+position and variant, so editing a query's SQL still compares its plan.
+Write statements are not executed.
+
+Usage:
+    python scripts/query_plans.py
+    python scripts/query_plans.py --dry-run            # templates and parameters only
+    python scripts/query_plans.py --only products --repeat 5
+    python scripts/query_plans.py --update-baseline
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import statistics
+from datetime import datetime
+
+import server_utils
+from server_utils import quote_literal, quote_ident
+
+INDEX_JS = os.path.join(server_utils.SERVER_DIR, "index.js")
+SQL_START_RE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.I)
+# Statements, not fragments like the 'SELECT *' passed to .replace()
+SQL_BODY_RE = re.compile(r"\b(FROM|INTO|SET)\b", re.I)
+CONTEXT_RE = re.compile(r"app\.(get|post|put|patch|delete)\(\s*'([^']+)'|^(?:async\s+)?function\s+(\w+)", re.M)
+ASSIGN_RE = re.compile(r"(?:let|const|var)\s+(\w+)\s*=\s*$")
+PARAM_INDEX_RE = re.compile(r"let\s+paramIndex\s*=\s*(\d+)")
+COUNT_DERIVE_RE = re.compile(r"(\w+)\.replace\(\s*'([^']*)'\s*,\s*'([^']*)'\s*\)\.split\(\s*'([^']*)'\s*\)\[0\]")
+PLACEHOLDER_RE = re.compile(r"\$(\d+)\b")
+FROM_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|ON|LEFT|RIGHT|INNER|JOIN|GROUP|ORDER|LIMIT)(\w+))?", re.I)
+DEFAULT_LIMIT = 50
+DEEP_OFFSET = 10000
+
+
+def scan_template(src, i):
+    """Index just past the template literal starting at src[i] == '`'"""
+    i += 1
+    while i < len(src):
+        ch = src[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "`":
+            return i + 1
+        if src.startswith("${", i):
+            i = scan_expression(src, i + 2)
+            continue
+        i += 1
+    return i
+
+
+def scan_expression(src, i):
+    """Index just past the `}` closing a ${...} expression"""
+    depth = 1
+    while i < len(src) and depth:
+        ch = src[i]
+        if ch in "'\"":
+            i = scan_string(src, i)
+            continue
+        if ch == "`":
+            i = scan_template(src, i)
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        i += 1
+    return i
+
+
+def scan_string(src, i):
+    quote = src[i]
+    i += 1
+    while i < len(src) and src[i] != quote:
+        i += 2 if src[i] == "\\" else 1
+    return i + 1
+
+
+def js_literals(src):
+    """(start, end, kind, body) of every top-level string/template literal, skipping comments"""
+    i = 0
+    while i < len(src):
+        if src.startswith("//", i):
+            i = src.find("\n", i)
+            i = len(src) if i == -1 else i
+            continue
+        if src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            i = len(src) if end == -1 else end + 2
+            continue
+        ch = src[i]
+        if ch in "'\"":
+            end = scan_string(src, i)
+            yield i, end, "string", src[i + 1:end - 1]
+            i = end
+            continue
+        if ch == "`":
+            end = scan_template(src, i)
+            yield i, end, "template", src[i + 1:end - 1]
+            i = end
+            continue
+        i += 1
+
+
+def line_of(src, pos):
+    return src.count("\n", 0, pos) + 1
+
+
+def indent_of(src, pos):
+    start = src.rfind("\n", 0, pos) + 1
+    line = src[start:pos]
+    return len(line) - len(line.lstrip())
+
+
+def context_of(src, pos):
+    """Route ('GET /api/products') or helper function ('ensureUniqueSlug()') enclosing pos"""
+    context = "module"
+    for match in CONTEXT_RE.finditer(src, 0, pos):
+        if match.group(1):
+            context = f"{match.group(1).upper()} {match.group(2)}"
+        else:
+            context = f"{match.group(3)}()"
+    return context
+
+
+def scope_end(src, pos):
+    """End of the route handler or function containing pos"""
+    match = re.compile(r"^(?:app\.|(?:async\s+)?function\s)", re.M).search(src, pos)
+    return match.start() if match else len(src)
+
+
+def unescape_js(body):
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), body)
+
+
+def resolve_identifier(src, name, start, pos):
+    """Value of a local string (or the fallback branch of a string ternary) assigned before pos"""
+    assign = None
+    for match in re.finditer(r"(?:const|let|var)\s+" + re.escape(name) + r"\s*=", src[start:pos]):
+        assign = start + match.end()
+    if assign is None:
+        return None
+    statement_end = src.find(";", assign)
+    literals = [lit for lit in js_literals(src[assign:statement_end])]
+    if not literals:
+        return None
+    # `cond ? 'a' : 'b'` -> 'b' (the no-filter/default case); a plain literal is the only candidate
+    return evaluate(literals[-1][3], literals[-1][2], {"paramIndex": 1}, src, start, assign)
+
+
+def evaluate(body, kind, state, src, scope_start, pos):
+    """Render a JS literal to SQL; returns None when an interpolation cannot be resolved"""
+    if kind == "string":
+        return unescape_js(body)
+    out = []
+    i = 0
+    while i < len(body):
+        if body[i] == "\\":
+            out.append(unescape_js(body[i:i + 2]))
+            i += 2
+            continue
+        if body.startswith("${", i):
+            end = scan_expression(body, i + 2)
+            expr = body[i + 2:end - 1].strip()
+            i = end
+            if expr == "paramIndex++":
+                out.append(str(state["paramIndex"]))
+                state["paramIndex"] += 1
+            elif re.fullmatch(r"paramIndex(\s*\+\s*\d+)?", expr):
+                offset = int(expr.split("+")[1]) if "+" in expr else 0
+                out.append(str(state["paramIndex"] + offset))
+            elif re.fullmatch(r"\w+", expr):
+                value = resolve_identifier(src, expr, scope_start, pos)
+                if value is None:
+                    return None
+                out.append(value)
+            else:
+                return None
+            continue
+        out.append(body[i])
+        i += 1
+    return "".join(out)
+
+
+def block_increments(src, start, indent):
+    """paramIndex += k / paramIndex++ statements in the block that starts at `start`"""
+    total = 0
+    pos = src.find("\n", start) + 1
+    while 0 < pos < len(src):
+        end = src.find("\n", pos)
+        end = len(src) if end == -1 else end
+        line = src[pos:end]
+        if line.strip():
+            if len(line) - len(line.lstrip()) < indent:
+                break
+            match = re.fullmatch(r"\s*paramIndex\s*(\+=\s*(\d+)|\+\+);?\s*", line)
+            if match:
+                total += int(match.group(2)) if match.group(2) else 1
+        pos = end + 1
+    return total
+
+
+def extract_templates(src):
+    """
+    Query variants of index.js as dicts (id, context, line, sql) plus skipped templates.
+    Ids name the route/function, the query's position in it and the variant
+    ("GET /api/products q1 +2"), not the SQL text, so an edited query keeps
+    its baseline entry and a changed plan is reported.
+    """
+    literals = list(js_literals(src))
+    builder_fragments = set()
+    templates = []
+    skipped = []
+    ordinals = {}
+
+    for start, end, kind, body in literals:
+        if start in builder_fragments or not SQL_START_RE.match(body) or not SQL_BODY_RE.search(body):
+            continue
+        context = context_of(src, start)
+        line = line_of(src, start)
+        ordinals[context] = ordinals.get(context, 0) + 1
+        query_id = f"{context} q{ordinals[context]}"
+        scope_start = max((m.start() for m in CONTEXT_RE.finditer(src, 0, start)), default=0)
+        base_state = {"paramIndex": int((PARAM_INDEX_RE.findall(src[scope_start:start]) or ["1"])[-1])}
+
+        assigned = ASSIGN_RE.search(src[max(0, start - 80):start])
+        fragments = []
+        if assigned:
+            var = assigned.group(1)
+            scope = scope_end(src, end)
+            base_indent = indent_of(src, start)
+            unresolved = False
+            for match in re.finditer(r"\b" + re.escape(var) + r"\s*\+=\s*", src[end:scope]):
+                frag_pos = end + match.end()
+                frag = next((lit for lit in literals if lit[0] == frag_pos), None)
+                if frag is None:
+                    unresolved = True
+                    break
+                builder_fragments.add(frag[0])
+                indent = indent_of(src, frag_pos)
+                fragments.append({
+                    "literal": frag,
+                    "conditional": indent > base_indent,
+                    "increments": block_increments(src, frag[1], indent) if indent > base_indent else 0,
+                })
+            if unresolved:
+                skipped.append({"context": context, "line": line, "reason": f"'{var}' is extended with a non-literal"})
+                continue
+            derive = COUNT_DERIVE_RE.search(src[end:scope])
+            derive = derive.groups() if derive and derive.group(1) == var else None
+        else:
+            derive = None
+
+        conditional = [i for i, f in enumerate(fragments) if f["conditional"]]
+        for chosen in [None] + conditional:
+            state = dict(base_state)
+            sql = evaluate(body, kind, state, src, scope_start, start)
+            label = "base" if chosen is None else None
+            variant_key = "base" if chosen is None else f"+{conditional.index(chosen) + 1}"
+            for i, fragment in enumerate(fragments):
+                if fragment["conditional"] and i != chosen:
+                    continue
+                f_start, _, f_kind, f_body = fragment["literal"]
+                text = evaluate(f_body, f_kind, state, src, scope_start, f_start)
+                if sql is None or text is None:
+                    sql = None
+                    break
+                sql += text
+                state["paramIndex"] += fragment["increments"]
+                if i == chosen:
+                    label = " ".join(text.split())[:60]
+            if sql is None:
+                skipped.append({"context": context, "line": line, "reason": "unresolved interpolation"})
+                break
+            sql = " ".join(sql.split())
+            templates.append({"id": f"{query_id} {variant_key}", "context": context, "line": line,
+                              "variant": label or "base", "sql": sql})
+            if derive:
+                _, old, new, cut = derive
+                count_sql = sql.replace(old, new, 1).split(cut)[0]
+                templates.append({"id": f"{query_id} count {variant_key}", "context": context, "line": line,
+                                  "variant": f"count of {label or 'base'}", "sql": count_sql})
+
+    # The same statement can be reached from several variants; the first one keeps it
+    unique = {}
+    for template in templates:
+        unique.setdefault(template["sql"], template)
+    return list(unique.values()), skipped
+
+
+class ParameterSampler:
+    """Representative values for placeholders, read once per column from the database"""
+
+    def __init__(self, url):
+        self.url = url
+        self.columns = {}
+        self.cache = {}
+        for table, column, data_type in server_utils.query_rows(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = 'public'", url
+        ):
+            self.columns.setdefault(table, {})[column] = data_type
+
+    def table_for(self, sql, column):
+        qualifier, _, name = column.rpartition(".")
+        aliases = {}
+        for table, alias in FROM_RE.findall(sql):
+            aliases[table] = table
+            if alias:
+                aliases[alias] = table
+        if qualifier:
+            return aliases.get(qualifier), name
+        for table in dict.fromkeys(aliases.values()):
+            if name in self.columns.get(table, {}):
+                return table, name
+        return None, name
+
+    def median(self, table, column, unnest=False):
+        key = (table, column, unnest)
+        if key not in self.cache:
+            source = f"SELECT unnest({quote_ident(column)}) AS v FROM {quote_ident(table)}" if unnest else \
+                f"SELECT {quote_ident(column)} AS v FROM {quote_ident(table)}"
+            rows = server_utils.query_rows(
+                f"SELECT v::text FROM ({source}) s WHERE v IS NOT NULL ORDER BY v "
+                f"OFFSET (SELECT count(*) / 2 FROM ({source}) c WHERE v IS NOT NULL) LIMIT 1", self.url
+            )
+            self.cache[key] = rows[0][0] if rows else None
+        return self.cache[key]
+
+    def values(self, sql, deep_offset):
+        """{placeholder number: SQL literal}; raises LookupError when one cannot be inferred"""
+        values = {}
+        for number in sorted({int(n) for n in PLACEHOLDER_RE.findall(sql)}):
+            p = rf"\${number}\b"
+            if re.search(rf"\bLIMIT\s+{p}", sql, re.I):
+                values[number] = str(DEFAULT_LIMIT)
+                continue
+            if re.search(rf"\bOFFSET\s+{p}", sql, re.I):
+                values[number] = str(deep_offset)
+                continue
+            match = re.search(rf"{p}\s*=\s*ANY\(\s*([\w.]+)\s*\)", sql, re.I)
+            array_match = re.search(rf"([\w.]+)\s*=\s*ANY\(\s*{p}\s*\)", sql, re.I)
+            in_match = re.search(rf"([\w.]+)\s+IN\s*\([^)]*{p}", sql, re.I)
+            if match:
+                table, column = self.table_for(sql, match.group(1))
+                value = self.median(table, column, unnest=True) if table else None
+            elif array_match or in_match:
+                table, column = self.table_for(sql, (array_match or in_match).group(1))
+                value = self.median(table, column) if table else None
+                if value is not None and array_match:
+                    value = "{" + json.dumps(value, ensure_ascii=False) + "}"
+            else:
+                match = re.search(rf"([\w.]+)\s*(=|!=|<>|>=|<=|>|<|I?LIKE)\s*{p}", sql, re.I) or \
+                    re.search(rf"{p}\s*(=|!=|<>)\s*([\w.]+)", sql, re.I)
+                if not match:
+                    raise LookupError(f"cannot infer a value for ${number}")
+                column, operator = (match.group(1), match.group(2)) if match.re.pattern.startswith("(") else \
+                    (match.group(2), match.group(1))
+                table, name = self.table_for(sql, column)
+                if table is None:
+                    raise LookupError(f"cannot find the table of '{column}' for ${number}")
+                value = self.median(table, name)
+                if value is not None and operator.upper().endswith("LIKE"):
+                    words = [w for w in value.split() if len(w) >= 3] or [value]
+                    value = f"%{words[0]}%"
+            if value is None:
+                raise LookupError(f"no data to sample for ${number}")
+            values[number] = quote_literal(value)
+        return values
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def plan_shape(node):
+    """Node types, relations and indexes, without row counts or costs"""
+    parts = [node["Node Type"]]
+    for key in ("Join Type", "Relation Name", "Index Name", "Strategy"):
+        if node.get(key):
+            parts.append(str(node[key]))
+    children = ",".join(plan_shape(c) for c in node.get("Plans", []))
+    return "(" + " ".join(parts) + (f" [{children}]" if children else "") + ")"
+
+
+def explain(template, values, repeat, url):
+    """Run EXPLAIN (ANALYZE, BUFFERS) `repeat` times; returns the last plan and all timings"""
+    args = ", ".join(values[n] for n in sorted(values))
+    execute = f"EXECUTE qp({args})" if values else "EXECUTE qp"
+    # Without this the 6th EXECUTE may switch to a generic plan, so --repeat would change the plan captured
+    sql = ["SET plan_cache_mode = force_custom_plan;", f"PREPARE qp AS {template['sql']};"]
+    for i in range(repeat):
+        sql.append(f"\\echo ==PLAN {i}==")
+        sql.append(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {execute};")
+    output = server_utils.run_sql("\n".join(sql) + "\n", url)
+    plans = [json.loads(chunk)[0] for chunk in re.split(r"^==PLAN \d+==$", output, flags=re.M)[1:]]
+    return plans
+
+
+def analyze(plan, args):
+    """Flags for one captured plan"""
+    flags = []
+    for node in plan_nodes(plan["Plan"]):
+        loops = node.get("Actual Loops", 1) or 1
+        if node["Node Type"] == "Seq Scan":
+            scanned = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+            if scanned >= args.seq_scan_rows:
+                flags.append(f"seq scan on {node.get('Relation Name')} reads {scanned} rows")
+        if node["Node Type"] == "Limit" and node.get("Plans"):
+            read = node["Plans"][0].get("Actual Rows", 0) * node["Plans"][0].get("Actual Loops", 1)
+            discarded = read - node.get("Actual Rows", 0) * loops
+            if discarded >= args.offset_rows:
+                flags.append(f"OFFSET reads and discards {discarded} rows")
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture EXPLAIN ANALYZE plans for the SQL in deploy/server/index.js")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--source", default=INDEX_JS, help="server source to extract queries from")
+    parser.add_argument("--only", help="regex on query id or SQL")
+    parser.add_argument("--repeat", type=int, default=3, help="executions per query, median time is kept")
+    parser.add_argument("--deep-offset", type=int, default=DEEP_OFFSET, help=f"OFFSET for deep-page variants (default {DEEP_OFFSET})")
+    parser.add_argument("--seq-scan-rows", type=int, default=10000, help="flag sequential scans reading at least this many rows")
+    parser.add_argument("--offset-rows", type=int, default=1000, help="flag OFFSETs discarding at least this many rows")
+    parser.add_argument("--dry-run", action="store_true", help="list templates without touching the database")
+    parser.add_argument("--baseline", default=os.path.join(server_utils.BASE_PATH, "scripts/query_plans_baseline.json"))
+    parser.add_argument("--update-baseline", action="store_true", help="accept the captured plans as the new baseline")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/query_plans_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  QUERY PLAN CAPTURE - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        src = f.read()
+    templates, skipped = extract_templates(src)
+    reads = [t for t in templates if re.match(r"\s*(SELECT|WITH)\b", t["sql"], re.I)]
+    writes = len(templates) - len(reads)
+    deep = []
+    for t in reads:
+        if re.search(r"\bOFFSET\s+\$\d+", t["sql"], re.I):
+            deep.append({**t, "id": t["id"] + " deep-offset", "variant": f"{t['variant']} (OFFSET {args.deep_offset})",
+                         "deep_of": t["id"]})
+    queries = reads + deep
+    extracted_ids = {q["id"] for q in queries}
+    if args.only:
+        queries = [q for q in queries if re.search(args.only, q["id"] + " " + q["sql"])]
+    print(f"  Templates: {len(templates)} ({writes} writes not executed), "
+          f"{len(skipped)} skipped, {len(queries)} queries to explain")
+    for s in skipped:
+        print(f"  ⚠️  {s['context']} (index.js:{s['line']}): {s['reason']}")
+
+    if args.dry_run:
+        for q in queries:
+            print(f"\n  🔎 {q['id']} [{q['variant']}] index.js:{q['line']}")
+            print(f"      {q['sql']}")
+        return 0
+
+    try:
+        baseline = {}
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("plans", {})
+    except (OSError, ValueError):
+        pass
+    gone = sorted(set(baseline) - extracted_ids)
+    if gone:
+        print(f"  ⚠️  {len(gone)} baseline entries are no longer extracted"
+              f"{' (pruned)' if args.update_baseline else ' - pruned by --update-baseline'}")
+
+    try:
+        sampler = ParameterSampler(args.database_url)
+    except server_utils.PsqlError as e:
+        print(f"  ❌ Cannot read the schema: {e}")
+        return 1
+
+    results = []
+    by_id = {}
+    for q in queries:
+        print(f"\n  🔎 {q['id']} [{q['variant']}]")
+        result = {key: q[key] for key in ("id", "context", "line", "variant", "sql")}
+        try:
+            values = sampler.values(q["sql"], args.deep_offset if "deep_of" in q else 0)
+            plans = explain(q, values, max(1, args.repeat), args.database_url)
+        except (LookupError, server_utils.PsqlError, ValueError) as e:
+            print(f"      ❌ {e}")
+            result["error"] = str(e)
+            results.append(result)
+            continue
+
+        plan = plans[-1]
+        times = [p["Execution Time"] for p in plans]
+        shape = plan_shape(plan["Plan"])
+        result.update({
+            "params": values,
+            "execution_ms": round(statistics.median(times), 3),
+            "planning_ms": round(plan.get("Planning Time", 0), 3),
+            "shape": shape,
+            "shape_hash": hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12],
+            "flags": analyze(plan, args),
+            "plan": plan,
+        })
+        shallow = by_id.get(q.get("deep_of"))
+        if shallow and "execution_ms" in shallow and shallow["execution_ms"] > 0:
+            ratio = result["execution_ms"] / shallow["execution_ms"]
+            result["deep_offset_ratio"] = round(ratio, 1)
+            if ratio >= 5:
+                result["flags"].append(f"OFFSET {args.deep_offset} is {ratio:.0f}x slower than the first page")
+        previous = baseline.get(q["id"])
+        if previous and previous["shape_hash"] != result["shape_hash"]:
+            result["plan_changed"] = {"from": previous["shape"], "to": shape,
+                                      "baseline_ms": previous["execution_ms"],
+                                      "sql_changed": previous["sql"] != q["sql"]}
+        elif not previous:
+            result["new"] = True
+
+        print(f"      ⏳ {result['execution_ms']:.2f} ms (planning {result['planning_ms']:.2f} ms), "
+              f"{' '.join(f'${n}={v}' for n, v in sorted(values.items()))}")
+        for flag in result["flags"]:
+            print(f"      ⚠️  {flag}")
+        if result.get("new"):
+            print("      📄 no baseline entry yet")
+        if "plan_changed" in result:
+            edited = ", SQL edited since" if result["plan_changed"]["sql_changed"] else ""
+            print(f"      ❌ plan changed (baseline {previous['execution_ms']:.2f} ms{edited})")
+            print(f"         was: {previous['shape']}")
+            print(f"         now: {shape}")
+        by_id[q["id"]] = result
+        results.append(result)
+
+    errors = [r for r in results if "error" in r]
+    changed = [r for r in results if "plan_changed" in r]
+    flagged = [r for r in results if r.get("flags")]
+    slowest = sorted((r for r in results if "execution_ms" in r), key=lambda r: r["execution_ms"], reverse=True)
+
+    print(f"\n  Explained: {len(results) - len(errors)}, errors: {len(errors)}, flagged: {len(flagged)}, plan changes: {len(changed)}")
+    for r in slowest[:5]:
+        print(f"      {r['execution_ms']:>9.2f} ms  {r['id']} [{r['variant']}]")
+
+    if args.update_baseline or not baseline:
+        # Queries not captured this run (--only, errors) keep their entry; ones no longer in index.js are dropped
+        snapshot = {query_id: entry for query_id, entry in baseline.items() if query_id in extracted_ids}
+        snapshot.update({r["id"]: {k: r[k] for k in ("sql", "shape", "shape_hash", "execution_ms")}
+                         for r in results if "shape" in r})
+        with open(args.baseline, "w") as f:
+            json.dump({"plans": snapshot, "timestamp": datetime.now().isoformat()}, f, indent=2)
+        print(f"  📄 Baseline written: {os.path.relpath(args.baseline, server_utils.BASE_PATH)}")
+
+    output = {
+        "source": os.path.relpath(args.source, server_utils.BASE_PATH),
+        "queries": results,
+        "skipped": skipped,
+        "errors": len(errors),
+        "flagged": len(flagged),
+        "plan_changes": len(changed),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 1 if errors or (changed and not args.update_baseline) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Search Key Backfill - SINOTRUK
+Computes accent-folded search keys so "danh muc phu tung" finds
+"Danh mục phụ tùng":
+
+- products.search_key   = fold(name) | fold(code) | fold(manufacturer_code)
+- categories.search_key = fold(name) | fold(code)
+
+fold_text() is also the normalizer for queries; foldSearchText() in
+deploy/server/index.js implements the same rules for the API.
+
+The backfill walks each table by primary key in chunks (keyset pagination,
+no long-running snapshot), and writes each chunk in its own short
+transaction with a lock_timeout, only touching rows whose key changed. It can
+be stopped and re-run at any time; --only-missing fills new rows cheaply.
+
+Before the first chunk the updated_at trigger function is replaced with the
+one from deploy/server/init.sql, which ignores changes to search_key alone, so
+the backfill keeps every row's real last-modified time. Afterwards the pg_trgm
+GIN indexes that serve `search_key LIKE '%...%'` are built CONCURRENTLY.
+
+Usage:
+    python scripts/search_keys.py                       # backfill both tables
+    python scripts/search_keys.py --only-missing --table products
+    python scripts/search_keys.py --fold "Danh mục phụ tùng"
+"""
+
+import sys
+import time
+import argparse
+import unicodedata
+from datetime import datetime
+
+import server_utils
+from server_utils import quote_literal
+
+KEY_SEPARATOR = " | "
+
+TABLES = {
+    "products": ["name", "code", "manufacturer_code"],
+    "categories": ["name", "code"],
+}
+
+
+def fold_text(text):
+    """Lowercase, strip Vietnamese tone/vowel marks (NFD combining marks, đ -> d), collapse spaces"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if not "\u0300" <= ch <= "\u036f")
+    stripped = stripped.replace("đ", "d").replace("Đ", "D")
+    return " ".join(stripped.lower().split())
+
+
+def build_search_key(*values):
+    return KEY_SEPARATOR.join(folded for folded in (fold_text(v) for v in values) if folded)
+
+
+# Same function as deploy/server/init.sql
+UPDATED_AT_FUNCTION = """
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF to_jsonb(NEW) - 'search_key' IS DISTINCT FROM to_jsonb(OLD) - 'search_key' THEN
+        NEW.updated_at = now();
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+"""
+
+
+def ensure_columns(database_url):
+    """Adding a nullable column without a default is a catalog-only change"""
+    sql = "\n".join(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_key text;" for table in TABLES
+    )
+    server_utils.run_sql("SET lock_timeout = '5s';\n" + sql + UPDATED_AT_FUNCTION, database_url)
+
+
+def ensure_indexes(tables, database_url):
+    """
+    Trigram indexes for the substring search; CONCURRENTLY so writes are not
+    blocked. The partial index on rows without a key serves the API's ILIKE
+    fallback, so the OR in the products search stays a bitmap index scan.
+    """
+    sql = "CREATE EXTENSION IF NOT EXISTS pg_trgm;\n" + "\n".join(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table}_search_key_trgm "
+        f"ON {table} USING gin (search_key gin_trgm_ops);"
+        for table in tables
+    )
+    if "products" in tables:
+        sql += ("\nCREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_search_key_missing "
+                "ON products (id) WHERE search_key IS NULL;")
+    server_utils.run_sql(sql, database_url)
+
+
+def fetch_chunk(table, last_id, chunk_size, only_missing, database_url):
+    columns = ", ".join(TABLES[table])
+    where = f"id > {int(last_id)}"
+    if only_missing:
+        where += " AND search_key IS NULL"
+    query = f"SELECT id, {columns}, search_key FROM {table} WHERE {where} ORDER BY id LIMIT {int(chunk_size)}"
+    return server_utils.query_rows(query, database_url)
+
+
+def write_chunk(table, updates, lock_timeout, database_url):
+    """One bounded transaction per chunk; rows already up to date are skipped by the WHERE"""
+    values = ",\n".join(f"({pid}, {quote_literal(key)})" for pid, key in updates)
+    sql = (
+        f"SET LOCAL lock_timeout = {quote_literal(lock_timeout)};\n"
+        f"UPDATE {table} AS t SET search_key = v.key\n"
+        f"FROM (VALUES\n{values}\n) AS v(id, key)\n"
+        "WHERE t.id = v.id AND t.search_key IS DISTINCT FROM v.key;"
+    )
+    server_utils.run_sql(sql, database_url, single_transaction=True)
+
+
+def backfill_table(table, args, progress):
+    """progress["last_id"] is the last id whose chunk is committed (the --start-id to resume from)"""
+    last_id = args.start_id
+    progress["last_id"] = last_id
+    scanned = updated = chunks = 0
+    started = time.time()
+    while True:
+        rows = fetch_chunk(table, last_id, args.chunk_size, args.only_missing, args.database_url)
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            pid, values, current = int(row[0]), row[1:-1], row[-1]
+            key = build_search_key(*values)
+            if key != current:
+                updates.append((pid, key))
+        if updates and not args.dry_run:
+            for attempt in range(args.retries + 1):
+                try:
+                    write_chunk(table, updates, args.lock_timeout, args.database_url)
+                    break
+                except server_utils.PsqlError as e:
+                    if attempt == args.retries:
+                        raise
+                    print(f"      └─ retrying chunk after {last_id}: {e}")
+                    time.sleep(1 + attempt)
+        scanned += len(rows)
+        updated += len(updates)
+        chunks += 1
+        last_id = int(rows[-1][0])
+        progress["last_id"] = last_id
+        if chunks % 20 == 0:
+            rate = scanned / max(time.time() - started, 1e-6)
+            print(f"  ⏳ {table}: {scanned} rows scanned, {updated} updated (last id {last_id}, {rate:.0f} rows/s)")
+        if args.sleep:
+            time.sleep(args.sleep)
+    return {"scanned": scanned, "updated": updated, "chunks": chunks,
+            "last_id": last_id, "seconds": round(time.time() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill accent-folded search keys")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--table", choices=sorted(TABLES), action="append", help="table(s) to backfill (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="rows per transaction")
+    parser.add_argument("--start-id", type=int, default=0, help="resume after this id")
+    parser.add_argument("--only-missing", action="store_true", help="only rows without a search_key")
+    parser.add_argument("--lock-timeout", default="2s", help="lock_timeout for each chunk transaction")
+    parser.add_argument("--retries", type=int, default=3, help="retries for a chunk that hits a lock timeout")
+    parser.add_argument("--sleep", type=float, default=0.0, help="pause between chunks in seconds")
+    parser.add_argument("--dry-run", action="store_true", help="compute keys without writing")
+    parser.add_argument("--fold", help="print the folded form of a query and exit")
+    args = parser.parse_args()
+
+    if args.fold is not None:
+        print(fold_text(args.fold))
+        return 0
+
+    print("=" * 70)
+    print("  SEARCH KEY BACKFILL - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    tables = args.table or list(TABLES)
+    progress = {}
+    try:
+        if not args.dry_run:
+            ensure_columns(args.database_url)
+        for table in tables:
+            print(f"\n  {table}")
+            progress = {"table": table}
+            result = backfill_table(table, args, progress)
+            print(f"  ✅ {result['scanned']} rows scanned, {result['updated']} updated "
+                  f"in {result['chunks']} chunks ({result['seconds']}s)")
+        progress = {"indexes": True}
+        if not args.dry_run:
+            ensure_indexes(tables, args.database_url)
+            print(f"\n  ✅ Trigram indexes on search_key: {', '.join(tables)}")
+    except server_utils.PsqlError as e:
+        print(f"  ❌ Backfill stopped: {e}")
+        if "last_id" in progress:
+            remaining = tables[tables.index(progress["table"]) + 1:]
+            print(f"      └─ Resume with: --table {progress['table']} --start-id {progress['last_id']}")
+            if remaining:
+                print(f"      └─ Then run: {' '.join(f'--table {t}' for t in remaining)}")
+        elif "indexes" in progress:
+            print("      └─ A failed CONCURRENTLY build leaves an INVALID index: drop it, then re-run")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
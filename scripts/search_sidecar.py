@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Product Search Sidecar - SINOTRUK
+In-memory trigram index over the accent-folded product search key
+(fold(name) | fold(code) | fold(manufacturer_code), see scripts/search_keys.py)
+that answers the same question as GET /api/products?search= without a
+round trip to PostgreSQL.
+
+- Posting lists are sorted array('i') of product ids, one per trigram
+- Refreshes are incremental: rows with a newer updated_at go into a small
+  delta index (their old postings are masked) and the main arrays are
+  rebuilt once the delta grows past --compact-ratio
+- Filters match the route: category (slug or id, vehicle categories filter
+  vehicle_ids), category_id, vehicle, show_on_homepage
+- Results are ranked (exact code > prefix > word start > substring, then
+  newest id first) and candidates are verified, so matches are exactly the
+  route's `search_key LIKE '%fold(search)%'` matches
+
+Usage:
+    python scripts/search_sidecar.py serve --port 3011
+        GET /search?search=wp10&vehicle=sitrak&limit=20  ->  {"total": 3, "ids": [...]}
+    python scripts/search_sidecar.py query wp10 --category dong-co
+    python scripts/search_sidecar.py benchmark --queries 200
+    python scripts/search_sidecar.py --dump deploy/server/init.sql query wp10
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from array import array
+from datetime import datetime
+from collections import namedtuple
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import server_utils
+import sql_dump
+from server_utils import quote_literal
+from search_keys import fold_text, build_search_key
+
+Product = namedtuple(
+    "Product",
+    "id name code manufacturer_code category_id vehicle_ids show_on_homepage updated_at fields search_key",
+)
+Category = namedtuple("Category", "id slug is_vehicle_name")
+
+PRODUCT_COLUMNS = "id, name, code, manufacturer_code, category_id, vehicle_ids, show_on_homepage"
+PRODUCT_QUERY = (
+    f"SELECT {PRODUCT_COLUMNS}, EXTRACT(EPOCH FROM updated_at::timestamptz) FROM products"
+)
+CATEGORY_QUERY = "SELECT id, slug, is_vehicle_name FROM categories"
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def parse_int_array(value):
+    """COPY text form of integer[] ('{1,2}') -> tuple of ints"""
+    if not value or value in ("{}", "NULL"):
+        return ()
+    return tuple(int(v) for v in value.strip("{}").split(",") if v.strip() not in ("", "NULL"))
+
+
+def parse_bool(value):
+    return str(value).lower() in ("t", "true", "1")
+
+
+def make_product(row):
+    pid, name, code, mcode, category_id, vehicle_ids, show, updated_at = row
+    fields = (fold_text(code), fold_text(mcode), fold_text(name))
+    return Product(
+        int(pid), name, code, mcode,
+        int(category_id) if category_id else None,
+        parse_int_array(vehicle_ids),
+        parse_bool(show) if show is not None else True,
+        float(updated_at) if updated_at and updated_at[:1].isdigit() else 0.0,
+        fields,
+        # Computed like the API writes and the backfill fills products.search_key
+        build_search_key(name, code, mcode),
+    )
+
+
+class ProductSource:
+    """Reads products/categories from PostgreSQL, or once from a SQL dump"""
+
+    def __init__(self, database_url=None, dump=None):
+        self.database_url = database_url
+        self.dump = dump
+
+    def categories(self):
+        if self.dump:
+            rows = self._dump_rows("categories", ["id", "slug", "is_vehicle_name"])
+        else:
+            rows = server_utils.copy_rows(CATEGORY_QUERY, self.database_url)
+        return {int(r[0]): Category(int(r[0]), r[1], parse_bool(r[2])) for r in rows}
+
+    def products(self, since=None):
+        if self.dump:
+            if since is not None:
+                return []
+            columns = [c.strip() for c in PRODUCT_COLUMNS.split(",")] + ["updated_at"]
+            return [make_product(r) for r in self._dump_rows("products", columns)]
+        query = PRODUCT_QUERY
+        if since is not None:
+            # >= so rows committed within the same second as the last refresh are not missed
+            query += f" WHERE updated_at::timestamptz >= to_timestamp({since!r})"
+        return [make_product(r) for r in server_utils.copy_rows(query, self.database_url)]
+
+    def product_count(self):
+        if self.dump:
+            return None
+        return int(server_utils.query_rows("SELECT count(*) FROM products", self.database_url)[0][0])
+
+    def product_ids(self):
+        return {int(r[0]) for r in server_utils.copy_rows("SELECT id FROM products", self.database_url)}
+
+    def _dump_rows(self, table, columns):
+        with open(self.dump, "r", encoding="utf-8") as f:
+            for _, dump_columns, values in sql_dump.iter_dump_rows(f, [table]):
+                row = dict(zip(dump_columns, values))
+                yield tuple(row.get(c) for c in columns)
+
+
+class SearchIndex:
+    def __init__(self, compact_ratio=0.1):
+        self.compact_ratio = compact_ratio
+        self.docs = {}
+        self.categories = {}
+        self.postings = {}
+        self.delta = {}
+        self.delta_ids = set()
+        self.masked = set()
+        self.last_updated_at = None
+        self.lock = threading.RLock()
+
+    # ---------- building ----------
+
+    @staticmethod
+    def _doc_trigrams(product):
+        return trigrams(product.search_key)
+
+    def build(self, products):
+        """Rebuild the main posting arrays from scratch"""
+        lists = {}
+        docs = {}
+        for product in products:
+            docs[product.id] = product
+        for pid in sorted(docs):
+            for gram in self._doc_trigrams(docs[pid]):
+                lists.setdefault(gram, []).append(pid)
+        with self.lock:
+            self.docs = docs
+            self.postings = {gram: array("i", ids) for gram, ids in lists.items()}
+            self.delta = {}
+            self.delta_ids = set()
+            self.masked = set()
+            if docs:
+                self.last_updated_at = max(p.updated_at for p in docs.values())
+
+    def upsert(self, products):
+        """Index new or changed products in the delta; their main postings are masked"""
+        with self.lock:
+            for product in products:
+                if product.id in self.docs:
+                    self.masked.add(product.id)
+                if product.id in self.delta_ids:
+                    for ids in self.delta.values():
+                        ids.discard(product.id)
+                self.docs[product.id] = product
+                self.delta_ids.add(product.id)
+                for gram in self._doc_trigrams(product):
+                    self.delta.setdefault(gram, set()).add(product.id)
+                if self.last_updated_at is None or product.updated_at > self.last_updated_at:
+                    self.last_updated_at = product.updated_at
+            if len(self.delta_ids) > self.compact_ratio * max(len(self.docs), 1):
+                self.build(list(self.docs.values()))
+
+    def delete(self, ids):
+        with self.lock:
+            for pid in ids:
+                if self.docs.pop(pid, None) is not None:
+                    self.masked.add(pid)
+                    self.delta_ids.discard(pid)
+
+    def refresh(self, source):
+        """Pull rows changed since the last refresh; returns the number of changed rows"""
+        self.categories = source.categories()
+        if self.last_updated_at is None:
+            self.build(source.products())
+            return len(self.docs)
+        changed = source.products(since=self.last_updated_at)
+        changed = [p for p in changed if self.docs.get(p.id) != p]
+        if changed:
+            self.upsert(changed)
+        count = source.product_count()
+        if count is not None and count != len(self.docs):
+            self.delete(set(self.docs) - source.product_ids())
+        return len(changed)
+
+    # ---------- querying ----------
+
+    def _candidates(self, key):
+        grams = trigrams(key)
+        if not grams:
+            return set(self.docs)
+        main_lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                main_lists = None
+                break
+            main_lists.append(ids)
+        found = set()
+        if main_lists:
+            main_lists.sort(key=len)
+            found = set(main_lists[0]).intersection(*main_lists[1:])
+            found -= self.masked
+        if self.delta_ids:
+            delta_lists = [self.delta.get(gram, ()) for gram in grams]
+            found |= set.intersection(*(set(ids) for ids in delta_lists))
+        return found
+
+    def _resolve_category(self, value, vehicle_only=False):
+        """Same lookup as the route: slug first, numeric values may also match id"""
+        for category in self.categories.values():
+            if vehicle_only and not category.is_vehicle_name:
+                continue
+            if category.slug == value or (str(value).isdigit() and category.id == int(value)):
+                return category
+        return None
+
+    @staticmethod
+    def _rank(product, key):
+        """Lower is better: exact code, code/manufacturer prefix, name prefix, word start, substring"""
+        code, mcode, name = product.fields
+        if key in (code, mcode):
+            return 0
+        if code.startswith(key) or mcode.startswith(key):
+            return 1
+        if name.startswith(key):
+            return 2
+        if f" {key}" in name:
+            return 3
+        return 4
+
+    def search(self, search="", category=None, category_id=None, vehicle=None,
+               show_on_homepage=None, limit=50, offset=0):
+        key = fold_text(search)
+        with self.lock:
+            ids = self._candidates(key) if key else set(self.docs)
+
+            filters = []
+            if category_id:
+                filters.append(lambda p, cid=int(category_id): p.category_id == cid)
+            elif category:
+                cat = self._resolve_category(category)
+                if cat and cat.is_vehicle_name:
+                    filters.append(lambda p, cid=cat.id: cid in p.vehicle_ids)
+                elif cat:
+                    filters.append(lambda p, cid=cat.id: p.category_id == cid)
+            if vehicle:
+                cat = self._resolve_category(vehicle, vehicle_only=True)
+                if cat:
+                    filters.append(lambda p, cid=cat.id: cid in p.vehicle_ids)
+            if show_on_homepage in (True, "true"):
+                filters.append(lambda p: p.show_on_homepage)
+
+            matches = []
+            for pid in ids:
+                product = self.docs.get(pid)
+                if product is None:
+                    continue
+                if key and key not in product.search_key:
+                    continue
+                if all(f(product) for f in filters):
+                    matches.append((self._rank(product, key) if key else 0, -pid))
+
+        matches.sort()
+        return len(matches), [-neg_id for _, neg_id in matches[offset:offset + limit]]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "products": len(self.docs),
+                "trigrams": len(self.postings),
+                "postings": sum(len(ids) for ids in self.postings.values()),
+                "posting_bytes": sum(ids.itemsize * len(ids) for ids in self.postings.values()),
+                "delta_products": len(self.delta_ids),
+                "masked": len(self.masked),
+            }
+
+
+# ---------- service ----------
+
+def make_handler(index):
+    class SearchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/health":
+                return self._send(200, {"status": "ok", **index.stats()})
+            if url.path != "/search":
+                return self._send(404, {"error": "Not found"})
+            try:
+                total, ids = index.search(
+                    search=params.get("search", ""),
+                    category=params.get("category"),
+                    category_id=params.get("category_id"),
+                    vehicle=params.get("vehicle"),
+                    show_on_homepage=params.get("show_on_homepage"),
+                    limit=int(params.get("limit", 50)),
+                    offset=int(params.get("offset", 0)),
+                )
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            self._send(200, {"total": total, "ids": ids})
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SearchHandler
+
+
+def refresh_loop(index, source, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            changed = index.refresh(source)
+            if changed:
+                print(f"  🔄 Refreshed {changed} products")
+        except server_utils.PsqlError as e:
+            print(f"  ⚠️  Refresh failed: {e}")
+
+
+def serve(index, source, args):
+    thread = threading.Thread(target=refresh_loop, args=(index, source, args.refresh), daemon=True)
+    thread.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(index))
+    print(f"  🔎 Search sidecar listening on http://{args.host}:{args.port}/search")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+# ---------- benchmark ----------
+
+def route_query(search):
+    """The GET /api/products?search= filter, including its fallback for rows not yet backfilled"""
+    key = quote_literal(f"%{fold_text(search)}%")
+    pattern = quote_literal(f"%{search}%")
+    return (
+        "SELECT id FROM products WHERE 1=1"
+        f" AND (search_key LIKE {key} OR (search_key IS NULL AND"
+        f" (name ILIKE {pattern} OR code ILIKE {pattern} OR manufacturer_code ILIKE {pattern})))"
+        " ORDER BY id DESC"
+    )
+
+
+def sample_queries(index, count, seed=42):
+    """Substrings of real names/codes, like what customers type"""
+    rng = random.Random(seed)
+    docs = list(index.docs.values())
+    queries = []
+    for _ in range(count):
+        product = rng.choice(docs)
+        field = rng.choice([f for f in (product.name, product.code, product.manufacturer_code) if f] or [""])
+        if len(field) < 2:
+            continue
+        length = rng.randint(2, min(8, len(field)))
+        start = rng.randint(0, len(field) - length)
+        queries.append(field[start:start + length])
+    return queries
+
+
+def explain_times(queries, database_url):
+    """Server-side execution time of each route query, from one psql session"""
+    sql = []
+    for query in queries:
+        sql.append(f"EXPLAIN (ANALYZE, FORMAT JSON) {route_query(query)};")
+        sql.append("\\echo ===")
+    output = server_utils.run_sql("\n".join(sql), database_url)
+    times = []
+    for block in output.split("===")[:len(queries)]:
+        plan = json.loads(block)
+        times.append(plan[0]["Execution Time"])
+    return times
+
+
+def benchmark(index, source, args):
+    queries = sample_queries(index, args.queries)
+    sidecar_ms = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(search=query)
+        sidecar_ms.append((time.perf_counter() - started) * 1000)
+
+    result = {"queries": len(queries), "index": index.stats(), "sidecar_ms": summarize(sidecar_ms)}
+    print(f"\n  Index: {result['index']}")
+    print(f"  Sidecar   : {format_summary(result['sidecar_ms'])}")
+
+    if not source.dump:
+        try:
+            db_ms = explain_times(queries, args.database_url)
+            result["db_ms"] = summarize(db_ms)
+            print(f"  Route (DB): {format_summary(result['db_ms'])}")
+            speedup = result["db_ms"]["mean"] / max(result["sidecar_ms"]["mean"], 1e-6)
+            result["speedup"] = round(speedup, 1)
+            print(f"  Speedup (mean): {speedup:.1f}x")
+
+            mismatches = 0
+            for query in queries[:args.verify]:
+                expected = [int(r[0]) for r in server_utils.query_rows(route_query(query), args.database_url)]
+                _, got = index.search(search=query, limit=len(index.docs))
+                if set(expected) != set(got):
+                    mismatches += 1
+            result["verified"] = min(args.verify, len(queries))
+            result["mismatches"] = mismatches
+            print(f"  Result sets checked: {result['verified']}, mismatches: {mismatches}")
+            if mismatches:
+                print("      └─ rows without search_key use the ILIKE fallback; run scripts/search_keys.py first")
+        except server_utils.PsqlError as e:
+            print(f"  ⚠️  Database benchmark skipped: {e}")
+
+    result["timestamp"] = datetime.now().isoformat()
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 1 if result.get("mismatches") else 0
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {"mean": 0, "p50": 0, "p99": 0}
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(values[len(values) // 2], 4),
+        "p99": round(values[min(len(values) - 1, int(len(values) * 0.99))], 4),
+    }
+
+
+def format_summary(summary):
+    return f"mean {summary['mean']:.3f}ms  p50 {summary['p50']:.3f}ms  p99 {summary['p99']:.3f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory trigram search for products")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--dump", help="load products from a SQL dump instead of the database")
+    parser.add_argument("--compact-ratio", type=float, default=0.1, help="delta size that triggers a rebuild")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="run the HTTP search service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=3011)
+    serve_parser.add_argument("--refresh", type=float, default=30, help="seconds between incremental refreshes")
+
+    query_parser = sub.add_parser("query", help="run one search and print the ids")
+    query_parser.add_argument("search")
+    query_parser.add_argument("--category")
+    query_parser.add_argument("--category-id")
+    query_parser.add_argument("--vehicle")
+    query_parser.add_argument("--show-on-homepage", action="store_true")
+    query_parser.add_argument("--limit", type=int, default=50)
+
+    bench_parser = sub.add_parser("benchmark", help="compare against the route's database query")
+    bench_parser.add_argument("--queries", type=int, default=200)
+    bench_parser.add_argument("--verify", type=int, default=50, help="queries whose result sets are compared")
+    bench_parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/search_benchmark_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  PRODUCT SEARCH SIDECAR - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    source = ProductSource(args.database_url, args.dump)
+    index = SearchIndex(args.compact_ratio)
+    try:
+        started = time.perf_counter()
+        index.refresh(source)
+        print(f"  Indexed {len(index.docs)} products in {time.perf_counter() - started:.2f}s")
+    except (server_utils.PsqlError, OSError) as e:
+        print(f"  ❌ Could not load products: {e}")
+        return 1
+
+    if args.command == "serve":
+        return serve(index, source, args)
+    if args.command == "benchmark":
+        return benchmark(index, source, args)
+
+    total, ids = index.search(
+        search=args.search, category=args.category, category_id=args.category_id,
+        vehicle=args.vehicle, show_on_homepage=args.show_on_homepage, limit=args.limit,
+    )
+    print(f"\n  {total} match(es)")
+    for pid in ids:
+        product = index.docs[pid]
+        print(f"  {pid:>8}  {product.code or '':<12} {product.manufacturer_code or '':<16} {product.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
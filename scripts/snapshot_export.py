@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Static Snapshot Exporter - SINOTRUK
+Writes the hottest read endpoints as static JSON files that nginx serves
+without touching Node or PostgreSQL:
+
+    api/products/<slug>.json           GET /api/products/:identifier (by slug)
+    api/categories.json                GET /api/categories (no filters)
+    api/catalog-articles/<slug>.json   GET /api/catalog-articles/:slug
+
+Each shard is written with precompressed .gz and .br siblings (brotli only
+when the brotli module is installed) for gzip_static / brotli_static, and
+listed in index.json with its hash, sizes and the source row version.
+
+Exports are incremental: only ids, slugs and updated_at are read for every
+row, full rows are fetched for shards whose row is new or changed, and
+shards whose row disappeared are removed. The API deletes the shards a
+write makes stale (invalidateSnapshot in index.js), and missing shard files
+are rewritten on the next run. A row that changes while the export runs is
+not written with the version read at the start: fetched rows must still
+carry that version, and the written shards are checked once more afterwards
+so an edit committed in between never leaves an old shard behind. Run it from cron every minute or after bulk
+imports; anything not in the snapshot falls through to the API.
+
+Usage:
+    python scripts/snapshot_export.py
+    python scripts/snapshot_export.py --out /www/wwwroot/hanoi-sinotruk.com/snapshot
+    python scripts/snapshot_export.py --full        # rewrite every shard
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+
+import server_utils
+
+try:
+    import brotli
+except ImportError:  # optional - .br files are skipped without it
+    brotli = None
+
+MANIFEST_NAME = "index.json"
+MANIFEST_VERSION = 1
+FETCH_BATCH = 500
+TIMESTAMP_RE = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?$")
+SAFE_SLUG_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+# Per-row shards: (name, table, row filter, shard directory)
+ROW_SHARDS = [
+    ("products", "products", "slug IS NOT NULL", "api/products"),
+    ("catalog_articles", "catalog_articles", "slug IS NOT NULL AND is_published = true", "api/catalog-articles"),
+]
+# Whole-table shards: (name, table, shard path)
+LIST_SHARDS = [
+    ("categories", "categories", "api/categories.json"),
+]
+
+
+def api_timestamps(row):
+    """
+    node-pg turns timestamp columns into Date objects, which res.json writes as
+    UTC ISO strings with milliseconds; row_to_json gives microseconds and no
+    zone. The API container runs with TZ=UTC (deploy/docker-compose.yml), so
+    only the format differs.
+    """
+    for key, value in row.items():
+        if isinstance(value, str):
+            match = TIMESTAMP_RE.match(value)
+            if match:
+                millis = (match.group(2) or "").ljust(3, "0")[:3]
+                row[key] = f"{match.group(1)}.{millis}Z"
+    return row
+
+
+def encode(payload):
+    """Same bytes as Express res.json: JSON.stringify without spaces, UTF-8"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_shard(root, rel_path, data):
+    """Write a shard and its precompressed siblings; returns its manifest entry"""
+    path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, data)
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    write_atomic(path + ".gz", gz)
+    entry = {"sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data), "gz_bytes": len(gz)}
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        write_atomic(path + ".br", br)
+        entry["br_bytes"] = len(br)
+    return entry
+
+
+def remove_shard(root, rel_path):
+    for suffix in ("", ".gz", ".br"):
+        try:
+            os.unlink(os.path.join(root, rel_path + suffix))
+        except FileNotFoundError:
+            pass
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION and manifest.get("brotli") == (brotli is not None):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "brotli": brotli is not None, "shards": {}}
+
+
+def fetch_json_rows(table, where, order, url):
+    """[(updated_at as text, row as the API returns it)]"""
+    query = (f"SELECT t.updated_at::text, row_to_json(t)::text "
+             f"FROM (SELECT * FROM {table} WHERE {where} ORDER BY {order}) t")
+    return [(version, api_timestamps(json.loads(text))) for version, text in server_utils.copy_rows(query, url)]
+
+
+def current_versions(table, ids, url):
+    """{id: updated_at as text} for the rows that still exist"""
+    rows = server_utils.query_rows(
+        f"SELECT id, updated_at::text FROM {table} WHERE id IN ({', '.join(str(i) for i in ids)})", url
+    )
+    return {int(row_id): updated_at for row_id, updated_at in rows}
+
+
+def export_row_shards(name, table, row_filter, directory, root, shards, full, url):
+    """Rewrite per-slug shards whose row version changed; returns (written, removed, unchanged)"""
+    versions = server_utils.query_rows(
+        f"SELECT id, slug, updated_at::text FROM {table} WHERE {row_filter} ORDER BY id", url
+    )
+    # The API returns the first match for a slug; keep the lowest id like ORDER BY id would
+    wanted = {}
+    for row_id, slug, updated_at in versions:
+        if not SAFE_SLUG_RE.match(slug):
+            continue
+        rel_path = f"{directory}/{slug}.json"
+        if rel_path not in wanted:
+            wanted[rel_path] = (int(row_id), updated_at)
+
+    stale = [
+        rel_path for rel_path, (row_id, updated_at) in wanted.items()
+        if full or shards.get(rel_path, {}).get("source") != {"table": table, "id": row_id, "updated_at": updated_at}
+        or not os.path.exists(os.path.join(root, rel_path))
+    ]
+    removed = [p for p, e in shards.items() if e.get("source", {}).get("table") == table and p not in wanted]
+    for rel_path in removed:
+        remove_shard(root, rel_path)
+        del shards[rel_path]
+
+    by_id = {wanted[p][0]: p for p in stale}
+    ids = sorted(by_id)
+    written = deferred = 0
+    for start in range(0, len(ids), FETCH_BATCH):
+        batch = ids[start:start + FETCH_BATCH]
+        where = f"id IN ({', '.join(str(i) for i in batch)})"
+        batch_written = []
+        for version, row in fetch_json_rows(table, where, "id", url):
+            rel_path = by_id[row["id"]]
+            if version != wanted[rel_path][1]:
+                # Changed since the versions were read; the next run exports the new version
+                deferred += 1
+                continue
+            entry = write_shard(root, rel_path, encode(row))
+            entry["source"] = {"table": table, "id": row["id"], "updated_at": version}
+            shards[rel_path] = entry
+            batch_written.append(row["id"])
+        # An edit committed after the fetch may have invalidated a shard before it was written
+        if batch_written:
+            now = current_versions(table, batch_written, url)
+            for row_id in batch_written:
+                rel_path = by_id[row_id]
+                if now.get(row_id) != shards[rel_path]["source"]["updated_at"]:
+                    remove_shard(root, rel_path)
+                    del shards[rel_path]
+                    deferred += 1
+                else:
+                    written += 1
+    unchanged = len(wanted) - len(stale)
+    print(f"  ✅ {name}: {written} written, {len(removed)} removed, {unchanged} unchanged"
+          + (f", {deferred} changed during the export (next run)" if deferred else ""))
+    return written, len(removed), unchanged
+
+
+def export_list_shard(name, table, rel_path, root, shards, full, url):
+    """A whole-table shard is rebuilt when its row count or newest updated_at changes"""
+    def table_source():
+        ((count, newest),) = server_utils.query_rows(f"SELECT count(*), max(updated_at)::text FROM {table}", url)
+        return {"table": table, "rows": int(count), "updated_at": newest}
+
+    source = table_source()
+    if not full and shards.get(rel_path, {}).get("source") == source and os.path.exists(os.path.join(root, rel_path)):
+        print(f"  ✅ {name}: unchanged")
+        return 0, 0, 1
+    rows = [row for _, row in fetch_json_rows(table, "true", "id", url)]
+    entry = write_shard(root, rel_path, encode(rows))
+    entry["source"] = source
+    shards[rel_path] = entry
+    if table_source() != source:
+        # Changed while it was being written (the API may already have removed it)
+        remove_shard(root, rel_path)
+        del shards[rel_path]
+        print(f"  ✅ {name}: changed during the export (next run)")
+        return 0, 0, 0
+    print(f"  ✅ {name}: written ({len(rows)} rows)")
+    return 1, 0, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export static, precompressed JSON snapshots of catalog reads")
+    parser.add_argument("--out", default=os.environ.get("SNAPSHOT_DIR") or os.path.join(server_utils.SERVER_DIR, "snapshot"),
+                        help="snapshot root served by nginx (default: SNAPSHOT_DIR or deploy/server/snapshot)")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--full", action="store_true", help="rewrite every shard")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/snapshot_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  STATIC SNAPSHOT EXPORTER - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+    if brotli is None:
+        print("  ⚠️  brotli module not installed - writing .gz only (pip install brotli)")
+
+    started = time.time()
+    os.makedirs(args.out, exist_ok=True)
+    manifest = load_manifest(args.out)
+    shards = manifest["shards"]
+    totals = {"written": 0, "removed": 0, "unchanged": 0}
+
+    try:
+        results = [
+            export_row_shards(name, table, row_filter, directory, args.out, shards, args.full, args.database_url)
+            for name, table, row_filter, directory in ROW_SHARDS
+        ]
+        results += [
+            export_list_shard(name, table, rel_path, args.out, shards, args.full, args.database_url)
+            for name, table, rel_path in LIST_SHARDS
+        ]
+    except server_utils.PsqlError as e:
+        print(f"  ❌ Export stopped: {e}")
+        # Keep what was written so far consistent with the files on disk
+        write_atomic(os.path.join(args.out, MANIFEST_NAME), encode(manifest))
+        return 1
+
+    for written, removed, unchanged in results:
+        totals["written"] += written
+        totals["removed"] += removed
+        totals["unchanged"] += unchanged
+
+    manifest["generated_at"] = datetime.now().isoformat()
+    manifest["shards"] = dict(sorted(shards.items()))
+    write_atomic(os.path.join(args.out, MANIFEST_NAME), encode(manifest))
+
+    elapsed = time.time() - started
+    raw = sum(e["bytes"] for e in shards.values())
+    gz = sum(e["gz_bytes"] for e in shards.values())
+    print(f"\n  Shards: {len(shards)} ({raw / 1024:.0f} KB, {gz / 1024:.0f} KB gzip)")
+    print(f"  Written: {totals['written']}, removed: {totals['removed']}, unchanged: {totals['unchanged']}")
+    print(f"  Elapsed: {elapsed:.1f}s")
+
+    output = {
+        "snapshot_dir": args.out,
+        "brotli": brotli is not None,
+        "shards": len(shards),
+        "bytes": raw,
+        "gz_bytes": gz,
+        **totals,
+        "elapsed_seconds": round(elapsed, 2),
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for plain SQL dumps (deploy/server/init.sql, pg_dump output).
+Yields table rows from INSERT ... VALUES statements and COPY ... FROM stdin
+blocks without loading the whole file, so it can stand in for the database
+when a dump is all we have.
+"""
+
+import re
+
+from server_utils import parse_copy_line
+
+COPY_HEADER_RE = re.compile(r"COPY\s+([\w.\"]+)\s*(?:\(([^)]*)\))?\s+FROM\s+stdin;", re.I)
+INSERT_HEADER_RE = re.compile(r"INSERT\s+INTO\s+([\w.\"]+)\s*(?:\(([^)]*)\))?\s*VALUES\s*", re.I)
+CREATE_TABLE_RE = re.compile(r"CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)\s*\(", re.I)
+ADD_COLUMN_RE = re.compile(
+    r"ALTER\s+TABLE\s+(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?([\w.\"]+)\s+ADD\s+COLUMN\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w\"]+)",
+    re.I,
+)
+TABLE_CONSTRAINT_WORDS = {"CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK", "FOREIGN", "EXCLUDE", "LIKE"}
+DOLLAR_TAG_RE = re.compile(r"\$[A-Za-z_]*\$")
+
+
+class SqlExpr(str):
+    """Unquoted SQL value kept verbatim (numbers, booleans, now(), ARRAY[...])"""
+
+
+def normalize_table(name):
+    """public."products" -> products"""
+    name = name.replace('"', "")
+    return name.split(".", 1)[1] if name.startswith("public.") else name
+
+
+def _split_columns(text):
+    if not text:
+        return None
+    return [c.strip().strip('"') for c in text.split(",")]
+
+
+def _table_columns(statement):
+    """Column names, in order, from the body of a CREATE TABLE statement"""
+    body = statement[statement.index("(") + 1:]
+    columns = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(body):
+        if ch == "(":
+            depth += 1
+        elif ch == ")" and depth:
+            depth -= 1
+        elif ch in ",)" and depth == 0:
+            words = body[start:i].split()
+            if words and words[0].upper() not in TABLE_CONSTRAINT_WORDS:
+                columns.append(words[0].strip('"'))
+            start = i + 1
+            if ch == ")":
+                break
+    return columns
+
+
+class _Reader:
+    """Character cursor over a line-oriented file"""
+
+    def __init__(self, f):
+        self.f = f
+        self.line = ""
+        self.pos = 0
+
+    def _fill(self):
+        if self.pos >= len(self.line):
+            self.line = self.f.readline()
+            self.pos = 0
+        return bool(self.line)
+
+    def peek(self):
+        return self.line[self.pos] if self._fill() else ""
+
+    def get(self):
+        ch = self.peek()
+        if ch:
+            self.pos += 1
+        return ch
+
+    def rest_of_line(self):
+        self._fill()
+        return self.line[self.pos:]
+
+    def consume(self, count):
+        self.pos += count
+
+    def skip_line(self):
+        self.pos = len(self.line)
+
+    def skip_space(self):
+        while True:
+            ch = self.peek()
+            if not ch:
+                return
+            if ch.isspace():
+                self.pos += 1
+            elif self.line.startswith("--", self.pos):
+                self.skip_line()
+            elif self.line.startswith("/*", self.pos):
+                self.pos += 2
+                while self._fill() and not self.line.startswith("*/", self.pos):
+                    self.pos += 1
+                self.pos += 2
+            else:
+                return
+
+
+def _read_quoted(reader, backslash_escapes=False):
+    """Read a '...' literal (opening quote already consumed)"""
+    out = []
+    while True:
+        ch = reader.get()
+        if not ch:
+            break
+        if backslash_escapes and ch == "\\":
+            out.append(reader.get())
+        elif ch == "'":
+            if reader.peek() == "'":
+                out.append(reader.get())
+            else:
+                break
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _skip_cast(reader):
+    """Skip a ::type suffix, including things like ::character varying or ::numeric(10,2)"""
+    while reader.rest_of_line().startswith("::"):
+        reader.consume(2)
+        depth = 0
+        while True:
+            ch = reader.peek()
+            if not ch:
+                return
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif ch == "," and depth == 0:
+                break
+            elif not (ch.isalnum() or ch in "_[]. \"" or depth):
+                break
+            reader.get()
+
+
+def _read_value(reader):
+    reader.skip_space()
+    head = reader.rest_of_line()[:2]
+    if head[:1] == "'" or (head[:1] in "eE" and head[1:2] == "'"):
+        escapes = head[:1] in "eE"
+        reader.consume(2 if escapes else 1)
+        value = _read_quoted(reader, backslash_escapes=escapes)
+        _skip_cast(reader)
+        return value
+
+    out = []
+    depth = 0
+    while True:
+        ch = reader.peek()
+        if not ch or (depth == 0 and ch in ",)"):
+            break
+        reader.get()
+        if ch == "'":
+            out.append("'" + _read_quoted(reader).replace("'", "''") + "'")
+            continue
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        out.append(ch)
+    text = "".join(out).strip()
+    return None if text.upper() == "NULL" else SqlExpr(text)
+
+
+def _skip_statement(reader, capture=False):
+    """
+    Skip to the end of the current statement, respecting quotes and $$ bodies.
+    With capture=True the statement text is returned.
+    """
+    out = [] if capture else None
+    dollar_tag = None
+    while True:
+        ch = reader.peek()
+        if not ch:
+            break
+        if dollar_tag:
+            if reader.rest_of_line().startswith(dollar_tag):
+                reader.consume(len(dollar_tag))
+                if capture:
+                    out.append(dollar_tag)
+                dollar_tag = None
+            else:
+                reader.get()
+                if capture:
+                    out.append(ch)
+            continue
+        if ch == "$":
+            match = DOLLAR_TAG_RE.match(reader.rest_of_line())
+            if match:
+                dollar_tag = match.group(0)
+                reader.consume(len(dollar_tag))
+                if capture:
+                    out.append(dollar_tag)
+                continue
+        reader.get()
+        if capture:
+            out.append(ch)
+        if ch == "'":
+            quoted = _read_quoted(reader)
+            if capture:
+                out.append(quoted.replace("'", "''") + "'")
+        elif ch == "-" and reader.peek() == "-":
+            if capture:
+                out.append(reader.rest_of_line())
+            reader.skip_line()
+        elif ch == ";":
+            break
+    return "".join(out) if capture else None
+
+
+def _iter_insert_rows(reader):
+    while True:
+        reader.skip_space()
+        if reader.get() != "(":
+            _skip_statement(reader)
+            return
+        values = []
+        while True:
+            values.append(_read_value(reader))
+            reader.skip_space()
+            ch = reader.get()
+            if ch != ",":
+                break
+        yield values
+        reader.skip_space()
+        ch = reader.get()
+        if ch == ",":
+            continue
+        if ch != ";":
+            # e.g. ON CONFLICT DO NOTHING
+            _skip_statement(reader)
+        return
+
+
+def _iter_dump(f, wanted, keep_statements, resolve_columns=False):
+    """
+    With resolve_columns=True, COPY/INSERT statements without a column list
+    (pg_dump --inserts) get the column order of the dump's CREATE TABLE.
+    """
+    reader = _Reader(f)
+    table_columns = {}
+    while True:
+        reader.skip_space()
+        line = reader.rest_of_line()
+        if not line:
+            return
+
+        match = COPY_HEADER_RE.match(line)
+        if match:
+            reader.skip_line()
+            table = normalize_table(match.group(1))
+            columns = _split_columns(match.group(2))
+            if columns is None and resolve_columns:
+                columns = table_columns.get(table)
+            keep = wanted is None or table in wanted
+            for data_line in f:
+                data_line = data_line.rstrip("\r\n")
+                if data_line == "\\.":
+                    break
+                if keep:
+                    yield "copy", table, columns, data_line
+            continue
+
+        match = INSERT_HEADER_RE.match(line)
+        if match:
+            reader.consume(match.end())
+            table = normalize_table(match.group(1))
+            columns = _split_columns(match.group(2))
+            if columns is None and resolve_columns:
+                columns = table_columns.get(table)
+            if wanted is not None and table not in wanted:
+                _skip_statement(reader)
+                continue
+            for values in _iter_insert_rows(reader):
+                yield "values", table, columns, values
+            continue
+
+        create = CREATE_TABLE_RE.match(line) if resolve_columns else None
+        alter = ADD_COLUMN_RE.match(line) if resolve_columns else None
+        text = _skip_statement(reader, capture=keep_statements or create is not None)
+        if create:
+            table_columns[normalize_table(create.group(1))] = _table_columns(text)
+        elif alter:
+            table_columns.setdefault(normalize_table(alter.group(1)), []).append(alter.group(2).strip('"'))
+        if keep_statements and text.strip():
+            yield "sql", None, None, text
+
+
+def iter_dump_rows(f, tables=None):
+    """
+    Yield (table, columns, values) for every row in a SQL dump.
+    Statements without a column list take the order of the table's CREATE
+    TABLE; columns is None only when the dump has no CREATE TABLE for it.
+    values are str, None for NULL, or SqlExpr for unquoted expressions.
+    """
+    wanted = set(tables) if tables else None
+    for kind, table, columns, payload in _iter_dump(f, wanted, keep_statements=False, resolve_columns=True):
+        yield table, columns, parse_copy_line(payload) if kind == "copy" else payload
+
+
+def iter_dump_statements(f):
+    """
+    Yield (kind, table, columns, payload) for a whole dump, in file order:
+    ("sql", None, None, text) for every other statement,
+    ("copy", table, columns, line) for each COPY data line (still COPY-escaped),
+    ("values", table, columns, values) for each INSERT row.
+    """
+    return _iter_dump(f, None, keep_statements=True)
+
+
+def iter_column_values(f, wanted):
+    """
+    Yield (table, column, value) for the {table: [columns]} mapping in wanted.
+    Raises ValueError for rows whose columns cannot be told apart.
+    """
+    for table, columns, values in iter_dump_rows(f, wanted.keys()):
+        if columns is None:
+            raise ValueError(f"{table}: rows without a column list and no CREATE TABLE in the dump")
+        if len(columns) != len(values):
+            raise ValueError(f"{table}: row has {len(values)} values for {len(columns)} columns")
+        for column in wanted[table]:
+            if column in columns:
+                yield table, column, values[columns.index(column)]
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Phase 5 Test Script - SINOTRUK Deploy Performance
+Tests for Docker builds: build context size after .dockerignore and
+dependency-layer caching in deploy/Dockerfile and deploy/server/Dockerfile
+No external dependencies - pure Python code analysis
+"""
+
+import os
+import re
+import sys
+import json
+import shlex
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+class TestReport:
+    def __init__(self, phase_name):
+        self.phase_name = phase_name
+        self.tests = []
+        self.passed = 0
+        self.failed = 0
+        self.issues = []
+
+    def add_result(self, name, passed, details=""):
+        status = "✅ PASS" if passed else "❌ FAIL"
+        self.tests.append({"name": name, "passed": passed, "details": details})
+        if passed:
+            self.passed += 1
+        else:
+            self.failed += 1
+        print(f"  {status}: {name}")
+        if details:
+            print(f"      └─ {details}")
+
+    def add_issue(self, issue):
+        self.issues.append(issue)
+
+    def summary(self):
+        print(f"\n  Summary: {self.passed}/{self.passed + self.failed} tests passed")
+        return self.failed == 0
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (Dockerfile, build context) as docker compose / docker build use them
+DOCKER_BUILDS = [
+    ("deploy/Dockerfile", "deploy"),
+    ("deploy/server/Dockerfile", "deploy/server"),
+]
+CONTEXT_BUDGET_MB = 25
+# Paths that never belong in an image build context
+HEAVY_PATHS = ["node_modules", "uploads", "coverage", "test-results", "playwright-report",
+               "blob-report", "e2e", ".git", ".env"]
+DEPENDENCY_MANIFESTS = {"package.json", "package-lock.json", "package*.json", "npm-shrinkwrap.json",
+                        "yarn.lock", "pnpm-lock.yaml", ".npmrc"}
+INSTALL_RE = re.compile(r"\b(npm\s+(ci|install|i)\b|yarn(\s+install)?\b|pnpm\s+install|pip\s+install)")
+
+def read_file(path):
+    """Read file content safely"""
+    full_path = os.path.join(BASE_PATH, path) if not path.startswith("/") else path
+    try:
+        with open(full_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        return None
+
+def pattern_to_regex(pattern):
+    """Translate a .dockerignore pattern (Go filepath.Match plus **) into a regex"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith("**", i):
+            i += 2
+            if pattern.startswith("/", i):
+                out.append("(?:.*/)?")
+                i += 1
+            else:
+                out.append(".*")
+            continue
+        if ch == "*":
+            out.append("[^/]*")
+        elif ch == "?":
+            out.append("[^/]")
+        elif ch == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(ch))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("^"):
+                    body = "!" + body[1:]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body + "]")
+                i = end
+        elif ch == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return re.compile("".join(out) + "$")
+
+def load_dockerignore(context):
+    """[(regex, negated)] in file order; None when the context has no .dockerignore"""
+    content = read_file(os.path.join(context, ".dockerignore"))
+    if content is None:
+        return None
+    rules = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:].strip()
+        line = os.path.normpath(line.lstrip("/")).replace(os.sep, "/")
+        if line == ".":
+            continue
+        rules.append((pattern_to_regex(line), negated))
+    return rules
+
+def is_excluded(rel_path, rules):
+    """Docker semantics: the last matching rule wins; a rule also matches everything below a matched directory"""
+    parents = []
+    parts = rel_path.split("/")
+    for depth in range(1, len(parts) + 1):
+        parents.append("/".join(parts[:depth]))
+    excluded = False
+    for regex, negated in rules:
+        if any(regex.match(p) for p in parents):
+            excluded = not negated
+    return excluded
+
+def walk_entry(context_path, top, rules):
+    """Included (rel_path, size) under one top-level entry of the context"""
+    can_prune = not any(negated for _, negated in rules)
+    included = []
+    stack = [top]
+    while stack:
+        rel = stack.pop()
+        full = os.path.join(context_path, rel)
+        if rules and is_excluded(rel, rules):
+            if can_prune or not os.path.isdir(full):
+                continue
+        try:
+            if os.path.isdir(full) and not os.path.islink(full):
+                with os.scandir(full) as it:
+                    for entry in it:
+                        stack.append(f"{rel}/{entry.name}")
+                continue
+            if rules and is_excluded(rel, rules):
+                continue
+            included.append((rel, os.lstat(full).st_size))
+        except OSError:
+            continue
+    return included
+
+def build_context(context, rules):
+    """Walk the context in parallel, one task per top-level entry"""
+    context_path = os.path.join(BASE_PATH, context)
+    try:
+        tops = sorted(os.listdir(context_path))
+    except OSError:
+        return None
+    files = []
+    with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 4) * 2)) as pool:
+        for included in pool.map(lambda top: walk_entry(context_path, top, rules or []), tops):
+            files.extend(included)
+    return files
+
+def rank_paths(files, depth=2, limit=10):
+    """Largest included paths, aggregated to `depth` path components"""
+    totals = {}
+    for rel, size in files:
+        parts = rel.split("/")
+        for d in range(1, min(depth, len(parts)) + 1):
+            key = "/".join(parts[:d]) + ("/" if d < len(parts) else "")
+            totals[key] = totals.get(key, 0) + size
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+
+def parse_dockerfile(content):
+    """[(instruction, arguments)] with line continuations joined"""
+    instructions = []
+    current = ""
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not current and (not stripped or stripped.startswith("#")):
+            continue
+        if stripped.endswith("\\"):
+            current += stripped[:-1] + " "
+            continue
+        current += stripped
+        keyword, _, args = current.partition(" ")
+        instructions.append((keyword.upper(), args.strip()))
+        current = ""
+    return instructions
+
+def copy_sources(args):
+    """Source paths of a COPY/ADD instruction (flags and destination dropped)"""
+    if args.startswith("["):
+        try:
+            parts = json.loads(args)
+        except ValueError:
+            return []
+    else:
+        parts = shlex.split(args)
+    parts = [p for p in parts if not p.startswith("--")]
+    return parts[:-1]
+
+def cache_busters(instructions):
+    """Instructions before the first dependency install that change whenever source code changes"""
+    busters = []
+    for keyword, args in instructions:
+        if keyword == "RUN" and INSTALL_RE.search(args):
+            return busters, args
+        if keyword in ("COPY", "ADD") and "--from=" not in args:
+            sources = copy_sources(args)
+            if any(os.path.basename(s.rstrip("/")) not in DEPENDENCY_MANIFESTS for s in sources):
+                busters.append(f"{keyword} {args}")
+        elif keyword == "ARG" and re.search(r"(DATE|TIME|COMMIT|SHA|VERSION)", args, re.I):
+            busters.append(f"ARG {args}")
+    return busters, None
+
+def format_mb(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+def check_build_context(dockerfile, context):
+    report = TestReport(f"Build Context {context}")
+
+    if read_file(dockerfile) is None:
+        report.add_result(f"Read {dockerfile}", False, "File not found")
+        return report
+
+    rules = load_dockerignore(context)
+    report.add_result(
+        f"{context}/.dockerignore exists",
+        rules is not None,
+        f"{len(rules)} rules" if rules is not None else "Everything in the context is sent to the daemon"
+    )
+    if rules is None:
+        report.add_issue(f"Add {context}/.dockerignore (node_modules, uploads, test artifacts, .env)")
+
+    files = build_context(context, rules)
+    if files is None:
+        report.add_result(f"Read context {context}", False, "Directory not found")
+        return report
+
+    total = sum(size for _, size in files)
+    print(f"  📄 Context: {len(files)} files, {format_mb(total)}")
+    for path, size in rank_paths(files):
+        print(f"      {format_mb(size):>10}  {path}")
+
+    within_budget = total <= CONTEXT_BUDGET_MB * 1024 * 1024
+    report.add_result(
+        f"Build context under {CONTEXT_BUDGET_MB} MB",
+        within_budget,
+        format_mb(total)
+    )
+    if not within_budget:
+        report.add_issue(f"{context}: build context is {format_mb(total)} (budget {CONTEXT_BUDGET_MB} MB)")
+
+    included_heavy = {}
+    for rel, size in files:
+        for part in rel.split("/"):
+            if part in HEAVY_PATHS or (part.startswith(".env") and part != ".env.example"):
+                included_heavy[part] = included_heavy.get(part, 0) + size
+                break
+    report.add_result(
+        "No dependencies, uploads, secrets or test artifacts in context",
+        not included_heavy,
+        ", ".join(f"{name} ({format_mb(size)})" for name, size in sorted(included_heavy.items())) or "Clean"
+    )
+    for name, size in sorted(included_heavy.items()):
+        report.add_issue(f"{context}: '{name}' is sent with every build ({format_mb(size)}) - add it to .dockerignore")
+
+    return report
+
+def check_layer_cache(dockerfile):
+    report = TestReport(f"Layer Cache {dockerfile}")
+
+    content = read_file(dockerfile)
+    if not content:
+        report.add_result(f"Read {dockerfile}", False, "File not found")
+        return report
+
+    busters, install = cache_busters(parse_dockerfile(content))
+    report.add_result(
+        "Dependency install step found",
+        install is not None,
+        install or "No npm/yarn/pnpm/pip install instruction"
+    )
+    report.add_result(
+        "Only dependency manifests copied before install",
+        not busters,
+        "; ".join(busters) if busters else "Install layer is reused until package*.json changes"
+    )
+    for buster in busters:
+        report.add_issue(f"{dockerfile}: '{buster}' before the install step re-runs it on every source change")
+
+    return report
+
+def test_deploy_context():
+    """Test 5.1: Build context of deploy/Dockerfile"""
+    return check_build_context(*DOCKER_BUILDS[0])
+
+def test_server_context():
+    """Test 5.2: Build context of deploy/server/Dockerfile"""
+    return check_build_context(*DOCKER_BUILDS[1])
+
+def test_deploy_layer_cache():
+    """Test 5.3: deploy/Dockerfile keeps the install layer cacheable"""
+    return check_layer_cache(DOCKER_BUILDS[0][0])
+
+def test_server_layer_cache():
+    """Test 5.4: deploy/server/Dockerfile keeps the install layer cacheable"""
+    return check_layer_cache(DOCKER_BUILDS[1][0])
+
+def test_deploy_script_cache():
+    """Test 5.5: deploy.sh does not throw the layer cache away"""
+    report = TestReport("Deploy Script Cache")
+
+    content = read_file("deploy/deploy.sh")
+    if not content:
+        report.add_result("Read deploy.sh", False, "File not found")
+        return report
+
+    builds = [line.strip() for line in content.splitlines()
+              if re.search(r"docker[ -]compose\s+build|docker\s+build", line) and not line.strip().startswith("#")]
+    no_cache = [line for line in builds if "--no-cache" in line]
+
+    report.add_result(
+        "Image builds reuse the layer cache",
+        not no_cache,
+        "; ".join(no_cache) if no_cache else "Checking for --no-cache"
+    )
+
+    if no_cache:
+        report.add_issue("deploy.sh builds with --no-cache, so every deploy reinstalls all dependencies")
+
+    return report
+
+def main():
+    print("=" * 70)
+    print("  PHASE 5 TEST SCRIPT - SINOTRUK Docker Build Efficiency")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    all_issues = []
+    all_passed = True
+
+    # Run tests
+    tests = [
+        ("1. deploy/ Build Context", test_deploy_context),
+        ("2. deploy/server/ Build Context", test_server_context),
+        ("3. deploy/Dockerfile Layer Cache", test_deploy_layer_cache),
+        ("4. deploy/server/Dockerfile Layer Cache", test_server_layer_cache),
+        ("5. deploy.sh Build Cache", test_deploy_script_cache),
+    ]
+
+    for test_name, test_func in tests:
+        print(f"\n{'─' * 70}")
+        print(f"  {test_name}")
+        print(f"{'─' * 70}")
+        report = test_func()
+        passed = report.summary()
+        all_passed = all_passed and passed
+        all_issues.extend(report.issues)
+
+    # Summary
+    print("\n" + "=" * 70)
+    if all_issues:
+        print("  ❌ ISSUES DETECTED - NEED TO FIX:")
+        print("=" * 70)
+        for i, issue in enumerate(all_issues, 1):
+            print(f"  {i}. {issue}")
+        print("\n" + "=" * 70)
+
+    if all_passed and not all_issues:
+        print("  ✅ ALL TESTS PASSED - Phase 5 is complete!")
+    else:
+        print("  ❌ TESTS FAILED - Fix the issues above")
+    print("=" * 70)
+
+    # Output issues to JSON for parsing
+    output = {
+        "phase": 5,
+        "all_passed": all_passed and not all_issues,
+        "issues": all_issues,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    with open(os.path.join(BASE_PATH, "scripts/phase5_results.json"), "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: scripts/phase5_results.json")
+
+    return 0 if (all_passed and not all_issues) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
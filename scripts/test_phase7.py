@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Phase 7 Test Script - SINOTRUK Unused CSS
+Tests for CSS shipped to both apps that no class token references: the
+content globs of admin_ui/tailwind.config.js are tokenized once and compared
+with the selectors of the built (admin_ui/dist) or source stylesheets
+No external dependencies - pure Python code analysis
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+from datetime import datetime
+
+class TestReport:
+    def __init__(self, phase_name):
+        self.phase_name = phase_name
+        self.tests = []
+        self.passed = 0
+        self.failed = 0
+        self.issues = []
+
+    def add_result(self, name, passed, details=""):
+        status = "✅ PASS" if passed else "❌ FAIL"
+        self.tests.append({"name": name, "passed": passed, "details": details})
+        if passed:
+            self.passed += 1
+        else:
+            self.failed += 1
+        print(f"  {status}: {name}")
+        if details:
+            print(f"      └─ {details}")
+
+    def add_issue(self, issue):
+        self.issues.append(issue)
+
+    def summary(self):
+        print(f"\n  Summary: {self.passed}/{self.passed + self.failed} tests passed")
+        return self.failed == 0
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TAILWIND_CONFIG = "admin_ui/tailwind.config.js"
+# The storefront uses the Tailwind Play CDN, so it has no config; scan it like the admin does
+STOREFRONT_CONTENT = ["./index.html", "./src/**/*.{js,ts,jsx,tsx}"]
+ADMIN_STYLESHEETS = ["admin_ui/src/index.css", "admin_ui/styles/global.css"]
+ADMIN_BUILT_CSS = "admin_ui/dist/assets/*.css"
+STOREFRONT_STYLESHEETS = ["src/**/*.css"]
+
+# Classes that libraries add to the DOM at runtime (Editor.js in the admin article editor)
+RUNTIME_CLASS_PREFIXES = ("ce-", "cdx-", "codex-editor", "image-tool")
+
+UNUSED_BUDGET_RATIO = 0.25
+TOP_BLOCKS = 8
+
+# Candidate class tokens, the way Tailwind's default extractor sees them
+TOKEN_RE = re.compile(r"[^<>\"'`\s{}()=;,]*[^<>\"'`\s{}()=;,:.]")
+STYLE_TAG_RE = re.compile(r"<style\b[^>]*>(.*?)</style>", re.S | re.I)
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+CLASS_RE = re.compile(r"\.((?:\\.|[\w-])+)")
+ID_RE = re.compile(r"#((?:\\.|[\w-])+)")
+NEGATION_RE = re.compile(r":not\([^)]*\)")
+ANIMATION_RE = re.compile(r"animation(?:-name)?\s*:\s*([^;}]+)")
+GROUPING_AT_RULES = ("@media", "@supports", "@layer", "@container", "@document")
+
+# path -> ((size, mtime_ns), tokens); every file is tokenized once per run and again only when it changes
+_TOKEN_CACHE = {}
+
+def read_file(path):
+    """Read file content safely"""
+    full_path = os.path.join(BASE_PATH, path) if not path.startswith("/") else path
+    try:
+        with open(full_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        return None
+
+def file_tokens(path):
+    """Class token candidates of one source file (cached by size and mtime)"""
+    try:
+        st = os.stat(os.path.join(BASE_PATH, path))
+    except OSError:
+        return set()
+    key = (st.st_size, st.st_mtime_ns)
+    cached = _TOKEN_CACHE.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    content = read_file(path) or ""
+    if path.endswith(".html"):
+        # Inline stylesheets are what is being measured, not a reference to it
+        content = STYLE_TAG_RE.sub(" ", content)
+    tokens = set(TOKEN_RE.findall(content))
+    # Variants (hover:, md:) and opacity modifiers also match their base class
+    for token in list(tokens):
+        if ":" in token:
+            tokens.add(token.rsplit(":", 1)[1])
+        if "/" in token:
+            tokens.add(token.split("/", 1)[0])
+    _TOKEN_CACHE[path] = (key, tokens)
+    return tokens
+
+def expand_braces(pattern):
+    match = re.search(r"{([^{}]*)}", pattern)
+    if not match:
+        return [pattern]
+    expanded = []
+    for option in match.group(1).split(","):
+        expanded.extend(expand_braces(pattern[:match.start()] + option + pattern[match.end():]))
+    return expanded
+
+def config_strings(config_path, key):
+    """String entries of an array option (content, safelist) in a tailwind.config.js"""
+    content = read_file(config_path) or ""
+    match = re.search(key + r"\s*:\s*\[(.*?)\]", content, re.S)
+    if not match:
+        return []
+    return re.findall(r"""['"`]([^'"`]+)['"`]""", match.group(1))
+
+def content_files(root, patterns):
+    """Files matched by content globs, relative to BASE_PATH"""
+    files = set()
+    for pattern in patterns:
+        negated = pattern.startswith("!")
+        for expanded in expand_braces(pattern.lstrip("!")):
+            full = os.path.normpath(os.path.join(BASE_PATH, root, expanded))
+            for match in glob.glob(full, recursive=True):
+                rel = os.path.relpath(match, BASE_PATH)
+                if "node_modules" in rel.split(os.sep) or not os.path.isfile(match):
+                    continue
+                if negated:
+                    files.discard(rel)
+                else:
+                    files.add(rel)
+    return sorted(files)
+
+def collect_tokens(files):
+    tokens = set()
+    for path in files:
+        tokens |= file_tokens(path)
+    return tokens
+
+def blank_comments(text):
+    """Replace comments with spaces so offsets (and line numbers) stay put"""
+    return COMMENT_RE.sub(lambda m: " " * len(m.group(0)), text)
+
+def parse_rules(text, start=0, end=None):
+    """[(prelude, rule_start, rule_end, body_start, body_end)] of the blocks in text[start:end]"""
+    end = len(text) if end is None else end
+    rules = []
+    pos = start
+    prelude_start = start
+    while pos < end:
+        ch = text[pos]
+        if ch == ";":
+            prelude_start = pos + 1
+        elif ch == "{":
+            depth = 1
+            body_start = pos + 1
+            pos += 1
+            while pos < end and depth:
+                if text[pos] == "{":
+                    depth += 1
+                elif text[pos] == "}":
+                    depth -= 1
+                pos += 1
+            prelude = text[prelude_start:body_start - 1].strip()
+            rule_start = prelude_start + (len(text[prelude_start:body_start]) - len(text[prelude_start:body_start].lstrip()))
+            rules.append((prelude, rule_start, pos, body_start, pos - 1))
+            prelude_start = pos
+            continue
+        elif ch == "}":
+            prelude_start = pos + 1
+        pos += 1
+    return rules
+
+def split_selectors(prelude):
+    selectors = []
+    depth = 0
+    current = ""
+    for ch in prelude:
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        if ch == "," and depth == 0:
+            selectors.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        selectors.append(current.strip())
+    return selectors
+
+def unescape(name):
+    return re.sub(r"\\(.)", r"\1", name)
+
+def selector_used(selector, tokens):
+    """A selector can match when every class and id it requires appears as a token"""
+    required = NEGATION_RE.sub("", selector)
+    names = [unescape(n) for n in CLASS_RE.findall(required) + ID_RE.findall(required)]
+    return all(name in tokens or name.startswith(RUNTIME_CLASS_PREFIXES) for name in names)
+
+def analyze_stylesheet(path, tokens):
+    """Used/unused bytes of one stylesheet and its unused blocks"""
+    text = read_file(path)
+    if text is None:
+        return None
+    return analyze_css(path, text, tokens)
+
+def analyze_css(label, text, tokens, line_offset=0):
+    clean = blank_comments(text)
+    unused_blocks = []
+    keyframes = []
+    animations = set()
+    directives = re.findall(r"@tailwind\s+(\w+)", clean)
+
+    def visit(start, end):
+        for prelude, rule_start, rule_end, body_start, body_end in parse_rules(clean, start, end):
+            size = len(text[rule_start:rule_end].encode("utf-8"))
+            if prelude.startswith(GROUPING_AT_RULES):
+                visit(body_start, body_end)
+            elif prelude.startswith(("@keyframes", "@-webkit-keyframes")):
+                keyframes.append((prelude.split()[-1], rule_start, size))
+            elif prelude.startswith("@"):
+                continue
+            elif any(selector_used(s, tokens) for s in split_selectors(prelude)):
+                for value in ANIMATION_RE.findall(clean[body_start:body_end]):
+                    animations.update(value.replace(",", " ").split())
+            else:
+                unused_blocks.append((prelude, rule_start, size))
+
+    visit(0, len(clean))
+    for name, rule_start, size in keyframes:
+        if name not in animations and name not in tokens:
+            unused_blocks.append((f"@keyframes {name}", rule_start, size))
+
+    blocks = [
+        {"file": label, "line": clean.count("\n", 0, start) + 1 + line_offset, "selector": " ".join(prelude.split()), "bytes": size}
+        for prelude, start, size in unused_blocks
+    ]
+    return {
+        "file": label,
+        "bytes": len(text.encode("utf-8")),
+        "unused_bytes": sum(b["bytes"] for b in blocks),
+        "unused_blocks": blocks,
+        "tailwind_directives": directives,
+    }
+
+def inline_styles(html_path, tokens):
+    """Analyses of the <style> blocks of an HTML entry point"""
+    content = read_file(html_path)
+    if content is None:
+        return []
+    results = []
+    for match in STYLE_TAG_RE.finditer(content):
+        line = content.count("\n", 0, match.start(1))
+        results.append(analyze_css(f"{html_path} <style>", match.group(1), tokens, line))
+    return results
+
+def check_app(name, root, patterns, stylesheets, html_path=None, safelist=()):
+    report = TestReport(f"{name} Unused CSS")
+
+    files = content_files(root, patterns)
+    tokens = collect_tokens(files) | set(safelist)
+    print(f"  📄 Content: {', '.join(patterns)} -> {len(files)} files, {len(tokens)} class token candidates")
+
+    results = []
+    for pattern in stylesheets:
+        for path in sorted(glob.glob(os.path.join(BASE_PATH, pattern), recursive=True)):
+            result = analyze_stylesheet(os.path.relpath(path, BASE_PATH), tokens)
+            if result:
+                results.append(result)
+    if html_path:
+        results.extend(inline_styles(html_path, tokens))
+
+    if not results:
+        report.add_result("Stylesheets found", False, ", ".join(stylesheets))
+        return report
+
+    total = sum(r["bytes"] for r in results)
+    unused = sum(r["unused_bytes"] for r in results)
+    for r in sorted(results, key=lambda r: r["unused_bytes"], reverse=True):
+        note = f" (+ @tailwind {', '.join(r['tailwind_directives'])}, purged by the same globs)" if r["tailwind_directives"] else ""
+        print(f"  📄 {r['file']}: {r['unused_bytes']} / {r['bytes']} B unused{note}")
+
+    blocks = sorted((b for r in results for b in r["unused_blocks"]), key=lambda b: b["bytes"], reverse=True)
+    if blocks:
+        print("  🔎 Largest unused blocks:")
+        for block in blocks[:TOP_BLOCKS]:
+            print(f"      {block['bytes']:>6} B  {block['file']}:{block['line']}  {block['selector']}")
+
+    ratio = unused / total if total else 0
+    report.add_result(
+        f"Unused CSS under {UNUSED_BUDGET_RATIO:.0%} of shipped bytes",
+        ratio <= UNUSED_BUDGET_RATIO,
+        f"{unused / 1024:.1f} KB of {total / 1024:.1f} KB unused ({ratio:.0%}) in {len(blocks)} blocks"
+    )
+    if ratio > UNUSED_BUDGET_RATIO:
+        worst = max(results, key=lambda r: r["unused_bytes"])
+        report.add_issue(f"{name}: {ratio:.0%} of CSS is not referenced by any class token "
+                         f"(largest: {worst['file']}, {worst['unused_bytes']} B)")
+
+    return report
+
+def test_admin_unused_css():
+    """Test 7.1: Admin CSS referenced by the Tailwind content globs"""
+    patterns = config_strings(TAILWIND_CONFIG, "content")
+    if not patterns:
+        report = TestReport("Admin Unused CSS")
+        report.add_result(f"Read content globs from {TAILWIND_CONFIG}", False, "No content array found")
+        return report
+    built = glob.glob(os.path.join(BASE_PATH, ADMIN_BUILT_CSS))
+    stylesheets = [ADMIN_BUILT_CSS] if built else ADMIN_STYLESHEETS
+    return check_app("Admin", "admin_ui", patterns, stylesheets, safelist=config_strings(TAILWIND_CONFIG, "safelist"))
+
+def test_storefront_unused_css():
+    """Test 7.2: Storefront CSS referenced by its components"""
+    return check_app("Storefront", "", STOREFRONT_CONTENT, STOREFRONT_STYLESHEETS, html_path="index.html")
+
+def main():
+    print("=" * 70)
+    print("  PHASE 7 TEST SCRIPT - SINOTRUK Unused CSS")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    all_issues = []
+    all_passed = True
+
+    # Run tests
+    tests = [
+        ("1. Admin Unused CSS", test_admin_unused_css),
+        ("2. Storefront Unused CSS", test_storefront_unused_css),
+    ]
+
+    for test_name, test_func in tests:
+        print(f"\n{'─' * 70}")
+        print(f"  {test_name}")
+        print(f"{'─' * 70}")
+        report = test_func()
+        passed = report.summary()
+        all_passed = all_passed and passed
+        all_issues.extend(report.issues)
+
+    # Summary
+    print("\n" + "=" * 70)
+    if all_issues:
+        print("  ❌ ISSUES DETECTED - NEED TO FIX:")
+        print("=" * 70)
+        for i, issue in enumerate(all_issues, 1):
+            print(f"  {i}. {issue}")
+        print("\n" + "=" * 70)
+
+    if all_passed and not all_issues:
+        print("  ✅ ALL TESTS PASSED - Phase 7 is complete!")
+    else:
+        print("  ❌ TESTS FAILED - Fix the issues above")
+    print("=" * 70)
+
+    # Output issues to JSON for parsing
+    output = {
+        "phase": 7,
+        "all_passed": all_passed and not all_issues,
+        "issues": all_issues,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    with open(os.path.join(BASE_PATH, "scripts/phase7_results.json"), "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: scripts/phase7_results.json")
+
+    return 0 if (all_passed and not all_issues) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Watermark Cache Manager - SINOTRUK
+Keeps uploads/watermarked (wm_<basename> files written by GET /api/image)
+inside a disk budget and drops entries rendered with an old logo/opacity.
+
+- Index: uploads/watermarked/.wm_index.json (size, mtime, last access, fingerprint)
+- Eviction: least recently accessed first until the directory fits --max-bytes
+- Invalidation: fingerprint of watermark_enabled / site_logo / watermark_opacity
+- Report: bytes reclaimed, files rendered / read again since the last run,
+  and the hit ratio of GET /api/image?watermark=true counted from the
+  X-Cache header in the access_log_analyzer.py results (the access-time
+  count is only a coarse activity signal: at most one per file per run,
+  and relatime/noatime mounts hide most reads)
+
+Usage:
+    python scripts/watermark_cache.py --max-bytes 2G
+    python scripts/watermark_cache.py --logo /uploads/original/logo.png --opacity 40 --dry-run
+    python scripts/watermark_cache.py --access-log-results scripts/access_log_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+
+import server_utils
+
+INDEX_NAME = ".wm_index.json"
+INDEX_VERSION = 1
+CACHE_PREFIX = "wm_"
+WATERMARK_KEYS = ("watermark_enabled", "site_logo", "company_logo", "watermark_opacity")
+# Route key used by access_log_analyzer.py for requests that go through this cache
+WATERMARK_ROUTE = "GET /api/image?watermark"
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text):
+    """Parse sizes like 500M, 2G or a plain byte count"""
+    text = str(text).strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    number = text[:-1] if unit else text
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def format_size(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{num_bytes} B"
+        num_bytes /= 1024.0
+
+
+def resolve_logo_file(logo_url, uploads):
+    """Mirror the local lookup order used by the watermark route in index.js"""
+    if not logo_url or logo_url.startswith("http"):
+        return None
+    candidates = [
+        os.path.join(server_utils.SERVER_DIR, logo_url.lstrip("/")),
+        os.path.join(uploads, "original", os.path.basename(logo_url)),
+        os.path.join(server_utils.BASE_PATH, "deploy", logo_url.lstrip("/")),
+        logo_url,
+    ]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def watermark_fingerprint(settings, uploads):
+    """Hash everything that changes the rendered watermark, including the logo file itself"""
+    enabled = settings.get("watermark_enabled") != "false"
+    logo_url = settings.get("site_logo") or settings.get("company_logo") or ""
+    opacity = settings.get("watermark_opacity") or "40"
+
+    logo_stamp = None
+    logo_file = resolve_logo_file(logo_url, uploads)
+    if logo_file:
+        st = os.stat(logo_file)
+        logo_stamp = [st.st_size, int(st.st_mtime)]
+
+    payload = json.dumps([enabled, logo_url, opacity, logo_stamp], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_settings(args):
+    """Current watermark settings plus the time they last changed (None when given on the CLI)"""
+    if args.logo is not None or args.opacity is not None:
+        return {
+            "watermark_enabled": "false" if args.disabled else "true",
+            "site_logo": args.logo or "",
+            "watermark_opacity": str(args.opacity if args.opacity is not None else 40),
+        }, None
+
+    rows = server_utils.fetch_site_settings(WATERMARK_KEYS, args.database_url)
+    settings = {key: value for key, (value, _) in rows.items()}
+    changed = [updated for _, updated in rows.values() if updated]
+    return settings, max(changed) if changed else None
+
+
+def load_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "last_scan": None, "entries": {}, "totals": {}}
+
+
+def save_index(path, index):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+
+
+def scan_cache(cache_dir):
+    """Yield (name, size, mtime, atime) for every cached watermark file"""
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if not entry.name.startswith(CACHE_PREFIX) or not entry.is_file(follow_symlinks=False):
+                continue
+            st = entry.stat(follow_symlinks=False)
+            yield entry.name, st.st_size, st.st_mtime, st.st_atime
+
+
+class CacheManager:
+    def __init__(self, cache_dir, fingerprint, settings_changed_at=None, dry_run=False):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, INDEX_NAME)
+        self.fingerprint = fingerprint
+        self.settings_changed_at = settings_changed_at
+        self.dry_run = dry_run
+        self.index = load_index(self.index_path)
+        self.stats = {
+            "entries": 0,
+            "bytes": 0,
+            "rendered": 0,
+            "reused": 0,
+            "stale_removed": 0,
+            "evicted": 0,
+            "bytes_reclaimed": 0,
+        }
+
+    def refresh(self):
+        """Rebuild the index from disk, counting new renders and files whose access time moved"""
+        old_entries = self.index.get("entries", {})
+        first_run = self.index.get("last_scan") is None
+        entries = {}
+        for name, size, mtime, atime in scan_cache(self.cache_dir):
+            previous = old_entries.get(name)
+            last_access = max(atime, mtime)
+            if previous is None or previous["mtime"] != mtime:
+                # Rendered since the last run: a cold render
+                if not first_run:
+                    self.stats["rendered"] += 1
+                fingerprint = self.fingerprint
+                if self.settings_changed_at and mtime < self.settings_changed_at:
+                    # Written before the logo/opacity was last changed
+                    fingerprint = None
+            else:
+                fingerprint = previous.get("fingerprint")
+                if last_access > previous["last_access"]:
+                    self.stats["reused"] += 1
+            entries[name] = {
+                "size": size,
+                "mtime": mtime,
+                "last_access": last_access,
+                "fingerprint": fingerprint,
+            }
+        self.index["entries"] = entries
+
+    def _remove(self, name, reason):
+        entry = self.index["entries"].pop(name)
+        if not self.dry_run:
+            try:
+                os.unlink(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+        self.stats[reason] += 1
+        self.stats["bytes_reclaimed"] += entry["size"]
+
+    def invalidate(self):
+        """Drop entries rendered with a different watermark fingerprint"""
+        stale = [name for name, e in self.index["entries"].items() if e["fingerprint"] != self.fingerprint]
+        for name in stale:
+            self._remove(name, "stale_removed")
+
+    def evict(self, max_bytes):
+        """LRU eviction down to the disk budget"""
+        entries = self.index["entries"]
+        total = sum(e["size"] for e in entries.values())
+        if total <= max_bytes:
+            return
+        for name in sorted(entries, key=lambda n: (entries[n]["last_access"], n)):
+            if total <= max_bytes:
+                break
+            total -= entries[name]["size"]
+            self._remove(name, "evicted")
+
+    def finish(self):
+        entries = self.index["entries"]
+        self.stats["entries"] = len(entries)
+        self.stats["bytes"] = sum(e["size"] for e in entries.values())
+
+        totals = self.index.setdefault("totals", {})
+        for key in ("rendered", "bytes_reclaimed"):
+            totals[key] = totals.get(key, 0) + self.stats[key]
+        self.stats["lifetime_rendered"] = totals["rendered"]
+        self.stats["lifetime_bytes_reclaimed"] = totals["bytes_reclaimed"]
+
+        self.index["fingerprint"] = self.fingerprint
+        self.index["last_scan"] = time.time()
+        if not self.dry_run:
+            save_index(self.index_path, self.index)
+        return self.stats
+
+
+def logged_hit_ratio(path):
+    """
+    Hits/misses of the watermark route from access_log_analyzer.py output
+    (X-Cache header of each response), or None when there is no such file
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f)
+    except FileNotFoundError:
+        return None
+    route = results.get("routes", {}).get(WATERMARK_ROUTE, {})
+    hits, misses = route.get("cache_hits", 0), route.get("cache_misses", 0)
+    return {
+        "source": path,
+        "analyzed_at": results.get("timestamp"),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evict and invalidate cached watermarked images")
+    parser.add_argument("--uploads-dir", help="uploads directory (default: UPLOAD_DIR or deploy/server/uploads)")
+    parser.add_argument("--max-bytes", default="2G", help="disk budget for uploads/watermarked (default: 2G)")
+    parser.add_argument("--database-url", help="PostgreSQL URL (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--logo", help="use this site_logo instead of reading site_settings")
+    parser.add_argument("--opacity", type=float, help="use this watermark_opacity instead of reading site_settings")
+    parser.add_argument("--disabled", action="store_true", help="treat the watermark as disabled (with --logo/--opacity)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed without deleting")
+    parser.add_argument("--access-log-results", default=os.path.join(server_utils.BASE_PATH, "scripts/access_log_results.json"),
+                        help="access_log_analyzer.py output to take the hit ratio from")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/watermark_cache_results.json"))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  WATERMARK CACHE MANAGER - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    uploads = server_utils.upload_dir(args.uploads_dir)
+    cache_dir = os.path.join(uploads, "watermarked")
+    if not os.path.isdir(cache_dir):
+        print(f"  ❌ Cache directory not found: {cache_dir}")
+        return 1
+
+    try:
+        settings, changed_at = load_settings(args)
+    except (server_utils.PsqlError, OSError) as e:
+        print(f"  ❌ Could not read site_settings: {e}")
+        print("      └─ Pass --logo/--opacity to run without a database")
+        return 1
+
+    try:
+        logged = logged_hit_ratio(args.access_log_results)
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read {args.access_log_results}: {e}")
+        logged = None
+
+    max_bytes = parse_size(args.max_bytes)
+    fingerprint = watermark_fingerprint(settings, uploads)
+
+    manager = CacheManager(cache_dir, fingerprint, changed_at, dry_run=args.dry_run)
+    manager.refresh()
+    manager.invalidate()
+    manager.evict(max_bytes)
+    stats = manager.finish()
+
+    mode = " (dry run)" if args.dry_run else ""
+    print(f"\n  Fingerprint: {fingerprint}")
+    print(f"  Entries: {stats['entries']} ({format_size(stats['bytes'])} / budget {format_size(max_bytes)})")
+    print(f"  Since last run: {stats['rendered']} rendered, {stats['reused']} read again (by access time)")
+    if logged and logged["hit_ratio"] is not None:
+        print(f"  Hit ratio (X-Cache): {logged['hit_ratio']:.1%} of {logged['hits'] + logged['misses']} requests")
+        print(f"      └─ {os.path.relpath(logged['source'], server_utils.BASE_PATH)}, analyzed {logged['analyzed_at']}")
+    else:
+        print("  Hit ratio (X-Cache): n/a - run scripts/access_log_analyzer.py on the timing log first")
+    print(f"  Stale removed{mode}: {stats['stale_removed']}")
+    print(f"  Evicted (LRU){mode}: {stats['evicted']}")
+    print(f"  Bytes reclaimed{mode}: {format_size(stats['bytes_reclaimed'])}")
+
+    output = {
+        "uploads_dir": uploads,
+        "max_bytes": max_bytes,
+        "fingerprint": fingerprint,
+        "dry_run": args.dry_run,
+        "stats": stats,
+        "logged_cache": logged,
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
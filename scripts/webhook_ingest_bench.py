@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Webhook Ingestion Benchmark - SINOTRUK
+Measures what POST /api/webhooks/products costs when a supplier pushes
+products with many images. The webhook downloads every image one after
+another (downloadAndSaveImage) before it writes to the database and
+responds, so the image host's latency adds up per image.
+
+The harness starts a local stub image origin with configurable latency,
+size and failure rate, posts products carrying a random number of images
+(default 1-50) at the chosen concurrency and splits each request's
+end-to-end latency using the stub's own request log:
+
+- before downloads: body parsing, duplicate-code and category lookups
+- downloads: first image request until the last image was served
+- after downloads: slug lookup and the product / images / product_images
+  inserts (database time)
+
+It reports products per minute and the breakdown by image count.
+Products are created with codes BENCH-WH-<run>-<n>; --cleanup removes them
+from the database afterwards (their files are left to scripts/orphan_gc.py).
+
+Usage:
+    python scripts/webhook_ingest_bench.py --products 200 --concurrency 8 --latency 80
+    python scripts/webhook_ingest_bench.py --images 10 --failure-rate 0.05 --stub-url http://host.docker.internal:8099
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+import server_utils
+
+# Image-count buckets for the breakdown
+BUCKETS = [(1, 1), (2, 5), (6, 10), (11, 25), (26, 50), (51, 10 ** 6)]
+
+
+class StubOrigin:
+    """Image origin with injected latency and failures; records when each product's images were fetched"""
+
+    def __init__(self, host, port, latency_ms, jitter_ms, size_bytes, failure_rate, seed):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.fetches = {}
+        self.failures = 0
+        # Minimal JPEG framing (SOI ... EOI) around filler bytes
+        self.body = b"\xff\xd8\xff\xe0" + b"\0" * max(size_bytes - 6, 0) + b"\xff\xd9"
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                origin.serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve(self, handler):
+        started = time.time()
+        parts = handler.path.strip("/").split("/")
+        tag = parts[1] if len(parts) >= 3 and parts[0] == "img" else None
+        with self.lock:
+            delay = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000 if self.jitter_ms else self.latency_ms / 1000
+            fail = self.rng.random() < self.failure_rate
+        time.sleep(delay)
+        if tag is None:
+            handler.send_error(404)
+            return
+        if fail:
+            handler.send_response(503)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+        else:
+            handler.send_response(200)
+            handler.send_header("Content-Type", "image/jpeg")
+            handler.send_header("Content-Length", str(len(self.body)))
+            handler.end_headers()
+            handler.wfile.write(self.body)
+        finished = time.time()
+        with self.lock:
+            first, last, count = self.fetches.get(tag, (started, finished, 0))
+            self.fetches[tag] = (min(first, started), max(last, finished), count + 1)
+            if fail:
+                self.failures += 1
+
+    def fetch_window(self, tag):
+        with self.lock:
+            return self.fetches.get(tag)
+
+
+def image_count(spec, rng):
+    low, _, high = spec.partition("-")
+    return rng.randint(int(low), int(high or low))
+
+
+def post_product(api, api_key, payload):
+    """POST the webhook on a fresh connection; returns (status, body)"""
+    parts = urlsplit(api)
+    conn_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_class(parts.hostname, parts.port, timeout=600)
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    try:
+        conn.request("POST", "/api/webhooks/products", json.dumps(payload), headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def ingest_one(n, args, run_id, stub_url, stub, rng_seed):
+    rng = random.Random(rng_seed)
+    tag = f"{run_id}-{n}"
+    count = image_count(args.images, rng)
+    payload = {
+        "code": f"BENCH-WH-{run_id}-{n}",
+        "name": f"Benchmark webhook product {run_id} {n}",
+        "description": "Created by scripts/webhook_ingest_bench.py",
+        "show_on_homepage": False,
+        "images": [f"{stub_url}/img/{tag}/{i}.jpg" for i in range(count)],
+    }
+    if args.category_code:
+        payload["category_code"] = args.category_code
+
+    sent = time.time()
+    try:
+        status, body = post_product(args.api_url, args.api_key, payload)
+        error = None if status < 400 else f"HTTP {status}: {body[:120].decode('utf-8', 'replace')}"
+    except (OSError, http.client.HTTPException) as e:
+        status, error = 0, str(e)
+    done = time.time()
+
+    result = {"images": count, "status": status, "error": error, "e2e_ms": (done - sent) * 1000}
+    window = stub.fetch_window(tag)
+    if window:
+        first, last, fetched = window
+        result.update({
+            "fetched": fetched,
+            "before_ms": max(first - sent, 0) * 1000,
+            "download_ms": (last - first) * 1000,
+            "after_ms": max(done - last, 0) * 1000,
+        })
+    return result
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, max(0, round(q * len(values)) - 1))], 1)
+
+
+def summarize(results):
+    ok = [r for r in results if not r["error"]]
+    timed = [r for r in ok if "download_ms" in r]
+
+    def stats(key, rows):
+        values = [r[key] for r in rows]
+        return {
+            "p50_ms": percentile(values, 0.5),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "mean_ms": round(sum(values) / len(values), 1) if values else None,
+        }
+
+    buckets = []
+    for low, high in BUCKETS:
+        rows = [r for r in timed if low <= r["images"] <= high]
+        if rows:
+            buckets.append({
+                "images": f"{low}-{high}" if high < 10 ** 6 else f"{low}+",
+                "products": len(rows),
+                "e2e_mean_ms": round(sum(r["e2e_ms"] for r in rows) / len(rows), 1),
+                "download_mean_ms": round(sum(r["download_ms"] for r in rows) / len(rows), 1),
+                "db_mean_ms": round(sum(r["before_ms"] + r["after_ms"] for r in rows) / len(rows), 1),
+            })
+    total_e2e = sum(r["e2e_ms"] for r in timed) or 1
+    return {
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "e2e": stats("e2e_ms", ok),
+        "before_downloads": stats("before_ms", timed),
+        "downloads": stats("download_ms", timed),
+        "after_downloads": stats("after_ms", timed),
+        "download_share": round(sum(r["download_ms"] for r in timed) / total_e2e, 3),
+        "by_image_count": buckets,
+    }
+
+
+def cleanup(run_id, url):
+    server_utils.run_sql(f"""
+        DELETE FROM images WHERE id IN (
+            SELECT pi.image_id FROM product_images pi JOIN products p ON p.id = pi.product_id
+            WHERE p.code LIKE 'BENCH-WH-{run_id}-%');
+        DELETE FROM products WHERE code LIKE 'BENCH-WH-{run_id}-%';
+    """, url, single_transaction=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput harness for POST /api/webhooks/products")
+    parser.add_argument("--api-url", default=os.environ.get("API_URL", "http://localhost:3001"))
+    parser.add_argument("--api-key", default=os.environ.get("WEBHOOK_API_KEY"), help="default: WEBHOOK_API_KEY")
+    parser.add_argument("--products", type=int, default=100, help="products to post")
+    parser.add_argument("--concurrency", type=int, default=4, help="webhook requests in flight")
+    parser.add_argument("--images", default="1-50", help="images per product, N or MIN-MAX")
+    parser.add_argument("--category-code", help="category_code sent with every product")
+    parser.add_argument("--latency", type=float, default=50.0, help="stub latency per image in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="standard deviation of the stub latency in ms")
+    parser.add_argument("--size", type=int, default=150, help="stub image size in KB")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of image requests answered with 503")
+    parser.add_argument("--stub-bind", default="0.0.0.0", help="address the stub origin listens on")
+    parser.add_argument("--stub-port", type=int, default=8099)
+    parser.add_argument("--stub-url", help="origin URL as the API server sees it (default: http://127.0.0.1:<port>)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cleanup", action="store_true", help="delete the benchmark products afterwards")
+    parser.add_argument("--database-url", help="PostgreSQL URL for --cleanup (default: DATABASE_URL or local docker db)")
+    parser.add_argument("--output", default=os.path.join(server_utils.BASE_PATH, "scripts/webhook_ingest_results.json"))
+    args = parser.parse_args()
+
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    stub = StubOrigin(args.stub_bind, args.stub_port, args.latency, args.jitter,
+                      args.size * 1024, args.failure_rate, args.seed)
+    stub_url = (args.stub_url or f"http://127.0.0.1:{stub.port}").rstrip("/")
+
+    print("=" * 70)
+    print("  WEBHOOK INGESTION BENCHMARK - SINOTRUK")
+    print(f"  Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  API: {args.api_url}   stub origin: {stub_url}")
+    print(f"  {args.products} products, {args.images} images each, concurrency {args.concurrency}, "
+          f"{args.latency:.0f}ms/{args.size}KB per image, {args.failure_rate:.0%} failures")
+    print("=" * 70)
+
+    stub.start()
+    started = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(ingest_one, n, args, run_id, stub_url, stub, args.seed * 100003 + n)
+                for n in range(args.products)
+            ]
+            results = []
+            for i, future in enumerate(futures, 1):
+                results.append(future.result())
+                if i % 25 == 0:
+                    print(f"  ⏳ {i}/{args.products} products posted")
+    finally:
+        elapsed = time.time() - started
+        stub.stop()
+
+    summary = summarize(results)
+    per_minute = summary["succeeded"] / elapsed * 60 if elapsed else 0
+    print(f"\n  ✅ {summary['succeeded']} products in {elapsed:.1f}s ({per_minute:.1f} products/min)")
+    if summary["failed"]:
+        sample = next(r["error"] for r in results if r["error"])
+        print(f"  ❌ {summary['failed']} webhook requests failed (e.g. {sample})")
+    if stub.failures:
+        print(f"  ⚠️  {stub.failures} image requests answered with 503 by the stub")
+    print(f"\n  {'Stage':<20} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9}")
+    print(f"  {'─' * 58}")
+    for label, key in (("end-to-end", "e2e"), ("before downloads", "before_downloads"),
+                       ("downloads", "downloads"), ("after (database)", "after_downloads")):
+        s = summary[key]
+        print(f"  {label:<20} " + " ".join(f"{(s[k] if s[k] is not None else '-'):>9}"
+                                           for k in ("p50_ms", "p95_ms", "p99_ms", "mean_ms")))
+    print(f"\n  Downloads are {summary['download_share']:.0%} of end-to-end time")
+    print(f"\n  {'Images':<8} {'Products':>9} {'E2E':>10} {'Download':>10} {'DB':>8}")
+    for bucket in summary["by_image_count"]:
+        print(f"  {bucket['images']:<8} {bucket['products']:>9} {bucket['e2e_mean_ms']:>8.0f}ms "
+              f"{bucket['download_mean_ms']:>8.0f}ms {bucket['db_mean_ms']:>6.0f}ms")
+
+    if args.cleanup:
+        try:
+            cleanup(run_id, args.database_url)
+            print(f"\n  🔄 Removed BENCH-WH-{run_id}-* products")
+        except server_utils.PsqlError as e:
+            print(f"\n  ⚠️  Cleanup failed: {e}")
+
+    output = {
+        "run_id": run_id,
+        "config": {k: getattr(args, k) for k in ("products", "concurrency", "images", "latency", "jitter",
+                                                 "size", "failure_rate")},
+        "elapsed_seconds": round(elapsed, 2),
+        "products_per_minute": round(per_minute, 1),
+        "stub_failures": stub.failures,
+        **summary,
+        "timestamp": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n  Results saved to: {os.path.relpath(args.output, server_utils.BASE_PATH)}")
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())